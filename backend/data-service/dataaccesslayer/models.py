@@ -1,7 +1,7 @@
 """
-SQLAlchemy models: LocationRecord, WeatherRecord, RangeRecord
+SQLAlchemy models: LocationRecord, WeatherRecord, RangeRecord, TableRevision
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Index
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -9,12 +9,17 @@ class LocationRecord(Base):
     __tablename__ = "locations"
     id = Column(Integer, primary_key=True, index=True)
     query = Column(String, index=True)
+    # dedup key: query case-folded with whitespace collapsed (see repository.location_query_key);
+    # NULL for blank queries, which never conflict
+    query_key = Column(String)
     lat = Column(Float)
     lng = Column(Float)
     display_name = Column(String)
     source = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ux_locations_query_key", "query_key", unique=True),)
+
 class WeatherRecord(Base):
     __tablename__ = "weather_records"
     id = Column(Integer, primary_key=True, index=True)
@@ -23,8 +28,13 @@ class WeatherRecord(Base):
     lng = Column(Float)
     snapshot = Column(JSON)  # full JSON snapshot of weather fetched
     kind = Column(String, default="current") # current or forecast
+    # quantized "lat,lng" (see repository.weather_coord_key) used by the duplicate-save check
+    coord_key = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+# newest record of a kind at a point: the duplicate-save check is one index probe
+Index("ix_weather_records_dedup", WeatherRecord.kind, WeatherRecord.coord_key, WeatherRecord.created_at.desc())
+
 class RangeRecord(Base):
     __tablename__ = "range_records"
     id = Column(Integer, primary_key=True, index=True)
@@ -38,3 +48,9 @@ class RangeRecord(Base):
     # e.g., {"avg_temp": 22.4, "min_temp": 18.0, "max_temp": 27.2, "count": 5}
     summary = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TableRevision(Base):
+    """Per-table change counter backing list-endpoint ETags (PostgreSQL uses sequences, see repository.bump_table_revision)."""
+    __tablename__ = "table_revisions"
+    table_name = Column(String, primary_key=True)
+    revision = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,129 @@
+"""
+In-process map of recent "current" weather saves, so the WEATHER_DEDUP_WINDOW duplicate check of
+create_weather_record rarely needs the database. Keys are quantized coordinates
+(repository.weather_coord_key); values are the save time and record id. Entries older than the
+window are dropped as new ones arrive, and the map holds at most WEATHER_DEDUP_CACHE_MAX_ENTRIES.
+
+  - A hit (a save inside the window) is answered from the map.
+  - A miss is answered from the map only when it is authoritative: WEATHER_DEDUP_CACHE_AUTHORITATIVE
+    is on, the map was warmed from the database at startup and no unexpired entry has been
+    evicted for space. Otherwise the caller falls back to the indexed query.
+  - A key is reserved before the insert is awaited, so concurrent saves of the same point in
+    one process cannot both pass the check.
+
+Multiple workers: each uvicorn worker (or replica) has its own map and only sees its own saves
+plus what it loaded at startup. Hits stay correct (the record exists unless another process
+deleted it within the window, in which case a re-save is refused until the window ends), but a
+miss does not prove that another process has not just saved the same point. Misses are
+therefore confirmed with the indexed query by default, which is safe for any number of
+workers; a deployment with a single writer process can set WEATHER_DEDUP_CACHE_AUTHORITATIVE=true
+to skip that query as well. WEATHER_DEDUP_CACHE_ENABLED=false always queries the database.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+WEATHER_DEDUP_WINDOW = float(os.getenv("WEATHER_DEDUP_WINDOW", 120))
+WEATHER_DEDUP_CACHE_ENABLED = os.getenv("WEATHER_DEDUP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+WEATHER_DEDUP_CACHE_AUTHORITATIVE = os.getenv("WEATHER_DEDUP_CACHE_AUTHORITATIVE", "false").lower() in ("1", "true", "yes", "on")
+WEATHER_DEDUP_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_DEDUP_CACHE_MAX_ENTRIES", 10000))
+
+
+class RecentWrites:
+    def __init__(self, window: float = WEATHER_DEDUP_WINDOW, enabled: bool = WEATHER_DEDUP_CACHE_ENABLED,
+                 authoritative: bool = WEATHER_DEDUP_CACHE_AUTHORITATIVE,
+                 max_entries: int = WEATHER_DEDUP_CACHE_MAX_ENTRIES):
+        self.window = window
+        self.enabled = enabled
+        self.authoritative = authoritative
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (saved_at epoch seconds, record id or None), oldest first
+        self._warmed = False
+        self._lossy_until = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._fallbacks = 0
+        self._evicted = 0
+
+    def _expire(self, now: float):
+        while self._entries:
+            key, (saved_at, _) = next(iter(self._entries.items()))
+            if now - saved_at < self.window:
+                break
+            del self._entries[key]
+
+    def age(self, key: str, now: float = None) -> Optional[float]:
+        """Seconds since the last save of key when it falls inside the window, else None."""
+        if not self.enabled:
+            return None
+        now = time.time() if now is None else now
+        self._expire(now)
+        entry = self._entries.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            return None  # entries are only roughly in time order (see record), so check again
+        self._hits += 1
+        return max(0.0, now - entry[0])
+
+    def answers_misses(self, now: float = None) -> bool:
+        """Whether a miss proves there was no save inside the window (no database check needed)."""
+        now = time.time() if now is None else now
+        if self.enabled and self.authoritative and self._warmed and now >= self._lossy_until:
+            self._misses += 1
+            return True
+        self._fallbacks += 1
+        return False
+
+    def record(self, key: str, saved_at: float = None, record_id: int = None):
+        """
+        Remember a save (or reserve the key with record_id=None before the insert). Entries are
+        kept in the order they were recorded, which is save order except for moved records.
+        """
+        if not self.enabled or key is None:
+            return
+        saved_at = time.time() if saved_at is None else saved_at
+        self._entries.pop(key, None)
+        self._entries[key] = (saved_at, record_id)
+        if len(self._entries) > self.max_entries:
+            _, (oldest, _) = self._entries.popitem(last=False)
+            self._evicted += 1
+            # until that entry would have expired, a miss may be a forgotten save
+            self._lossy_until = max(self._lossy_until, oldest + self.window)
+
+    def forget(self, key: str):
+        self._entries.pop(key, None)
+
+    def forget_record(self, record_id: int):
+        """Drop the entry of a deleted or moved record."""
+        for key in [k for k, (_, rid) in self._entries.items() if rid == record_id]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def warm(self, saves: list, now: float = None):
+        """Load (key, saved_at, record_id) tuples of the window from the database, oldest first."""
+        now = time.time() if now is None else now
+        for key, saved_at, record_id in saves:
+            if now - saved_at < self.window:
+                self.record(key, saved_at, record_id)
+        self._warmed = True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "authoritative": self.authoritative,
+            "warmed": self._warmed,
+            "window": self.window,
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "local_misses": self._misses,
+            "db_checks": self._fallbacks,
+            "evicted": self._evicted,
+        }
+
+
+# Shared by every request of this process (see the module docstring for multi-worker use)
+recent_weather_writes = RecentWrites()
@@ -1,54 +1,286 @@
 """Repository functions for DB CRUD operations."""
 from .database import AsyncSessionLocal, engine, Base
-from .models import LocationRecord, WeatherRecord, RangeRecord
+from .models import LocationRecord, WeatherRecord, RangeRecord, TableRevision
 from exceptions.custom_exceptions import DuplicateLocationException, DuplicateWeatherException
+from .recent_writes import recent_weather_writes
 import sqlalchemy as sa
 from typing import List, Optional, Dict, Any
+import os
+import time
 import asyncio
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+load_dotenv()
+
+# decimal places of the coordinates in weather_records.coord_key (4 is ~11 m)
+WEATHER_COORD_KEY_PRECISION = int(os.getenv("WEATHER_COORD_KEY_PRECISION", 4))
+
+
+REVISIONED_TABLES = (LocationRecord.__tablename__, WeatherRecord.__tablename__, RangeRecord.__tablename__)
 
 
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(sa.orm.configure_mappers)
+        await conn.run_sync(lambda _: sa.orm.configure_mappers())
         await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn))
+    await migrate_location_query_key()
+    await migrate_weather_coord_key()
+    await seed_table_revisions()
+    await warm_recent_weather_writes()
 
 
-async def create_location_record(data: Dict[str, Any]) -> Dict:
+def _revision_sequence(table_name: str) -> str:
+    return f"{table_name}_revision_seq"
+
+
+async def seed_table_revisions():
+    """
+    Create the change-counter row of each revisioned table if it does not exist yet and, on
+    PostgreSQL, its revision sequence (started above the counter, so no earlier ETag recurs).
+    """
     async with AsyncSessionLocal() as session:
-        query_str = (data.get("query") or "").strip()
-        if query_str:
-            q = await session.execute(
-                sa.select(LocationRecord).where(sa.func.lower(LocationRecord.query) == query_str.lower())
+        q = await session.execute(sa.select(TableRevision.table_name))
+        existing = set(q.scalars().all())
+        for name in REVISIONED_TABLES:
+            if name not in existing:
+                session.add(TableRevision(table_name=name, revision=0))
+        try:
+            await session.commit()
+        except sa.exc.IntegrityError:
+            # another worker seeded the counters concurrently
+            await session.rollback()
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            for name in REVISIONED_TABLES:
+                seq = _revision_sequence(name)
+                await conn.execute(sa.text(f"CREATE SEQUENCE IF NOT EXISTS {seq}"))
+                await conn.execute(
+                    sa.text(f"SELECT setval('{seq}', GREATEST((SELECT last_value FROM {seq}), "
+                            "(SELECT revision FROM table_revisions WHERE table_name = :name) + 1))"),
+                    {"name": name},
+                )
+
+
+async def bump_table_revision(session, table_name: str):
+    """
+    Mark a table as changed by the caller's write transaction; commit with commit_changes.
+    SQLite (one writer at a time anyway) increments the table's counter row inside the
+    transaction, so the new revision becomes visible exactly when the change commits.
+    PostgreSQL writers would queue on that row's lock for the length of their transactions, so
+    there commit_changes advances the table's sequence after the commit instead: nextval never
+    blocks, at the cost of a moment between commit and bump in which a conditional request may
+    still be answered with 304.
+    """
+    if engine.dialect.name == "postgresql":
+        session.info.setdefault("changed_tables", set()).add(table_name)
+        return
+    await session.execute(
+        sa.update(TableRevision)
+        .where(TableRevision.table_name == table_name)
+        .values(revision=TableRevision.revision + 1)
+    )
+
+
+async def commit_changes(session):
+    """Commit the session, then advance the revision sequences of the tables it changed (PostgreSQL)."""
+    await session.commit()
+    tables = session.info.pop("changed_tables", None)
+    if tables:
+        async with engine.connect() as conn:
+            for name in sorted(tables):
+                await conn.execute(sa.text(f"SELECT nextval('{_revision_sequence(name)}')"))
+            await conn.commit()
+
+
+async def get_table_revision(table_name: str) -> int:
+    async with AsyncSessionLocal() as session:
+        if engine.dialect.name == "postgresql":
+            q = await session.execute(sa.text(f"SELECT last_value FROM {_revision_sequence(table_name)}"))
+        else:
+            q = await session.execute(sa.select(TableRevision.revision).where(TableRevision.table_name == table_name))
+        return q.scalar_one_or_none() or 0
+
+
+def location_query_key(query: Optional[str]) -> Optional[str]:
+    """Dedup key of a location query: case-folded, whitespace collapsed; None when blank."""
+    return " ".join((query or "").split()).casefold() or None
+
+
+def weather_coord_key(lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+    """Dedup key of a weather point: coordinates rounded to WEATHER_COORD_KEY_PRECISION places."""
+    if lat is None or lng is None:
+        return None
+    p = WEATHER_COORD_KEY_PRECISION
+    return f"{round(float(lat), p) + 0.0:.{p}f},{round(float(lng), p) + 0.0:.{p}f}"
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite returns naive timestamps (stored in UTC); PostgreSQL returns aware ones."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _insert(model):
+    """Dialect INSERT supporting ON CONFLICT (PostgreSQL and SQLite)."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _location_dict(row) -> Dict:
+    return {
+        "id": row["id"],
+        "query": row["query"],
+        "lat": row["lat"],
+        "lng": row["lng"],
+        "display_name": row["display_name"],
+        "source": row["source"],
+        "created_at": row["created_at"].isoformat()
+    }
+
+
+def _location_values(data: Dict[str, Any]) -> Dict:
+    return {
+        "query": data.get("query"),
+        "query_key": location_query_key(data.get("query")),
+        "lat": data.get("lat"),
+        "lng": data.get("lng"),
+        "display_name": data.get("display_name"),
+        "source": data.get("source"),
+    }
+
+
+def _insert_locations(values: List[Dict]):
+    """INSERT ... ON CONFLICT (query_key) DO NOTHING RETURNING the inserted rows."""
+    return (
+        _insert(LocationRecord)
+        .values(values)
+        .on_conflict_do_nothing(index_elements=[LocationRecord.query_key])
+        .returning(*LocationRecord.__table__.c)
+    )
+
+
+async def _add_missing_column(conn, table, name: str, ddl_type: str):
+    columns = await conn.run_sync(lambda c: {col["name"] for col in sa.inspect(c).get_columns(table.name)})
+    if name not in columns:
+        await conn.execute(sa.text(f"ALTER TABLE {table.name} ADD COLUMN {name} {ddl_type}"))
+
+
+async def _create_missing_indexes(conn, table):
+    for index in table.indexes:
+        await conn.run_sync(lambda c, index=index: index.create(c, checkfirst=True))
+
+
+async def migrate_location_query_key():
+    """
+    Add and backfill locations.query_key on databases created before it existed, then create its
+    unique index. Older rows whose key repeats an earlier row's (possible before the index) keep
+    a NULL key, so the index can be built; the earliest row owns the key.
+    """
+    table = LocationRecord.__table__
+    async with engine.begin() as conn:
+        await _add_missing_column(conn, table, "query_key", "VARCHAR")
+        q = await conn.execute(
+            sa.select(table.c.id, table.c.query)
+            .where(table.c.query_key.is_(None), table.c.query.isnot(None))
+            .order_by(table.c.id)
+        )
+        pending = q.all()
+        if pending:
+            q = await conn.execute(sa.select(table.c.query_key).where(table.c.query_key.isnot(None)))
+            taken = set(q.scalars().all())
+            updates, skipped = [], 0
+            for record_id, query in pending:
+                key = location_query_key(query)
+                if key is None:
+                    continue
+                if key in taken:
+                    skipped += 1
+                    continue
+                taken.add(key)
+                updates.append({"record_id": record_id, "key": key})
+            if updates:
+                await conn.execute(
+                    sa.update(table).where(table.c.id == sa.bindparam("record_id")).values(query_key=sa.bindparam("key")),
+                    updates,
+                )
+                print(f"[migrate] locations.query_key backfilled for {len(updates)} rows ({skipped} older duplicates left unkeyed).")
+        await _create_missing_indexes(conn, table)
+
+
+async def migrate_weather_coord_key():
+    """Add and backfill weather_records.coord_key, then create the (kind, coord_key, created_at) index."""
+    table = WeatherRecord.__table__
+    async with engine.begin() as conn:
+        await _add_missing_column(conn, table, "coord_key", "VARCHAR")
+        q = await conn.execute(
+            sa.select(table.c.id, table.c.lat, table.c.lng)
+            .where(table.c.coord_key.is_(None), table.c.lat.isnot(None), table.c.lng.isnot(None))
+        )
+        updates = [{"record_id": record_id, "key": weather_coord_key(lat, lng)} for record_id, lat, lng in q.all()]
+        if updates:
+            await conn.execute(
+                sa.update(table).where(table.c.id == sa.bindparam("record_id")).values(coord_key=sa.bindparam("key")),
+                updates,
             )
-            existing = q.scalar_one_or_none()
-            if existing:
-                raise DuplicateLocationException(f"'{query_str}' is already saved (id={existing.id}).")
+            print(f"[migrate] weather_records.coord_key backfilled for {len(updates)} rows.")
+        await _create_missing_indexes(conn, table)
 
-        loc = LocationRecord(
-            query=data.get("query"),
-            lat=data.get("lat"),
-            lng=data.get("lng"),
-            display_name=data.get("display_name"),
-            source=data.get("source"),
+
+async def warm_recent_weather_writes():
+    """Load the "current" saves of the last dedup window into the recent-write map."""
+    since = datetime.now(timezone.utc) - timedelta(seconds=recent_weather_writes.window)
+    if engine.dialect.name == "sqlite":
+        since = since.replace(tzinfo=None)  # stored as naive UTC text
+    async with AsyncSessionLocal() as session:
+        q = await session.execute(
+            sa.select(WeatherRecord.coord_key, WeatherRecord.created_at, WeatherRecord.id)
+            .where(
+                (WeatherRecord.kind == "current")
+                & WeatherRecord.coord_key.isnot(None)
+                & (WeatherRecord.created_at >= since)
+            )
+            .order_by(WeatherRecord.created_at.desc())
+            .limit(recent_weather_writes.max_entries)
         )
-        session.add(loc)
-        await session.commit()
-        await session.refresh(loc)
-        return {
-            "id": loc.id,
-            "query": loc.query,
-            "lat": loc.lat,
-            "lng": loc.lng,
-            "display_name": loc.display_name,
-            "source": loc.source,
-            "created_at": loc.created_at.isoformat()
-        }
+        saves = [(key, _as_utc(created_at).timestamp(), record_id) for key, created_at, record_id in q.all()]
+    recent_weather_writes.warm(sorted(saves, key=lambda save: save[1]))
+
+
+async def create_location_record(data: Dict[str, Any]) -> Dict:
+    """
+    Insert a location unless its query is already saved (case and spacing ignored). The
+    check is the unique index on query_key (INSERT ... ON CONFLICT DO NOTHING), so it costs
+    no extra round trip and concurrent saves of the same query cannot both succeed.
+    """
+    values = _location_values(data)
+    async with AsyncSessionLocal() as session:
+        q = await session.execute(_insert_locations([values]))
+        row = q.mappings().first()
+        if row is None:
+            await session.rollback()
+            q = await session.execute(sa.select(LocationRecord.id).where(LocationRecord.query_key == values["query_key"]))
+            existing_id = q.scalar_one_or_none()
+            suffix = f" (id={existing_id})." if existing_id is not None else "."
+            raise DuplicateLocationException(f"'{(data.get('query') or '').strip()}' is already saved{suffix}")
+        created = _location_dict(row)
+        await bump_table_revision(session, LocationRecord.__tablename__)
+        await commit_changes(session)
+        return created
 
 
-async def list_location_records() -> List[Dict]:
+async def list_location_records(limit: Optional[int] = None, offset: int = 0, ids: Optional[List[int]] = None) -> List[Dict]:
+    """Saved locations, newest first. limit/offset page through them (no limit = all); ids restricts them."""
     async with AsyncSessionLocal() as session:
-        q = await session.execute(sa.select(LocationRecord).order_by(LocationRecord.created_at.desc()))
+        stmt = sa.select(LocationRecord).order_by(LocationRecord.created_at.desc(), LocationRecord.id.desc())
+        if ids is not None:
+            stmt = stmt.where(LocationRecord.id.in_(ids))
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+        q = await session.execute(stmt)
         rows = q.scalars().all()
         return [
             {"id": r.id, "query": r.query, "lat": r.lat, "lng": r.lng, "display_name": r.display_name, "source": r.source, "created_at": r.created_at.isoformat()}
@@ -56,49 +288,144 @@ async def list_location_records() -> List[Dict]:
         ]
 
 
-async def create_weather_record(data: Dict[str, Any]) -> Dict:
-    async with AsyncSessionLocal() as session:
-        lat = data.get("lat")
-        lng = data.get("lng")
-        kind = data.get("kind", "current")
+async def create_location_records_bulk(items: List[Dict[str, Any]]) -> List[Dict]:
+    """
+    Create many location records with one multi-row INSERT ... ON CONFLICT DO NOTHING in one
+    transaction; each item is deduplicated like create_location_record (against saved rows and
+    earlier items). Returns one result per item, in order: {"status": "created", "record": {...}}
+    or {"status": "duplicate", "detail": ...}.
+    """
+    results = [None] * len(items)
+    first_of_key, keyed, unkeyed = {}, [], []
+    for i, item in enumerate(items):
+        values = _location_values(item)
+        key = values["query_key"]
+        if key is None:
+            unkeyed.append((i, values))
+        elif key in first_of_key:
+            results[i] = {"status": "duplicate", "detail": f"'{(item.get('query') or '').strip()}' is already in this request."}
+        else:
+            first_of_key[key] = i
+            keyed.append(values)
 
-        if lat is not None and lng is not None and kind == "current":
+    async with AsyncSessionLocal() as session:
+        created = 0
+        if keyed:
+            q = await session.execute(_insert_locations(keyed))
+            for row in q.mappings().all():
+                results[first_of_key[row["query_key"]]] = {"status": "created", "record": _location_dict(row)}
+                created += 1
+        for i, values in unkeyed:
+            q = await session.execute(_insert_locations([values]))
+            results[i] = {"status": "created", "record": _location_dict(q.mappings().one())}
+            created += 1
+        missing = [key for key, i in first_of_key.items() if results[i] is None]
+        if missing:
             q = await session.execute(
-                sa.select(WeatherRecord)
-                .where(
-                    (WeatherRecord.lat == lat)
-                    & (WeatherRecord.lng == lng)
-                    & (WeatherRecord.kind == kind)
-                )
-                .order_by(WeatherRecord.created_at.desc())
-                .limit(1)
+                sa.select(LocationRecord.query_key, LocationRecord.id).where(LocationRecord.query_key.in_(missing))
             )
-            last = q.scalar_one_or_none()
-            if last and last.created_at:
-                now_utc = datetime.now(timezone.utc)
-                if (now_utc - last.created_at).total_seconds() < 120:
-                    raise DuplicateWeatherException(
-                        f"Weather for ({lat},{lng}) was saved {int((now_utc - last.created_at).total_seconds())}s ago. Please wait before saving again."
-                    )
+            existing = dict(q.all())
+            for key in missing:
+                query_str = (items[first_of_key[key]].get("query") or "").strip()
+                suffix = f" (id={existing[key]})." if key in existing else "."
+                results[first_of_key[key]] = {"status": "duplicate", "detail": f"'{query_str}' is already saved{suffix}"}
+        if created:
+            await bump_table_revision(session, LocationRecord.__tablename__)
+        await commit_changes(session)
+    return results
+
+
+def _weather_dict(wr: WeatherRecord) -> Dict:
+    return {"id": wr.id, "location_id": wr.location_id, "lat": wr.lat, "lng": wr.lng, "snapshot": wr.snapshot, "kind": wr.kind, "created_at": wr.created_at.isoformat()}
+
+
+def _raise_duplicate_weather(lat, lng, age: float):
+    raise DuplicateWeatherException(
+        f"Weather for ({lat},{lng}) was saved {int(age)}s ago. Please wait before saving again."
+    )
+
+
+async def create_weather_record(data: Dict[str, Any]) -> Dict:
+    """
+    Save a weather snapshot. A "current" snapshot is refused when the same point (coord_key)
+    was saved within the dedup window; the recent-write map answers that without the database
+    when it can, otherwise the (kind, coord_key, created_at) index does.
+    """
+    lat = data.get("lat")
+    lng = data.get("lng")
+    kind = data.get("kind", "current")
+    coord_key = weather_coord_key(lat, lng)
+    dedup = coord_key is not None and kind == "current"
+    window = recent_weather_writes.window
+
+    async with AsyncSessionLocal() as session:
+        if dedup:
+            age = recent_weather_writes.age(coord_key)
+            if age is not None:
+                _raise_duplicate_weather(lat, lng, age)
+            if not recent_weather_writes.answers_misses():
+                q = await session.execute(
+                    sa.select(WeatherRecord.created_at)
+                    .where((WeatherRecord.kind == kind) & (WeatherRecord.coord_key == coord_key))
+                    .order_by(WeatherRecord.created_at.desc())
+                    .limit(1)
+                )
+                last = q.scalar_one_or_none()
+                if last is not None:
+                    age = (datetime.now(timezone.utc) - _as_utc(last)).total_seconds()
+                    if age < window:
+                        _raise_duplicate_weather(lat, lng, age)
+                # a concurrent save in this process may have claimed the point meanwhile
+                age = recent_weather_writes.age(coord_key)
+                if age is not None:
+                    _raise_duplicate_weather(lat, lng, age)
+            recent_weather_writes.record(coord_key)  # reserve the point until the insert commits
 
         wr = WeatherRecord(
             location_id=data.get("location_id"),
-            lat=data.get("lat"),
-            lng=data.get("lng"),
+            lat=lat,
+            lng=lng,
             snapshot=data.get("snapshot"),
-            kind=data.get("kind", "current")
+            kind=kind,
+            coord_key=coord_key,
         )
-        session.add(wr)
-        await session.commit()
+        try:
+            session.add(wr)
+            await bump_table_revision(session, WeatherRecord.__tablename__)
+            await commit_changes(session)
+        except BaseException:
+            if dedup:
+                recent_weather_writes.forget(coord_key)
+            raise
         await session.refresh(wr)
-        return {"id": wr.id, "location_id": wr.location_id, "lat": wr.lat, "lng": wr.lng, "snapshot": wr.snapshot, "kind": wr.kind, "created_at": wr.created_at.isoformat()}
+        if dedup:
+            recent_weather_writes.record(coord_key, record_id=wr.id)
+        return _weather_dict(wr)
+
+
+async def create_weather_records_bulk(items: List[Dict[str, Any]]) -> List[Dict]:
+    """
+    Create many weather records; each item is deduplicated like create_weather_record.
+    Returns one result per item, in order: {"status": "created", "record": {...}},
+    {"status": "duplicate", "detail": ...} or {"status": "error", "detail": ...}.
+    """
+    results = []
+    for item in items:
+        try:
+            created = await create_weather_record(item)
+            results.append({"status": "created", "record": created})
+        except DuplicateWeatherException as e:
+            results.append({"status": "duplicate", "detail": str(e)})
+        except Exception as e:
+            results.append({"status": "error", "detail": str(e)})
+    return results
 
 
 async def list_weather_records(limit:int=100) -> List[Dict]:
     async with AsyncSessionLocal() as session:
         q = await session.execute(sa.select(WeatherRecord).order_by(WeatherRecord.created_at.desc()).limit(limit))
         rows = q.scalars().all()
-        return [{"id": r.id, "location_id": r.location_id, "lat": r.lat, "lng": r.lng, "snapshot": r.snapshot, "kind": r.kind, "created_at": r.created_at.isoformat()} for r in rows]
+        return [_weather_dict(r) for r in rows]
 
 
 async def update_location_record(location_id: int, data: Dict[str, Any]) -> Optional[Dict]:
@@ -110,6 +437,7 @@ async def update_location_record(location_id: int, data: Dict[str, Any]) -> Opti
         
         if "query" in data:
             loc.query = data["query"]
+            loc.query_key = location_query_key(data["query"])
         if "lat" in data:
             loc.lat = data["lat"]
         if "lng" in data:
@@ -119,7 +447,13 @@ async def update_location_record(location_id: int, data: Dict[str, Any]) -> Opti
         if "source" in data:
             loc.source = data["source"]
         
-        await session.commit()
+        try:
+            await bump_table_revision(session, LocationRecord.__tablename__)
+            await commit_changes(session)
+        except sa.exc.IntegrityError:
+            # the new query is another location's (unique query_key)
+            await session.rollback()
+            raise DuplicateLocationException(f"'{(data.get('query') or '').strip()}' is already saved.")
         await session.refresh(loc)
         return {
             "id": loc.id,
@@ -149,31 +483,35 @@ async def update_weather_record(weather_id: int, data: Dict[str, Any]) -> Option
             wr.location_id = data["location_id"]
         if "snapshot" in data:
             wr.snapshot = data["snapshot"]
+        wr.coord_key = weather_coord_key(wr.lat, wr.lng)
         
-        await session.commit()
+        await bump_table_revision(session, WeatherRecord.__tablename__)
+        await commit_changes(session)
         await session.refresh(wr)
-        return {
-            "id": wr.id,
-            "location_id": wr.location_id,
-            "lat": wr.lat,
-            "lng": wr.lng,
-            "snapshot": wr.snapshot,
-            "kind": wr.kind,
-            "created_at": wr.created_at.isoformat()
-        }
+        if {"lat", "lng", "kind"} & data.keys():
+            # the record moved: its old point is free, its new one counts from its created_at
+            recent_weather_writes.forget_record(weather_id)
+            if wr.kind == "current" and wr.coord_key and wr.created_at:
+                saved_at = _as_utc(wr.created_at).timestamp()
+                if time.time() - saved_at < recent_weather_writes.window:
+                    recent_weather_writes.record(wr.coord_key, saved_at, wr.id)
+        return _weather_dict(wr)
 
 
 async def delete_all_location_records() -> int:
     async with AsyncSessionLocal() as session:
         result = await session.execute(sa.delete(LocationRecord))
-        await session.commit()
+        await bump_table_revision(session, LocationRecord.__tablename__)
+        await commit_changes(session)
         return result.rowcount
 
 
 async def delete_all_weather_records() -> int:
     async with AsyncSessionLocal() as session:
         result = await session.execute(sa.delete(WeatherRecord))
-        await session.commit()
+        await bump_table_revision(session, WeatherRecord.__tablename__)
+        await commit_changes(session)
+        recent_weather_writes.clear()
         return result.rowcount
 
 
@@ -188,7 +526,8 @@ async def create_range_record(data: Dict[str, Any]) -> Dict:
             summary=data.get("summary"),
         )
         session.add(rr)
-        await session.commit()
+        await bump_table_revision(session, RangeRecord.__tablename__)
+        await commit_changes(session)
         await session.refresh(rr)
         return {
             "id": rr.id,
@@ -241,7 +580,8 @@ async def update_range_record(range_id: int, data: Dict[str, Any]) -> Optional[D
         if "summary" in data:
             rr.summary = data["summary"]
 
-        await session.commit()
+        await bump_table_revision(session, RangeRecord.__tablename__)
+        await commit_changes(session)
         await session.refresh(rr)
         return {
             "id": rr.id,
@@ -258,5 +598,6 @@ async def update_range_record(range_id: int, data: Dict[str, Any]) -> Optional[D
 async def delete_range_record(range_id: int) -> int:
     async with AsyncSessionLocal() as session:
         result = await session.execute(sa.delete(RangeRecord).where(RangeRecord.id == range_id))
-        await session.commit()
+        await bump_table_revision(session, RangeRecord.__tablename__)
+        await commit_changes(session)
         return result.rowcount
@@ -99,6 +99,7 @@ else:
 from dataaccesslayer import repository
 from presentationlayer.controllers import router as records_router
 from exceptions.global_exception_handler import register_exception_handlers
+from presentationlayer.responses import FastJSONResponse
 from dataaccesslayer.database import engine, Base  # engine import now happens after checks
 
 @asynccontextmanager
@@ -111,6 +112,10 @@ async def lifespan(app: FastAPI):
     try:
         async with engine.begin() as conn:
             await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn))
+        await repository.migrate_location_query_key()
+        await repository.migrate_weather_coord_key()
+        await repository.seed_table_revisions()
+        await repository.warm_recent_weather_writes()
         print("Database initialized successfully.")
     except Exception as e:
         # If initialization fails, log it with detail and re-raise to stop the app.
@@ -121,7 +126,7 @@ async def lifespan(app: FastAPI):
 
     print("Shutting down data-service...")
 
-app = FastAPI(title="data-service", lifespan=lifespan)
+app = FastAPI(title="data-service", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -1,13 +1,17 @@
 """
 Presentation layer for data-service: CRUD endpoints for locations, weather, ranges and export.
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Response
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Response, Query
 from pydantic import BaseModel
 from dataaccesslayer import repository
+from dataaccesslayer.models import LocationRecord, WeatherRecord, RangeRecord
+from dataaccesslayer.recent_writes import recent_weather_writes
+from presentationlayer.http_cache import make_etag, conditional
+from presentationlayer.responses import FastJSONResponse, CompressedResponse
 import asyncio
 import csv
 import io
-from typing import Optional
+from typing import Optional, List
 from xml.etree.ElementTree import Element, SubElement, tostring as xml_tostring
 from xml.dom import minidom
 import json
@@ -23,6 +27,10 @@ class CreateLocationRequest(BaseModel):
     source: str
 
 
+class BulkLocationRequest(BaseModel):
+    records: List[CreateLocationRequest]
+
+
 class CreateWeatherRequest(BaseModel):
     location_id: Optional[int] = None
     lat: float
@@ -31,6 +39,10 @@ class CreateWeatherRequest(BaseModel):
     kind: Optional[str] = "current"
 
 
+class BulkWeatherRequest(BaseModel):
+    records: List[CreateWeatherRequest]
+
+
 class UpdateLocationRequest(BaseModel):
     query: Optional[str] = None
     lat: Optional[float] = None
@@ -71,9 +83,30 @@ async def create_location(req: CreateLocationRequest):
     return created
 
 
+@router.post("/location/bulk", summary="Create many location records")
+async def create_location_bulk(req: BulkLocationRequest):
+    """
+    Create several locations in one call and one transaction. Duplicates (by query, also
+    within the request) are reported per item instead of failing the request.
+    """
+    results = await repository.create_location_records_bulk([r.model_dump() for r in req.records])
+    return {"results": results}
+
+
 @router.get("/location", summary="List saved locations")
-async def list_locations():
-    return await repository.list_location_records()
+async def list_locations(request: Request, response: Response, limit: Optional[int] = None, offset: int = 0,
+                         ids: Optional[List[int]] = Query(None)):
+    """
+    Newest first; limit/offset page through the list (all locations when limit is omitted).
+    ids (repeatable, ?ids=1&ids=2) restricts the list to those locations; unknown ids are skipped.
+    Supports If-None-Match: the ETag follows the locations table's change counter, so an
+    unchanged list is answered with 304 without querying or serializing the rows.
+    """
+    ids = sorted(set(ids)) if ids else None
+    revision = await repository.get_table_revision(LocationRecord.__tablename__)
+    etag = make_etag(LocationRecord.__tablename__, revision, limit, offset, ",".join(map(str, ids or ())))
+    not_modified = conditional(request, response, etag, "no-cache")
+    return not_modified or await repository.list_location_records(limit=limit, offset=offset, ids=ids)
 
 
 @router.post("/weather", summary="Create weather snapshot")
@@ -82,9 +115,21 @@ async def create_weather(req: CreateWeatherRequest):
     return created
 
 
+@router.post("/weather/bulk", summary="Create many weather snapshots")
+async def create_weather_bulk(req: BulkWeatherRequest):
+    """
+    Create several weather snapshots in one call. Duplicates are reported per item
+    instead of failing the request.
+    """
+    results = await repository.create_weather_records_bulk([r.model_dump() for r in req.records])
+    return {"results": results}
+
+
 @router.get("/weather", summary="List weather snapshots")
-async def list_weather(limit: int = 100):
-    return await repository.list_weather_records(limit=limit)
+async def list_weather(request: Request, response: Response, limit: int = 100):
+    revision = await repository.get_table_revision(WeatherRecord.__tablename__)
+    not_modified = conditional(request, response, make_etag(WeatherRecord.__tablename__, revision, limit), "no-cache")
+    return not_modified or await repository.list_weather_records(limit=limit)
 
 
 @router.put("/location/{location_id}", summary="Update location record")
@@ -131,11 +176,21 @@ async def delete_item(resource: str, item_id: int):
         else:
             raise HTTPException(status_code=400, detail="Resource must be 'location' or 'weather' or 'range'")
 
-        await session.execute(stmt)
-        await session.commit()
+        result = await session.execute(stmt)
+        if result.rowcount:
+            await repository.bump_table_revision(session, stmt.table.name)
+        await repository.commit_changes(session)
+        if resource == "weather":
+            recent_weather_writes.forget_record(item_id)
         return {"deleted": item_id}
 
 
+@router.get("/metrics")
+async def get_metrics():
+    """Recent-write map of the weather duplicate check: entries, local hits/misses and database fallbacks."""
+    return {"weather_dedup": recent_weather_writes.stats()}
+
+
 @router.get("/export")
 async def export_data(format: str = "json"):
     """Export data in JSON, CSV, Markdown, XML, or PDF format."""
@@ -144,7 +199,7 @@ async def export_data(format: str = "json"):
 
     if format == "json":
         payload = {"locations": locations, "weather": weather}
-        return payload
+        return FastJSONResponse(payload)
 
     if format == "csv":
         output = io.StringIO()
@@ -154,7 +209,7 @@ async def export_data(format: str = "json"):
             writer.writerow(["location", loc["id"], loc["query"], loc["lat"], loc["lng"], loc["created_at"]])
         for w in weather:
             writer.writerow(["weather", w["id"], w["kind"], w["lat"], w["lng"], w["created_at"]])
-        return Response(content=output.getvalue(), media_type="text/csv")
+        return CompressedResponse(content=output.getvalue(), media_type="text/csv")
 
     if format == "md":
         md = "# Exported Data\n\n## Locations\n"
@@ -163,7 +218,7 @@ async def export_data(format: str = "json"):
         md += "\n## Weather\n"
         for w in weather:
             md += f"- {w['id']}: {w['kind']} @ ({w['lat']},{w['lng']}) - {w['created_at']}\n"
-        return Response(content=md, media_type="text/markdown")
+        return CompressedResponse(content=md, media_type="text/markdown")
 
     if format == "xml":
         root = Element("export")
@@ -183,7 +238,7 @@ async def export_data(format: str = "json"):
             SubElement(el, "created_at").text = str(w.get("created_at", ""))
         rough = xml_tostring(root)
         pretty = minidom.parseString(rough).toprettyxml(indent="  ")
-        return Response(content=pretty, media_type="application/xml")
+        return CompressedResponse(content=pretty, media_type="application/xml")
 
     if format == "pdf":
         try:
@@ -244,8 +299,10 @@ async def create_range(req: CreateRangeRequest):
 
 
 @router.get("/range", summary="List range records")
-async def list_ranges(limit: int = 100):
-    return await repository.list_range_records(limit=limit)
+async def list_ranges(request: Request, response: Response, limit: int = 100):
+    revision = await repository.get_table_revision(RangeRecord.__tablename__)
+    not_modified = conditional(request, response, make_etag(RangeRecord.__tablename__, revision, limit), "no-cache")
+    return not_modified or await repository.list_range_records(limit=limit)
 
 
 @router.put("/range/{range_id}", summary="Update range record")
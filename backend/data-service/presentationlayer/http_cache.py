@@ -0,0 +1,57 @@
+"""
+HTTP caching helpers for GET endpoints: ETags, Cache-Control and If-None-Match -> 304.
+ETags are computed from cheap revision markers (never from the serialized body), so a matching
+conditional request is answered before the payload is serialized. They are strong only when the
+body is fully determined by those markers; bodies that also carry per-request values (such as
+a cache age) get weak ETags.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from presentationlayer.responses import negotiate_encoding, etag_for_encoding
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """ETag over the given revision/variant parts (weak when equal parts may yield different bytes)."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"' if weak else f'"{digest[:20]}"'
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def if_none_match(request: Request, etag: str) -> Optional[str]:
+    """
+    The ETag (of ours) that the request's If-None-Match matches, else None: the identity ETag or
+    that of the encoding this request would be sent in (see responses.etag_for_encoding).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = [tag.strip() for tag in header.split(",")]
+    if "*" in candidates:
+        return etag
+    ours = [etag]
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding:
+        ours.append(etag_for_encoding(etag, encoding))
+    # If-None-Match uses weak comparison, so W/"x" and "x" match each other
+    theirs = {_opaque(c) for c in candidates}
+    return next((tag for tag in ours if _opaque(tag) in theirs), None)
+
+
+def conditional(request: Request, response: Response, etag: Optional[str], cache_control: str) -> Optional[Response]:
+    """
+    Attach ETag/Cache-Control to `response`. Returns a bodyless 304 response to send instead
+    when the request's If-None-Match matches, else None (the caller returns its payload).
+    """
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+        matched = if_none_match(request, etag)
+        if matched:
+            # the 304 validates the representation the client holds
+            return Response(status_code=304, headers={**headers, "ETag": matched, "Vary": "Accept-Encoding"})
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# modules import each other from the service root (e.g. "from dataaccesslayer import ...")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# a throwaway SQLite database, set before dataaccesslayer.database creates the engine
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from dataaccesslayer import repository
+from dataaccesslayer.recent_writes import RecentWrites
+from exceptions.custom_exceptions import DuplicateWeatherException
+
+
+def save_as(monkeypatch, worker: RecentWrites, lat: float, lng: float, kind: str = "current") -> dict:
+    """create_weather_record as run by the worker process that owns `worker`'s map."""
+    monkeypatch.setattr(repository, "recent_weather_writes", worker)
+    return asyncio.run(repository.create_weather_record({"lat": lat, "lng": lng, "snapshot": {}, "kind": kind}))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    asyncio.run(repository.init_db())
+    yield
+
+
+def test_default_confirms_misses_in_the_database():
+    assert RecentWrites().authoritative is False
+
+
+def test_two_workers_sharing_one_database_refuse_a_duplicate(monkeypatch):
+    worker_a, worker_b = RecentWrites(), RecentWrites()
+    worker_a.warm([])
+    worker_b.warm([])
+    save_as(monkeypatch, worker_a, 12.34, 56.78)
+    # worker B never saw that save; its miss is checked against the shared database
+    with pytest.raises(DuplicateWeatherException):
+        save_as(monkeypatch, worker_b, 12.34, 56.78)
+    assert worker_b.stats()["db_checks"] == 1
+    # and worker A answers its own repeat from the map
+    with pytest.raises(DuplicateWeatherException):
+        save_as(monkeypatch, worker_a, 12.34, 56.78)
+    assert worker_a.stats()["hits"] == 1
+
+
+def test_authoritative_maps_would_let_the_duplicate_through(monkeypatch):
+    worker_a, worker_b = RecentWrites(authoritative=True), RecentWrites(authoritative=True)
+    worker_a.warm([])
+    worker_b.warm([])
+    save_as(monkeypatch, worker_a, -1.5, 2.5)
+    assert save_as(monkeypatch, worker_b, -1.5, 2.5)["id"]
+
+
+def test_other_points_and_kinds_are_not_duplicates(monkeypatch):
+    worker = RecentWrites()
+    worker.warm([])
+    save_as(monkeypatch, worker, 40.0, -3.0)
+    assert save_as(monkeypatch, worker, 40.001, -3.0)["id"]
+    assert save_as(monkeypatch, worker, 40.0, -3.0, kind="forecast")["id"]
+    assert save_as(monkeypatch, worker, 40.0, -3.0, kind="forecast")["id"]  # forecasts are never deduplicated
+    with pytest.raises(DuplicateWeatherException):
+        save_as(monkeypatch, worker, 40.0, -3.0)
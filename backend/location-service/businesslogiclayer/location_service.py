@@ -1,49 +1,279 @@
 """
 LocationService orchestrates geocoding and posting to data-service for persistence.
+Queries are classified first (query_parser.py): coordinate literals resolve locally (named after
+the nearest gazetteer place), postal codes reach the geocoder with a country hint (retried
+without it when nothing is found), and queries that exactly name a gazetteer place (in the given
+country) are resolved without an external geocoder call. The gazetteer also serves prefix autocomplete.
+Reverse lookups (coordinates -> nearest gazetteer places and saved locations) use in-memory
+spatial indexes; the saved-location index follows data-service through SavedLocationSync.
+Batch resolves dedupe queries by their normalized form, geocode each distinct query once at the
+rate limiter's BATCH priority with bounded concurrency, and can persist all successes to
+data-service in one bulk call.
 """
 from domainclientlayer.geocode_client import GeocodeClient
+from domainclientlayer.rate_limiter import INTERACTIVE, BATCH
+from domainclientlayer.data_service_client import data_service
+from dataaccesslayer.geocode_cache import normalize_query
+from dataaccesslayer.gazetteer import Gazetteer, GAZETTEER_ENABLED
+from dataaccesslayer.spatial_index import SpatialIndex
+from businesslogiclayer.saved_location_sync import SavedLocationSync, LOCATION_INDEX_SYNC_ENABLED
+from businesslogiclayer.query_parser import parse_query, COORDINATES, CITY_COUNTRY, TEXT
+from exceptions.custom_exceptions import (
+    InvalidInputException,
+    InvalidLocationException,
+    UpstreamUnavailableException,
+    RateLimitedException,
+)
 import os
+import asyncio
+from collections import Counter
+from itertools import islice
 import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
-DATA_SERVICE_URL = os.getenv("DATA_SERVICE_URL", "http://127.0.0.1:8003")
+BATCH_MAX_ITEMS = int(os.getenv("LOCATION_BATCH_MAX_ITEMS", 1000))
+BATCH_CONCURRENCY = int(os.getenv("LOCATION_BATCH_CONCURRENCY", 5))
+COORDINATES_REVERSE = os.getenv("QUERY_COORDINATES_REVERSE", "true").lower() in ("1", "true", "yes", "on")
+COORDINATES_REVERSE_MAX_KM = float(os.getenv("QUERY_COORDINATES_REVERSE_MAX_KM", 25))
+
+
+def _batch_error(exc: Exception) -> dict:
+    """
+    Per-item error info for batch responses, shaped like HttpErrorInfo (status_code/message/detail).
+    """
+    if isinstance(exc, InvalidInputException):
+        return {"status_code": 400, "message": "Invalid input", "detail": str(exc)}
+    if isinstance(exc, InvalidLocationException):
+        return {"status_code": 404, "message": "Location not found", "detail": str(exc)}
+    if isinstance(exc, RateLimitedException):
+        return {"status_code": 429, "message": "Too many requests", "detail": str(exc)}
+    if isinstance(exc, UpstreamUnavailableException):
+        return {"status_code": 503, "message": "Upstream unavailable", "detail": str(exc)}
+    if isinstance(exc, httpx.HTTPStatusError):
+        return {"status_code": 502, "message": "Upstream service error", "detail": f"Geocoder returned {exc.response.status_code}"}
+    if isinstance(exc, httpx.HTTPError):
+        return {"status_code": 502, "message": "Upstream service error", "detail": str(exc) or exc.__class__.__name__}
+    return {"status_code": 500, "message": "Internal Server Error", "detail": str(exc)}
+
+_EXHAUSTED = object()
+
+
+def _payload(query: str, resolution: dict) -> dict:
+    return {
+        "query": query,
+        "lat": float(resolution["lat"]),
+        "lng": float(resolution["lng"]),
+        "display_name": resolution.get("display_name"),
+        "source": resolution.get("source", "opencage")
+    }
+
 
 class LocationService:
     def __init__(self):
         self.client = GeocodeClient()
+        self.gazetteer_enabled = GAZETTEER_ENABLED
+        self.gazetteer = Gazetteer()
+        self.places_index = SpatialIndex()
+        self.saved_index = SpatialIndex()
+        self.saved_sync_enabled = LOCATION_INDEX_SYNC_ENABLED
+        self.saved_sync = SavedLocationSync(self.saved_index)
+        self.query_kinds = Counter()
+        self.hint_retries = 0
+
+    def load_gazetteer(self):
+        """Load the gazetteer and index its places by coordinates (blocking; run it in a worker thread)."""
+        self.gazetteer.load()
+        index = SpatialIndex()
+        for i, place in enumerate(self.gazetteer.places):
+            index.put(i, place.lat, place.lng, place)
+        self.places_index = index
+
+    def reverse(self, lat: float, lng: float, k: int = 5, max_km: float = None) -> dict:
+        """Nearest gazetteer places and saved locations to (lat, lng), with distances in km."""
+        return {
+            "lat": lat,
+            "lng": lng,
+            "places": [{**place.to_dict(), "distance_km": d} for d, place in self.places_index.nearest(lat, lng, k, max_km)],
+            "saved": [{**item, "distance_km": d} for d, item in self.saved_index.nearest(lat, lng, k, max_km)],
+        }
+
+    async def _resolve(self, query: str, priority: int = INTERACTIVE) -> dict:
+        """
+        Coordinate literals locally; otherwise an exact gazetteer match if there is one, else the
+        (cached) external geocoder, with a country hint for postal codes and, only while no
+        gazetteer is loaded to check it against, "place, country".
+        """
+        parsed = parse_query(query, self.gazetteer.country_code)
+        self.query_kinds[parsed.kind] += 1
+        if parsed.kind == COORDINATES:
+            return self._resolve_coordinates(parsed.lat, parsed.lng)
+        kind = parsed.kind
+        if self.gazetteer_enabled and kind in (TEXT, CITY_COUNTRY):
+            if kind == CITY_COUNTRY:
+                place = self.gazetteer.exact(parsed.place, parsed.country_code)
+            else:
+                place = self.gazetteer.exact(query)
+            if place is not None:
+                return {"lat": place.lat, "lng": place.lng, "display_name": place.display_name, "source": "gazetteer"}
+            if kind == CITY_COUNTRY and self.gazetteer.loaded:
+                # the gazetteer does not know the place in that country ("Atlanta, Georgia"
+                # is a US state, not GE): geocode the query as written, without a hint
+                kind = TEXT
+        if kind == TEXT:
+            return await self.client.geocode(query, priority)
+        return await self._geocode_hinted(parsed, query, priority)
+
+    async def _geocode_hinted(self, parsed, query: str, priority: int) -> dict:
+        """
+        Geocode with the parsed country hint; when that finds nothing the hint may be the wrong
+        guess (a ZIP-shaped code from another country, an unconfirmed "place, country"), so the
+        query is retried as written without it. Hinted misses are never negatively cached.
+        """
+        try:
+            return await self.client.geocode(parsed.query, priority, parsed.country_code)
+        except InvalidLocationException:
+            self.hint_retries += 1
+            return await self.client.geocode(query, priority)
+
+    def _resolve_coordinates(self, lat: float, lng: float) -> dict:
+        """A coordinate query, named after the nearest gazetteer place within COORDINATES_REVERSE_MAX_KM."""
+        display_name = f"{lat:.5f}, {lng:.5f}"
+        if COORDINATES_REVERSE:
+            nearest = self.places_index.nearest(lat, lng, 1, COORDINATES_REVERSE_MAX_KM)
+            if nearest:
+                display_name = nearest[0][1].display_name
+        return {"lat": lat, "lng": lng, "display_name": display_name, "source": "coordinates"}
+
+    def autocomplete(self, query: str, limit: int = 10) -> list:
+        """Population-ranked gazetteer places whose name starts with the query."""
+        if not self.gazetteer_enabled:
+            return []
+        return [place.to_dict() for place in self.gazetteer.search(query, limit)]
 
     async def resolve_location_only(self, query: str) -> dict:
         """
         Resolve location without storing to database.
         Returns geocoding data only.
         """
-        resolution = await self.client.geocode(query)
-        payload = {
-            "query": query,
-            "lat": float(resolution["lat"]),
-            "lng": float(resolution["lng"]),
-            "display_name": resolution.get("display_name"),
-            "source": resolution.get("source", "opencage")
-        }
-        return payload
+        resolution = await self._resolve(query)
+        return _payload(query, resolution)
 
     async def resolve_location_and_store(self, query: str) -> dict:
         # 1) get geocoding
-        resolution = await self.client.geocode(query)
+        resolution = await self._resolve(query)
         # 2) build payload for data-service
-        payload = {
-            "query": query,
-            "lat": float(resolution["lat"]),
-            "lng": float(resolution["lng"]),
-            "display_name": resolution.get("display_name"),
-            "source": resolution.get("source", "opencage")
-        }
+        payload = _payload(query, resolution)
         # 3) POST to data-service to persist
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(f"{DATA_SERVICE_URL}/api/v1/records/location", json=payload)
-            # If data-service returns non-2xx raise for upstream error
-            resp.raise_for_status()
-            stored = resp.json()
+        resp = await data_service.post("/api/v1/records/location", json=payload)
+        # If data-service returns non-2xx raise for upstream error
+        resp.raise_for_status()
+        stored = resp.json()
+        self.saved_sync.index_location({**payload, "id": stored.get("id")})
         # return combined info
         return {**payload, "id": stored.get("id")}
+
+    def _group(self, queries: list) -> dict:
+        """normalized query -> input indexes, in first-seen order; blank queries map to None."""
+        if len(queries) > BATCH_MAX_ITEMS:
+            raise InvalidInputException(f"Too many queries. Maximum {BATCH_MAX_ITEMS} per batch")
+        groups = {}
+        for i, query in enumerate(queries):
+            key = normalize_query(query) if query and query.strip() else None
+            groups.setdefault(key, []).append(i)
+        return groups
+
+    async def _resolve_outcome(self, key, query: str) -> dict:
+        if key is None:
+            return {"ok": False, "error": _batch_error(InvalidInputException("Empty query"))}
+        try:
+            resolution = await self._resolve(query.strip(), BATCH)
+        except Exception as e:
+            return {"ok": False, "error": _batch_error(e)}
+        return {"ok": True, **_payload(query.strip(), resolution)}
+
+    async def resolve_batch(self, queries: list, save: bool = False) -> dict:
+        """
+        Resolve many queries; each distinct normalized query is geocoded once, at most
+        BATCH_CONCURRENCY at a time. Returns { results: [ {index, ok, query, lat, lng, display_name,
+        source[, stored]} | {index, ok, query, error} ] } in input order.
+        With save, the distinct successes are persisted in one data-service bulk call and each
+        successful item carries "stored" ({status: created|duplicate|error, id | detail}).
+        """
+        groups = self._group(queries)
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def run(key, query: str) -> dict:
+            async with semaphore:
+                return await self._resolve_outcome(key, query)
+
+        keys = list(groups)
+        outcomes = dict(zip(keys, await asyncio.gather(*(run(k, queries[groups[k][0]]) for k in keys))))
+        if save:
+            stored = await self._store_bulk([(k, outcomes[k]) for k in keys if k is not None and outcomes[k]["ok"]])
+            for key, status in stored.items():
+                outcomes[key]["stored"] = status
+
+        results = [None] * len(queries)
+        for key, indexes in groups.items():
+            for i in indexes:
+                results[i] = {"index": i, **outcomes[key], "query": queries[i]}
+        return {"results": results}
+
+    async def _store_bulk(self, resolved: list) -> dict:
+        """POST resolved payloads to data-service's bulk endpoint; key -> per-item store status."""
+        if not resolved:
+            return {}
+        records = [{field: outcome[field] for field in ("query", "lat", "lng", "display_name", "source")}
+                   for _, outcome in resolved]
+        try:
+            resp = await data_service.post("/api/v1/records/location/bulk", json={"records": records}, timeout=30.0)
+            resp.raise_for_status()
+            items = resp.json()["results"]
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            error = {"status": "error", "detail": str(e) or e.__class__.__name__}
+            return {key: error for key, _ in resolved}
+        statuses = {}
+        for (key, _), item in zip(resolved, items):
+            if item.get("status") == "created":
+                self.saved_sync.index_location(item["record"])
+                statuses[key] = {"status": "created", "id": item["record"]["id"]}
+            else:
+                statuses[key] = {"status": item.get("status", "error"), "detail": item.get("detail")}
+        return statuses
+
+    def stream_resolve(self, queries: list):
+        """
+        Async generator yielding one result per input query as soon as its (deduplicated)
+        lookup finishes, in completion order; items are shaped like resolve_batch's results,
+        without persisting. At most BATCH_CONCURRENCY lookups are in flight; closing the
+        generator cancels the ones still running.
+        The batch is validated here, before the generator exists, so an oversized batch raises
+        InvalidInputException (400) before a streaming response has been started.
+        """
+        return self._stream_groups(queries, self._group(queries))
+
+    async def _stream_groups(self, queries: list, groups: dict):
+        pending_keys = iter(groups)
+        keys_of = {}
+
+        def start(key):
+            task = asyncio.ensure_future(self._resolve_outcome(key, queries[groups[key][0]]))
+            keys_of[task] = key
+            return task
+
+        pending = {start(k) for k in islice(pending_keys, BATCH_CONCURRENCY)}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # refill the window before handing results out so lookups keep running while the client reads
+                for _ in done:
+                    key = next(pending_keys, _EXHAUSTED)
+                    if key is not _EXHAUSTED:
+                        pending.add(start(key))
+                for task in done:
+                    for i in groups[keys_of.pop(task)]:
+                        yield {"index": i, **task.result(), "query": queries[i]}
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,122 @@
+"""
+Structured parsing of free-text location queries, so the cheap cases never reach the geocoder:
+  - coordinates: decimal ("43.65, -79.38", "43.65N 79.38W") and degrees-minutes-seconds
+    ("43°39'N 79°23'W", "40° 26.767' N, 79° 58.933' W") literals. These resolve locally.
+  - postal_code: US ZIP, Canadian and UK postcodes, passed upstream with a country hint.
+  - city_country: "<place>, <country>" where the last part names a country (gazetteer country
+    names plus a few common aliases). The hint is only a guess ("Atlanta, Georgia"): the
+    service keeps it when the gazetteer has the place in that country and otherwise geocodes
+    the query as written (see LocationService._resolve).
+  - text: anything else, geocoded as-is.
+Parsing is pure string work (no I/O); ambiguous input falls through to "text".
+"""
+import re
+from typing import Callable, Optional
+from dataaccesslayer.geocode_cache import normalize_query
+
+COORDINATES = "coordinates"
+POSTAL_CODE = "postal_code"
+CITY_COUNTRY = "city_country"
+TEXT = "text"
+
+COUNTRY_ALIASES = {
+    "usa": "US", "us": "US", "u s a": "US", "america": "US",
+    "uk": "GB", "u k": "GB", "england": "GB", "scotland": "GB", "wales": "GB", "great britain": "GB",
+    "uae": "AE", "holland": "NL", "deutschland": "DE", "espana": "ES", "españa": "ES",
+}
+
+_COMPONENT = r"""
+    (?P<{p}h1>[NSEWnsew])?\s*
+    (?P<{p}deg>[+-]?\d{{1,3}}(?:\.\d+)?)\s*(?P<{p}degmark>°|º|˚|deg\b|d\b)?\s*
+    (?:(?P<{p}min>\d{{1,2}}(?:\.\d+)?)\s*(?:'|′|’|m\b|min\b)\s*)?
+    (?:(?P<{p}sec>\d{{1,2}}(?:\.\d+)?)\s*(?:"|″|”|''|′′|s\b|sec\b)\s*)?
+    (?P<{p}h2>[NSEWnsew])?
+"""
+_COORDINATES_RE = re.compile(
+    r"^\s*" + _COMPONENT.format(p="a") + r"\s*(?P<sep>[,;/]|\s)\s*" + _COMPONENT.format(p="b") + r"\s*$",
+    re.VERBOSE,
+)
+_POSTAL_CODES = (
+    (re.compile(r"^\d{5}(?:-\d{4})?$"), "US"),
+    (re.compile(r"^[ABCEGHJ-NPRSTVXY]\d[ABCEGHJ-NPRSTV-Z] ?\d[ABCEGHJ-NPRSTV-Z]\d$", re.IGNORECASE), "CA"),
+    (re.compile(r"^[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}$", re.IGNORECASE), "GB"),
+)
+
+
+class ParsedQuery:
+    __slots__ = ("kind", "query", "lat", "lng", "place", "country_code")
+
+    def __init__(self, kind: str, query: str, lat: float = None, lng: float = None,
+                 place: str = None, country_code: str = None):
+        self.kind = kind
+        self.query = query
+        self.lat = lat
+        self.lng = lng
+        self.place = place
+        self.country_code = country_code
+
+
+def _component(match, p: str):
+    """(signed decimal degrees, hemisphere letter or None, had DMS/hemisphere markers)"""
+    deg = match.group(f"{p}deg")
+    minutes, seconds = match.group(f"{p}min"), match.group(f"{p}sec")
+    hemispheres = [h.upper() for h in (match.group(f"{p}h1"), match.group(f"{p}h2")) if h]
+    if len(hemispheres) > 1 or ((minutes or seconds) and "." in deg):
+        return None
+    value = abs(float(deg)) + float(minutes or 0) / 60 + float(seconds or 0) / 3600
+    if (minutes and float(minutes) >= 60) or (seconds and float(seconds) >= 60):
+        return None
+    hemisphere = hemispheres[0] if hemispheres else None
+    negative = deg.startswith("-") or hemisphere in ("S", "W")
+    marked = bool(hemisphere or minutes or seconds or match.group(f"{p}degmark"))
+    return (-value if negative else value), hemisphere, marked
+
+
+def parse_coordinates(query: str) -> Optional[tuple]:
+    """(lat, lng) for a decimal or DMS coordinate literal, else None."""
+    match = _COORDINATES_RE.match(query)
+    if not match:
+        return None
+    a, b = _component(match, "a"), _component(match, "b")
+    if a is None or b is None:
+        return None
+    (first, h_first, marked_first), (second, h_second, marked_second) = a, b
+    # bare "10 20" is more likely part of an address than a coordinate: ask for some evidence
+    if match.group("sep").isspace() and not (marked_first or marked_second or "." in query):
+        return None
+    # one hemisphere letter does not say which axis the other number is ("12 34 N"): need both
+    if (h_first is None) != (h_second is None):
+        return None
+    if h_first in ("E", "W") or h_second in ("N", "S"):
+        if h_first in ("N", "S") or h_second in ("E", "W"):
+            return None  # both components claim the same axis
+        first, second = second, first  # "79.38W 43.65N"
+    if not (-90 <= first <= 90 and -180 <= second <= 180):
+        return None
+    return first, second
+
+
+def parse_query(query: str, country_code: Callable[[str], Optional[str]] = None) -> ParsedQuery:
+    """
+    Classify a query. country_code maps a country name to its ISO code (e.g.
+    Gazetteer.country_code); COUNTRY_ALIASES are tried as well.
+    """
+    text = query.strip()
+    coordinates = parse_coordinates(text)
+    if coordinates is not None:
+        return ParsedQuery(COORDINATES, text, lat=coordinates[0], lng=coordinates[1])
+
+    for pattern, code in _POSTAL_CODES:
+        if pattern.match(text):
+            compact = text.upper().replace(" ", "")
+            postal = compact if code == "US" else f"{compact[:-3]} {compact[-3:]}"
+            return ParsedQuery(POSTAL_CODE, postal, country_code=code)
+
+    parts = [p.strip() for p in text.split(",")]
+    if len(parts) >= 2 and all(parts):
+        key = normalize_query(parts[-1])
+        code = COUNTRY_ALIASES.get(key) or (country_code(key) if country_code else None)
+        if code:
+            return ParsedQuery(CITY_COUNTRY, text, place=", ".join(parts[:-1]), country_code=code)
+
+    return ParsedQuery(TEXT, text)
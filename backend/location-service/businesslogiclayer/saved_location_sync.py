@@ -0,0 +1,101 @@
+"""
+Keeps the spatial index of saved locations in step with data-service.
+Every LOCATION_INDEX_SYNC_INTERVAL seconds the location list is requested with If-None-Match, so
+an unchanged table costs data-service one revision lookup and a bodyless 304. When it did change,
+the list is diffed against the index by id and only added, moved/renamed and deleted locations
+are applied. Locations saved through this service are indexed immediately (see index), so they
+are found before the next poll.
+"""
+import os
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from dataaccesslayer.spatial_index import SpatialIndex
+from domainclientlayer.data_service_client import DataServiceClient, data_service
+load_dotenv()
+
+LOCATION_INDEX_SYNC_ENABLED = os.getenv("LOCATION_INDEX_SYNC_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+LOCATION_INDEX_SYNC_INTERVAL = float(os.getenv("LOCATION_INDEX_SYNC_INTERVAL", 30))
+
+_FIELDS = ("id", "query", "display_name", "lat", "lng", "source")
+
+
+class SavedLocationSync:
+    def __init__(self, index: SpatialIndex, interval: float = LOCATION_INDEX_SYNC_INTERVAL, client: DataServiceClient = None):
+        self.index = index
+        self.interval = interval
+        self.client = client or data_service
+        self._etag = None
+        self._task = None
+        self._polls = 0
+        self._not_modified = 0
+        self._added = 0
+        self._updated = 0
+        self._removed = 0
+        self._last_error = None
+
+    def index_location(self, location: dict):
+        """Add or update one saved location (a data-service location record)."""
+        if location.get("id") is None or location.get("lat") is None or location.get("lng") is None:
+            return
+        item = {field: location.get(field) for field in _FIELDS}
+        current = self.index.get(item["id"])
+        if current == item:
+            return
+        if current is None:
+            self._added += 1
+        else:
+            self._updated += 1
+        self.index.put(item["id"], float(item["lat"]), float(item["lng"]), item)
+
+    def apply(self, locations: list):
+        """Diff a full location list against the index."""
+        seen = set()
+        for location in locations:
+            self.index_location(location)
+            seen.add(location.get("id"))
+        for key in [k for k in self.index.keys() if k not in seen]:
+            self.index.remove(key)
+            self._removed += 1
+
+    async def poll(self):
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        resp = await self.client.get("/api/v1/records/location", headers=headers)
+        self._polls += 1
+        if resp.status_code == 304:
+            self._not_modified += 1
+            return
+        resp.raise_for_status()
+        self.apply(resp.json())
+        self._etag = resp.headers.get("etag")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+                self._last_error = None
+            except (httpx.HTTPError, ValueError) as e:
+                self._last_error = str(e) or e.__class__.__name__
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "polls": self._polls,
+            "not_modified": self._not_modified,
+            "added": self._added,
+            "updated": self._updated,
+            "removed": self._removed,
+            "last_error": self._last_error,
+        }
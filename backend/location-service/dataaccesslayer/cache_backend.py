@@ -0,0 +1,250 @@
+"""
+Cache storage backends shared by the service caches (weather payloads, geocode results).
+  - MemoryBackend: bounded in-process LRU (entry count and estimated bytes). Fastest, but every
+    uvicorn worker holds its own copy and its own hit rate.
+  - RedisBackend: any Redis-protocol server (redis-server, KeyDB, Dragonfly, ...) through the
+    optional redis.asyncio client, so all workers and replicas share one cache. Values are stored
+    as orjson bytes, zlib-compressed above CACHE_COMPRESS_MIN_BYTES, with a server-side expiry.
+    Size bounds are the server's job (maxmemory + an LRU policy). Errors and timeouts count as
+    misses (as do undecodable values) so a cache outage slows requests down instead of failing them.
+CACHE_BACKEND=memory|redis selects the backend; each records per-operation latency percentiles
+for /metrics so the two can be compared. The same module is copied into each service.
+"""
+import os
+import time
+import zlib
+import asyncio
+from collections import OrderedDict, deque
+import orjson
+from dotenv import load_dotenv
+load_dotenv()
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # optional: memory backend only
+    aioredis = None
+    RedisError = OSError
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+CACHE_REDIS_PREFIX = os.getenv("CACHE_REDIS_PREFIX", "weather-app")
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", 0.25))
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024))
+
+_RAW = b"j"
+_ZLIB = b"z"
+
+
+def encode_value(value) -> bytes:
+    """Compact wire format: 1-byte tag + orjson, zlib-compressed when large enough to pay off."""
+    body = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    if len(body) >= CACHE_COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(body, 1)
+    return _RAW + body
+
+
+def decode_value(blob: bytes):
+    if blob[:1] == _ZLIB:
+        return orjson.loads(zlib.decompress(blob[1:]))
+    return orjson.loads(blob[1:])
+
+
+class OperationLatency:
+    """Sliding window of one operation's latencies with call / error counters."""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, seconds: float, error: bool = False):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self._samples.append(seconds)
+
+    def stats(self) -> dict:
+        ordered = sorted(self._samples)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+            return round(ordered[index] * 1000, 3)
+
+        return {"calls": self.calls, "errors": self.errors, "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99)}
+
+
+class CacheBackend:
+    """
+    Async key/value store with per-key expiry. Values are JSON-compatible objects; get returns
+    None on a miss. Subclasses implement _get/_set/_delete/_clear; timing is done here.
+    """
+
+    name = "base"
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._latency = {op: OperationLatency() for op in ("get", "set", "delete")}
+        self._last_error = None
+
+    async def _timed(self, op: str, call, default=None):
+        started = time.perf_counter()
+        try:
+            result = await call
+        except (RedisError, OSError, asyncio.TimeoutError, ValueError, zlib.error) as e:
+            self._latency[op].record(time.perf_counter() - started, error=True)
+            self._last_error = str(e) or e.__class__.__name__
+            return default
+        self._latency[op].record(time.perf_counter() - started)
+        return result
+
+    async def get(self, key: str):
+        return await self._timed("get", self._get(key))
+
+    async def set(self, key: str, value, ttl: float):
+        await self._timed("set", self._set(key, value, ttl))
+
+    async def delete(self, key: str):
+        await self._timed("delete", self._delete(key))
+
+    async def clear(self):
+        await self._clear()
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "namespace": self.namespace,
+            "latency": {op: latency.stats() for op, latency in self._latency.items()},
+            "last_error": self._last_error,
+        }
+
+
+class MemoryBackend(CacheBackend):
+    """
+    TTL + LRU store in this process. Values are kept as Python objects (no serialization);
+    their size is estimated once, from the compact JSON encoding, when they are stored.
+    Not thread-safe; it is only touched from the event loop.
+    """
+
+    name = "memory"
+
+    def __init__(self, namespace: str, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024):
+        super().__init__(namespace)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    async def _get(self, key: str):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        value, expires_at, _ = item
+        if expires_at <= time.time():
+            self._remove(key)
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def _set(self, key: str, value, ttl: float):
+        size = len(orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS))
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (value, time.time() + ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    async def _delete(self, key: str):
+        self._remove(key)
+
+    async def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
+
+
+class RedisBackend(CacheBackend):
+    """Shared store on a Redis-protocol server; keys are "<CACHE_REDIS_PREFIX>:<namespace>:<key>"."""
+
+    name = "redis"
+
+    def __init__(self, namespace: str, url: str = CACHE_REDIS_URL, prefix: str = CACHE_REDIS_PREFIX,
+                 timeout: float = CACHE_REDIS_TIMEOUT, client=None):
+        if client is None and aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)")
+        super().__init__(namespace)
+        self.url = url
+        self.timeout = timeout
+        self._prefix = f"{prefix}:{namespace}:"
+        # client can be injected, e.g. fakeredis.aioredis.FakeRedis() in local experiments
+        self._client = client or aioredis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout, health_check_interval=30
+        )
+        self._bytes_written = 0
+        self._bytes_read = 0
+
+    async def _get(self, key: str):
+        blob = await asyncio.wait_for(self._client.get(self._prefix + key), self.timeout)
+        if blob is None:
+            return None
+        self._bytes_read += len(blob)
+        return decode_value(blob)
+
+    async def _set(self, key: str, value, ttl: float):
+        blob = encode_value(value)
+        self._bytes_written += len(blob)
+        await asyncio.wait_for(self._client.set(self._prefix + key, blob, px=max(1, int(ttl * 1000))), self.timeout)
+
+    async def _delete(self, key: str):
+        await asyncio.wait_for(self._client.delete(self._prefix + key), self.timeout)
+
+    async def _clear(self):
+        async for key in self._client.scan_iter(match=self._prefix + "*", count=500):
+            await self._client.delete(key)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "url": self.url.split("@")[-1],  # never report credentials
+            "bytes_written": self._bytes_written,
+            "bytes_read": self._bytes_read,
+        }
+
+
+def create_backend(namespace: str, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024,
+                   kind: str = CACHE_BACKEND) -> CacheBackend:
+    """Backend selected by CACHE_BACKEND; the bounds apply to the in-process backend."""
+    if kind == "redis":
+        return RedisBackend(namespace)
+    if kind != "memory":
+        raise ValueError(f"Unknown CACHE_BACKEND '{kind}' (expected memory or redis)")
+    return MemoryBackend(namespace, max_entries=max_entries, max_bytes=max_bytes)
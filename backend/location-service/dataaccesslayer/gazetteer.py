@@ -0,0 +1,225 @@
+"""
+Offline gazetteer: populated places loaded from a GeoNames-format cities file (GAZETTEER_PATH;
+plain, .gz or .zip, e.g. cities15000.zip) with optional admin1 / country name files for display.
+Names (name, ASCII name and, with GAZETTEER_ALTERNATE_NAMES, alternate names) are normalized
+like geocode cache keys and kept in one sorted array of (key, place) pairs:
+  - prefix search is a bisect for the key range, ranked by population;
+  - the top results for every prefix of up to GAZETTEER_PRECOMPUTE_PREFIX characters are
+    precomputed at load time, since those ranges span most of the index;
+  - exact lookups go through a key -> places dict (optionally restricted to one country);
+  - country names from the country file map back to ISO codes for query parsing.
+The index is built once, off the event loop, and is read-only afterwards.
+"""
+import io
+import os
+import gzip
+import time
+import heapq
+import zipfile
+from array import array
+from bisect import bisect_left
+from typing import Optional
+from dotenv import load_dotenv
+from dataaccesslayer.geocode_cache import normalize_query
+load_dotenv()
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+GAZETTEER_ENABLED = os.getenv("GAZETTEER_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(_DATA_DIR, "cities.txt"))
+GAZETTEER_ADMIN1_PATH = os.getenv("GAZETTEER_ADMIN1_PATH", os.path.join(_DATA_DIR, "admin1CodesASCII.txt"))
+GAZETTEER_COUNTRIES_PATH = os.getenv("GAZETTEER_COUNTRIES_PATH", os.path.join(_DATA_DIR, "countryInfo.txt"))
+GAZETTEER_ALTERNATE_NAMES = os.getenv("GAZETTEER_ALTERNATE_NAMES", "true").lower() in ("1", "true", "yes", "on")
+GAZETTEER_MIN_POPULATION = int(os.getenv("GAZETTEER_MIN_POPULATION", 0))
+GAZETTEER_PRECOMPUTE_PREFIX = int(os.getenv("GAZETTEER_PRECOMPUTE_PREFIX", 3))
+AUTOCOMPLETE_MAX_RESULTS = int(os.getenv("AUTOCOMPLETE_MAX_RESULTS", 20))
+
+_KEY_END = "\U0010ffff"
+
+
+class Place:
+    __slots__ = ("id", "name", "lat", "lng", "country_code", "admin1", "population", "timezone", "display_name")
+
+    def __init__(self, id: int, name: str, lat: float, lng: float, country_code: str, admin1: str,
+                 population: int, timezone: str, display_name: str):
+        self.id = id
+        self.name = name
+        self.lat = lat
+        self.lng = lng
+        self.country_code = country_code
+        self.admin1 = admin1
+        self.population = population
+        self.timezone = timezone
+        self.display_name = display_name
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "display_name": self.display_name,
+            "lat": self.lat,
+            "lng": self.lng,
+            "country_code": self.country_code,
+            "admin1": self.admin1,
+            "population": self.population,
+            "timezone": self.timezone,
+        }
+
+
+def _lines(path: str):
+    """Text lines of a plain, gzip or zip (first .txt member) file."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            member = next(n for n in archive.namelist() if n.endswith(".txt"))
+            with archive.open(member) as raw:
+                yield from io.TextIOWrapper(raw, encoding="utf-8")
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        yield from f
+
+
+def _names(path: str, value_column: int) -> dict:
+    """First column -> value column of a tab-separated GeoNames side file; {} if absent."""
+    if not path or not os.path.exists(path):
+        return {}
+    names = {}
+    for line in _lines(path):
+        if line.startswith("#"):
+            continue
+        cols = line.rstrip("\n").split("\t")
+        if len(cols) > value_column:
+            names[cols[0]] = cols[value_column]
+    return names
+
+
+class Gazetteer:
+    def __init__(self, path: str = GAZETTEER_PATH, admin1_path: str = GAZETTEER_ADMIN1_PATH,
+                 countries_path: str = GAZETTEER_COUNTRIES_PATH, alternate_names: bool = GAZETTEER_ALTERNATE_NAMES,
+                 min_population: int = GAZETTEER_MIN_POPULATION, precompute_prefix: int = GAZETTEER_PRECOMPUTE_PREFIX,
+                 max_results: int = AUTOCOMPLETE_MAX_RESULTS):
+        self.path = path
+        self.admin1_path = admin1_path
+        self.countries_path = countries_path
+        self.alternate_names = alternate_names
+        self.min_population = min_population
+        self.precompute_prefix = precompute_prefix
+        self.max_results = max_results
+        self.places = []
+        self._keys = []
+        self._key_places = array("I")
+        self._exact = {}
+        self._top = {}
+        self._country_codes = {}
+        self._load_ms = None
+        self._load_error = None
+        self._searches = 0
+        self._exact_lookups = 0
+        self._exact_hits = 0
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.places)
+
+    def load(self):
+        """Read the files and build the index (blocking; run it in a worker thread)."""
+        started = time.perf_counter()
+        try:
+            self._build()
+            self._load_error = None
+        except (OSError, ValueError, StopIteration, zipfile.BadZipFile) as e:
+            self._load_error = str(e) or e.__class__.__name__
+            print(f"[gazetteer] failed to load {self.path}: {self._load_error}")
+        self._load_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def _build(self):
+        admin1 = _names(self.admin1_path, 1)
+        countries = _names(self.countries_path, 4)
+        places, pairs = [], []
+        for line in _lines(self.path):
+            if line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 15 or (cols[6] and cols[6] != "P"):
+                continue
+            population = int(cols[14] or 0)
+            if population < self.min_population:
+                continue
+            name, code, region = cols[1], cols[8], admin1.get(f"{cols[8]}.{cols[10]}")
+            display = ", ".join(part for part in (name, region, countries.get(code, code)) if part)
+            index = len(places)
+            places.append(Place(int(cols[0]), name, float(cols[4]), float(cols[5]), code, region,
+                                population, cols[17] if len(cols) > 17 else None, display))
+            names = {name, cols[2]}
+            if self.alternate_names and cols[3]:
+                names.update(cols[3].split(","))
+            for key in {normalize_query(n) for n in names if n.strip()}:
+                pairs.append((key, index))
+        pairs.sort()
+        exact = {}
+        for key, index in pairs:
+            exact.setdefault(key, []).append(index)
+        for indexes in exact.values():
+            indexes.sort(key=lambda i: -places[i].population)
+        self.places = places
+        self._keys = [key for key, _ in pairs]
+        self._key_places = array("I", (index for _, index in pairs))
+        self._exact = exact
+        self._top = self._precompute(places, pairs)
+        self._country_codes = {normalize_query(name): code for code, name in countries.items() if name}
+
+    def _precompute(self, places: list, pairs: list) -> dict:
+        """prefix -> most populous place indexes (up to max_results) for every short prefix."""
+        by_population = sorted(range(len(places)), key=lambda i: -places[i].population)
+        keys_of = {}
+        for key, index in pairs:
+            keys_of.setdefault(index, []).append(key)
+        top = {}
+        for index in by_population:
+            prefixes = {key[:n] for key in keys_of.get(index, ()) for n in range(1, self.precompute_prefix + 1)}
+            for prefix in prefixes:
+                ranked = top.setdefault(prefix, [])
+                if len(ranked) < self.max_results:
+                    ranked.append(index)
+        return top
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Places with a name starting with the normalized query, most populous first."""
+        self._searches += 1
+        prefix = normalize_query(query)
+        limit = max(1, min(limit, self.max_results))
+        if not prefix or not self.places:
+            return []
+        if len(prefix) <= self.precompute_prefix:
+            return [self.places[i] for i in self._top.get(prefix, ())[:limit]]
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + _KEY_END, lo)
+        candidates = set(self._key_places[lo:hi])
+        best = heapq.nsmallest(limit, candidates, key=lambda i: (-self.places[i].population, i))
+        return [self.places[i] for i in best]
+
+    def exact(self, query: str, country_code: str = None) -> Optional[Place]:
+        """The most populous place (in country_code, if given) whose name equals the normalized query."""
+        self._exact_lookups += 1
+        for index in self._exact.get(normalize_query(query), ()):
+            place = self.places[index]
+            if country_code is None or place.country_code == country_code:
+                self._exact_hits += 1
+                return place
+        return None
+
+    def country_code(self, name: str) -> Optional[str]:
+        """ISO code of a country named in the country file ("France" -> "FR"), if known."""
+        return self._country_codes.get(normalize_query(name))
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "places": len(self.places),
+            "keys": len(self._keys),
+            "precomputed_prefixes": len(self._top),
+            "load_ms": self._load_ms,
+            "load_error": self._load_error,
+            "searches": self._searches,
+            "exact_lookups": self._exact_lookups,
+            "exact_hits": self._exact_hits,
+        }
@@ -0,0 +1,137 @@
+"""
+Two-tier cache of geocode results, keyed by the normalized query (see normalize_query):
+  1. the configured CacheBackend (cache_backend.py): in-process LRU by default, or shared by all
+     workers with CACHE_BACKEND=redis;
+  2. a persistent local SQLite tier (geocode_store.py) that survives restarts. Disk hits are
+     promoted to the first tier for their remaining lifetime.
+Places do not move, so resolutions live for GEOCODE_CACHE_TTL (a week by default) and every hit
+saves one quota-limited OpenCage call. Queries that resolved to nothing are remembered for the
+short GEOCODE_CACHE_NEGATIVE_TTL, so repeated bad queries do not spend quota either.
+A failing disk tier is skipped (and counted); it never fails a lookup.
+"""
+import os
+import time
+import sqlite3
+import unicodedata
+from dotenv import load_dotenv
+from dataaccesslayer.cache_backend import CacheBackend, create_backend
+from dataaccesslayer.geocode_store import GeocodeStore
+load_dotenv()
+
+GEOCODE_CACHE_ENABLED = os.getenv("GEOCODE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", 7 * 86400))
+GEOCODE_CACHE_NEGATIVE_TTL = float(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL", 600))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", 10000))
+GEOCODE_CACHE_MAX_BYTES = int(os.getenv("GEOCODE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+GEOCODE_CACHE_DISK_ENABLED = os.getenv("GEOCODE_CACHE_DISK_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+
+NOT_FOUND = "not_found"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key for a free-text query: accents folded (NFKD, diacritics dropped), case-folded,
+    punctuation treated as whitespace and whitespace collapsed.
+    "  Montréal,  QC " and "montreal qc" share a key. Only the generic above/below diacritics
+    (combining class >= 200) are dropped, so marks that change letters in other scripts
+    (e.g. the Devanagari virama) are kept.
+    """
+    text = unicodedata.normalize("NFKD", query)
+    text = "".join(ch for ch in text if unicodedata.combining(ch) < 200)
+    text = unicodedata.normalize("NFC", text).casefold()
+    text = "".join(ch if unicodedata.category(ch)[0] in "LNM" else " " for ch in text)
+    return " ".join(text.split()) or " ".join(query.casefold().split())
+
+
+class GeocodeCache:
+    def __init__(
+        self,
+        ttl: float = GEOCODE_CACHE_TTL,
+        negative_ttl: float = GEOCODE_CACHE_NEGATIVE_TTL,
+        max_entries: int = GEOCODE_CACHE_MAX_ENTRIES,
+        max_bytes: int = GEOCODE_CACHE_MAX_BYTES,
+        enabled: bool = GEOCODE_CACHE_ENABLED,
+        backend: CacheBackend = None,
+        store: GeocodeStore = None,
+        disk_enabled: bool = GEOCODE_CACHE_DISK_ENABLED,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.enabled = enabled
+        self.backend = backend or create_backend("geocode", max_entries=max_entries, max_bytes=max_bytes)
+        self.store = store or (GeocodeStore() if disk_enabled else None)
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._disk_errors = 0
+        self._last_disk_error = None
+
+    async def get(self, key: str):
+        """
+        The cached record for a normalized query, or None: a resolution dict, or
+        {"not_found": message} for a query that recently resolved to nothing.
+        """
+        if not self.enabled:
+            return None
+        record = await self.backend.get(key)
+        if record is not None:
+            self._memory_hits += 1
+        elif self.store is not None:
+            try:
+                row = await self.store.get(key)
+            except (sqlite3.Error, OSError) as e:
+                self._disk_error(e)
+                row = None
+            if row is not None:
+                record, expires_at = row
+                self._disk_hits += 1
+                await self.backend.set(key, record, expires_at - time.time())
+        if record is None:
+            self._misses += 1
+        elif NOT_FOUND in record:
+            self._negative_hits += 1
+        return record
+
+    async def set(self, key: str, resolution: dict, persist: bool = True):
+        """persist=False keeps the record out of the disk tier (e.g. mock-mode results)."""
+        await self._put(key, resolution, self.ttl, persist)
+
+    async def set_not_found(self, key: str, message: str, persist: bool = True):
+        await self._put(key, {NOT_FOUND: message}, self.negative_ttl, persist)
+
+    async def _put(self, key: str, record: dict, ttl: float, persist: bool = True):
+        if not self.enabled or ttl <= 0:
+            return
+        await self.backend.set(key, record, ttl)
+        if persist and self.store is not None:
+            try:
+                await self.store.put(key, record, time.time() + ttl)
+            except (sqlite3.Error, OSError) as e:
+                self._disk_error(e)
+
+    def _disk_error(self, e: Exception):
+        self._disk_errors += 1
+        self._last_disk_error = str(e) or e.__class__.__name__
+
+    async def aclose(self):
+        await self.backend.aclose()
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> dict:
+        hits = self._memory_hits + self._disk_hits
+        lookups = hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "negative_hits": self._negative_hits,
+            "misses": self._misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "backend": self.backend.stats(),
+            "disk": {**self.store.stats(), "errors": self._disk_errors, "last_error": self._last_disk_error}
+            if self.store is not None else None,
+        }
@@ -0,0 +1,101 @@
+"""
+Persistent tier of the geocode cache: a local SQLite file (WAL) mapping normalized queries to
+resolutions (or not-found markers) with an absolute expiry, so cached geocodes survive restarts.
+Losing the file only costs quota, hence synchronous=NORMAL. Expired rows are pruned, and the
+table is trimmed to GEOCODE_CACHE_DISK_MAX_ENTRIES (soonest-expiring first), every
+PRUNE_EVERY writes. All SQLite work runs in a worker thread so the event loop never blocks on disk.
+"""
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+import orjson
+from dotenv import load_dotenv
+load_dotenv()
+
+GEOCODE_CACHE_DB_PATH = os.getenv("GEOCODE_CACHE_DB_PATH", "./data/geocode_cache.db")
+GEOCODE_CACHE_DISK_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_DISK_MAX_ENTRIES", 200000))
+PRUNE_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_geocode_cache_expires ON geocode_cache (expires_at);
+"""
+
+
+class GeocodeStore:
+    def __init__(self, path: str = GEOCODE_CACHE_DB_PATH, max_entries: int = GEOCODE_CACHE_DISK_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._pruned = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _run(self, fn):
+        # one connection shared by worker threads; SQLite calls are serialized here
+        with self._lock:
+            return fn(self._connection())
+
+    async def get(self, key: str):
+        """(value, expires_at) for an unexpired row, else None."""
+        def select(conn):
+            return conn.execute(
+                "SELECT value, expires_at FROM geocode_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+
+        row = await asyncio.to_thread(self._run, select)
+        if row is None:
+            return None
+        return orjson.loads(row[0]), row[1]
+
+    async def put(self, key: str, value, expires_at: float):
+        body = orjson.dumps(value)
+        self._writes += 1
+        prune = self._writes % PRUNE_EVERY == 0
+
+        def upsert(conn):
+            conn.execute(
+                "INSERT INTO geocode_cache (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, body, expires_at),
+            )
+            if prune:
+                self._prune(conn)
+
+        await asyncio.to_thread(self._run, upsert)
+
+    def _prune(self, conn: sqlite3.Connection):
+        removed = conn.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM geocode_cache WHERE key IN "
+                "(SELECT key FROM geocode_cache ORDER BY expires_at LIMIT ?)", (excess,)
+            ).rowcount
+        self._pruned += removed
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {"path": self.path, "writes": self._writes, "pruned": self._pruned, "max_entries": self.max_entries}
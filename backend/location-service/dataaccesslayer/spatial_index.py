@@ -0,0 +1,129 @@
+"""
+In-memory spatial index for nearest-neighbour lookups on the sphere (reverse geocoding).
+Points are bucketed into a fixed lat/lng grid of GEO_INDEX_CELL_DEG-degree cells (a sparse dict,
+so empty ocean costs nothing). A k-nearest query scans the cells under the bounding box of a
+search circle that starts at one cell and doubles until it holds k points (the box widens in
+longitude towards the poles and spans every longitude once the circle contains one); when the
+box covers more cells than there are points (small indexes, queries far from everything) the
+points are scanned directly instead. Points can be added, moved and removed one at
+a time, so the index follows upstream changes without rebuilds.
+Distances are great-circle (haversine) kilometres.
+"""
+import os
+import math
+import heapq
+from dotenv import load_dotenv
+load_dotenv()
+
+GEO_INDEX_CELL_DEG = float(os.getenv("GEO_INDEX_CELL_DEG", 1.0))
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+class SpatialIndex:
+    def __init__(self, cell_deg: float = GEO_INDEX_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._rows = math.ceil(180 / cell_deg)
+        self._cols = math.ceil(360 / cell_deg)
+        self._cells = {}
+        self._points = {}
+        self._queries = 0
+        self._full_scans = 0
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lng: float) -> tuple:
+        row = min(self._rows - 1, max(0, int((lat + 90) // self.cell_deg)))
+        col = int(((lng + 180) % 360) // self.cell_deg) % self._cols
+        return row, col
+
+    def put(self, key, lat: float, lng: float, item):
+        """Insert or move the point stored under key."""
+        self.remove(key)
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, {})[key] = (lat, lng)
+        self._points[key] = (lat, lng, item, cell)
+
+    def remove(self, key):
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        bucket = self._cells[point[3]]
+        del bucket[key]
+        if not bucket:
+            del self._cells[point[3]]
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def get(self, key):
+        point = self._points.get(key)
+        return None if point is None else point[2]
+
+    def keys(self):
+        return self._points.keys()
+
+    def _window(self, lat: float, lng: float, radius_km: float):
+        """Grid cells of the lat/lng bounding box of the circle of radius_km around (lat, lng)."""
+        angle = radius_km / EARTH_RADIUS_KM
+        lat_lo, lat_hi = lat - math.degrees(angle), lat + math.degrees(angle)
+        rows = range(self._cell(max(-90.0, lat_lo), 0)[0], self._cell(min(90.0, lat_hi), 0)[0] + 1)
+        if lat_lo <= -90 or lat_hi >= 90 or angle >= math.pi / 2:
+            cols = range(self._cols)  # the circle contains a pole: every longitude
+        else:
+            half = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+            first, last = self._cell(lat, lng - half)[1], self._cell(lat, lng + half)[1]
+            if half >= 180 or 2 * half + 2 * self.cell_deg >= 360:
+                cols = range(self._cols)
+            elif first <= last:
+                cols = range(first, last + 1)
+            else:  # crosses the antimeridian
+                cols = list(range(first, self._cols)) + list(range(0, last + 1))
+        return rows, cols
+
+    def nearest(self, lat: float, lng: float, k: int = 5, max_km: float = None) -> list:
+        """Up to k (distance_km, item) pairs, nearest first, optionally within max_km."""
+        self._queries += 1
+        if not self._points or k <= 0:
+            return []
+        limit = math.inf if max_km is None else max_km
+        lng = ((lng + 180) % 360) - 180
+        # search radius doubles until k points are inside it; every point within the radius
+        # lies in the radius' bounding box, so the k nearest found inside are the k nearest
+        radius = min(limit, math.radians(self.cell_deg) * EARTH_RADIUS_KM)
+        while True:
+            rows, cols = self._window(lat, lng, radius)
+            if len(rows) * len(cols) > len(self._points):
+                # cheaper to look at every point, which also settles the answer
+                self._full_scans += 1
+                found = [(haversine_km(lat, lng, p[0], p[1]), key) for key, p in self._points.items()]
+                found = [item for item in found if item[0] <= limit]
+                break
+            found = []
+            for row in rows:
+                for col in cols:
+                    for key, (plat, plng) in self._cells.get((row, col), {}).items():
+                        d = haversine_km(lat, lng, plat, plng)
+                        if d <= radius:
+                            found.append((d, key))
+            if len(found) >= k or radius >= limit or radius >= math.pi * EARTH_RADIUS_KM:
+                break
+            radius = min(limit, radius * 2)
+        return [(round(d, 3), self._points[key][2]) for d, key in heapq.nsmallest(k, found)]
+
+    def stats(self) -> dict:
+        return {
+            "points": len(self._points),
+            "cells": len(self._cells),
+            "cell_deg": self.cell_deg,
+            "queries": self._queries,
+            "full_scans": self._full_scans,
+        }
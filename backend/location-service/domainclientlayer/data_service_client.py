@@ -0,0 +1,139 @@
+"""
+Shared internal client for calls to data-service (the same module is copied into each service).
+One lifecycle-managed httpx.AsyncClient keeps a keep-alive pool to DATA_SERVICE_URL (or to a Unix
+domain socket with DATA_SERVICE_UDS when the services are co-located), so internal calls do not
+pay connection setup each time. JSON bodies are serialized once with orjson and sent as bytes.
+Every call has an overall deadline (DATA_SERVICE_TIMEOUT unless the caller passes one) on top of
+the per-phase httpx timeouts; a missed deadline raises httpx.TimeoutException like any other
+timeout. Latency percentiles and status classes are recorded per endpoint for /metrics.
+"""
+import os
+import time
+import asyncio
+from collections import Counter, deque
+import httpx
+import orjson
+from dotenv import load_dotenv
+load_dotenv()
+
+DATA_SERVICE_URL = os.getenv("DATA_SERVICE_URL", "http://127.0.0.1:8003").rstrip("/")
+DATA_SERVICE_UDS = os.getenv("DATA_SERVICE_UDS") or None
+DATA_SERVICE_TIMEOUT = float(os.getenv("DATA_SERVICE_TIMEOUT", 10))
+DATA_SERVICE_POOL_MAX_CONNECTIONS = int(os.getenv("DATA_SERVICE_POOL_MAX_CONNECTIONS", 50))
+DATA_SERVICE_POOL_MAX_KEEPALIVE = int(os.getenv("DATA_SERVICE_POOL_MAX_KEEPALIVE", 20))
+DATA_SERVICE_POOL_KEEPALIVE_EXPIRY = float(os.getenv("DATA_SERVICE_POOL_KEEPALIVE_EXPIRY", 60))
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class EndpointStats:
+    """Sliding window of one endpoint's latencies with status-class counters."""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self.statuses = Counter()
+
+    def record(self, seconds: float, status: str):
+        self._samples.append(seconds)
+        self.statuses[status] += 1
+
+    def stats(self) -> dict:
+        ordered = sorted(self._samples)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+            return round(ordered[index] * 1000, 2)
+
+        return {"calls": sum(self.statuses.values()), "statuses": dict(self.statuses),
+                "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99)}
+
+
+class DataServiceClient:
+    def __init__(
+        self,
+        base_url: str = DATA_SERVICE_URL,
+        uds: str = DATA_SERVICE_UDS,
+        timeout: float = DATA_SERVICE_TIMEOUT,
+        max_connections: int = DATA_SERVICE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DATA_SERVICE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = DATA_SERVICE_POOL_KEEPALIVE_EXPIRY,
+    ):
+        self.base_url = base_url
+        self.uds = uds
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client = None
+        self._endpoints = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        # with a socket path the URL's host only names the service in the Host header
+        transport = httpx.AsyncHTTPTransport(uds=self.uds, limits=self.limits) if self.uds else None
+        return httpx.AsyncClient(base_url=self.base_url, limits=self.limits, transport=transport, timeout=self.timeout)
+
+    async def start(self):
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def aclose(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # created lazily if start() was not called (e.g. scripts); the app starts it in its lifespan
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    async def request(self, method: str, path: str, json=None, endpoint: str = None,
+                      timeout: float = None, **kwargs) -> httpx.Response:
+        """
+        One call to data-service; path is relative to DATA_SERVICE_URL (e.g. "/api/v1/records/location").
+        endpoint labels the call in the metrics (defaults to "<METHOD> <path>"; pass a template
+        for paths with ids). timeout is the overall deadline in seconds.
+        """
+        if json is not None:
+            kwargs["content"] = orjson.dumps(json, option=orjson.OPT_NON_STR_KEYS)
+            kwargs["headers"] = {**_JSON_HEADERS, **(kwargs.get("headers") or {})}
+        endpoint = endpoint or f"{method} {path}"
+        deadline = timeout or self.timeout
+        started = time.perf_counter()
+        status = "error"
+        try:
+            resp = await asyncio.wait_for(self.client.request(method, path, **kwargs), deadline)
+            status = f"{resp.status_code // 100}xx"
+            return resp
+        except asyncio.TimeoutError:
+            status = "timeout"
+            raise httpx.TimeoutException(f"data-service {endpoint} exceeded its {deadline}s deadline") from None
+        finally:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.record(time.perf_counter() - started, status)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, json=None, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, json=json, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "uds": self.uds,
+            "started": self._client is not None,
+            "timeout": self.timeout,
+            "endpoints": {name: stats.stats() for name, stats in self._endpoints.items()},
+        }
+
+
+# Client shared by everything in this service that talks to data-service
+data_service = DataServiceClient()
@@ -1,23 +1,89 @@
 """
 OpenCage-based geocode client. If GEOCODING_API_KEY (or OPENCAGE_API_KEY) is set, this will call OpenCage.
-If not set, fallback to deterministic mock behavior useful for development.
+If not set, fallback to deterministic mock behavior useful for development; mock results are
+cached under their own "mock|" keys and never written to the disk tier, so they cannot be
+served as real geocodes once a key is configured.
+Results are cached per normalized query (GeocodeCache: memory/shared tier in front of a SQLite
+tier; "not found" for a short time), and concurrent lookups of the same normalized query share
+one upstream call (SingleFlight).
+Upstream calls go through a circuit breaker with jittered retries (resilience.py) and the
+OpenCage quota's token bucket (rate_limiter.py), where interactive lookups are served first,
+over the shared keep-alive connection pool (http_pool.py).
 """
 import os
-import httpx
 from dotenv import load_dotenv
-from exceptions.custom_exceptions import InvalidLocationException
+from exceptions.custom_exceptions import InvalidLocationException, RateLimitedException
+from domainclientlayer.single_flight import SingleFlight
+from domainclientlayer.resilience import ResilientCaller
+from domainclientlayer.rate_limiter import RateLimiter, INTERACTIVE, retry_after_seconds
+from domainclientlayer.http_pool import opencage_pool
+from dataaccesslayer.geocode_cache import GeocodeCache, normalize_query, NOT_FOUND
 
 load_dotenv()
 # Accept both env var names to reduce deployment misconfiguration
 GEOCODING_API_KEY = os.getenv("GEOCODING_API_KEY") or os.getenv("OPENCAGE_API_KEY")
 GEOCODING_PROVIDER = os.getenv("GEOCODING_PROVIDER", "opencage")
+# Point at a stand-in server (see backend/perf/fake_upstream.py) for offline and load testing
+GEOCODING_BASE_URL = os.getenv("GEOCODING_BASE_URL", "https://api.opencagedata.com").rstrip("/")
+geocode_resilience = ResilientCaller.from_env("GEOCODE", "opencage")
+geocode_limiter = RateLimiter.from_env("GEOCODE", "opencage")
 
 class GeocodeClient:
     def __init__(self):
         self.key = GEOCODING_API_KEY
         self.provider = GEOCODING_PROVIDER
+        self.flights = SingleFlight("geocode")
+        self.resilience = geocode_resilience
+        self.limiter = geocode_limiter
+        self.pool = opencage_pool
+        self.cache = GeocodeCache()
 
-    async def geocode(self, query: str) -> dict:
+    @property
+    def mock(self) -> bool:
+        return not self.key
+
+    def cache_key(self, query: str, country_code: str = None) -> str:
+        key = normalize_query(query) if country_code is None else f"{normalize_query(query)}|{country_code.lower()}"
+        return f"mock|{key}" if self.mock else key
+
+    async def geocode(self, query: str, priority: int = INTERACTIVE, country_code: str = None) -> dict:
+        """
+        Geocode a free-text query. Cached results (and recent "not found" answers) are returned
+        without an upstream call; callers racing on the same normalized query (see
+        normalize_query) await a single lookup. Upstream errors other than "not found" are
+        raised to each of them and are not cached, nor is "not found" under a country_code.
+        priority is the rate limiter class (INTERACTIVE, BATCH or BACKGROUND); country_code
+        (ISO 3166-1 alpha-2) restricts the upstream search to one country.
+        """
+        key = self.cache_key(query, country_code)
+        cached = await self.cache.get(key)
+        if cached is not None and not self.mock and cached.get("source") == "mock":
+            cached = None  # written by an older build in mock mode
+        if cached is not None:
+            if NOT_FOUND in cached:
+                raise InvalidLocationException(cached[NOT_FOUND])
+            return cached
+        return await self.flights.do(key, lambda: self._geocode_and_cache(key, query, priority, country_code))
+
+    async def _geocode_and_cache(self, key: str, query: str, priority: int, country_code: str = None) -> dict:
+        try:
+            resolution = await self._geocode(query, priority, country_code)
+        except InvalidLocationException as e:
+            if country_code is None:
+                # a miss under a country hint may only mean a wrong hint; the caller retries without it
+                await self.cache.set_not_found(key, str(e), persist=not self.mock)
+            raise
+        await self.cache.set(key, resolution, persist=not self.mock)
+        return resolution
+
+    async def _send(self, url: str, params: dict, priority: int):
+        await self.limiter.acquire(priority)
+        r = await self.pool.get(url, params=params)
+        if r.status_code == 429:
+            self.limiter.penalize(retry_after_seconds(r.headers.get("Retry-After")))
+        return r
+
+    async def _geocode(self, query: str, priority: int = INTERACTIVE, country_code: str = None) -> dict:
         # If key absent, return deterministic mock (helpful for development)
         if not self.key:
             lower = query.lower()
@@ -33,22 +99,27 @@ class GeocodeClient:
             raise InvalidLocationException(f"Location '{query}' not found in mock database")
 
         # Real OpenCage geocoding
-        url = "https://api.opencagedata.com/geocode/v1/json"
+        url = f"{GEOCODING_BASE_URL}/geocode/v1/json"
         params = {"q": query, "key": self.key, "limit": 1, "no_annotations": 1}
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-            if not data.get("results"):
-                # No results found - raise exception instead of returning fallback coordinates
-                raise InvalidLocationException(f"Location '{query}' could not be found")
-            top = data["results"][0]
-            geometry = top.get("geometry", {})
-            lat = geometry.get("lat")
-            lng = geometry.get("lng")
-            
-            # Validate that we got actual coordinates
-            if lat is None or lng is None:
-                raise InvalidLocationException(f"Invalid coordinates returned for '{query}'")
-                
-            return {"lat": lat, "lng": lng, "display_name": top.get("formatted"), "source": "opencage"}
+        if country_code:
+            params["countrycode"] = country_code.lower()
+        r = await self.resilience.call(url, lambda: self._send(url, params, priority))
+        if r.status_code == 429:
+            raise RateLimitedException(
+                "Geocoding quota exceeded", retry_after=retry_after_seconds(r.headers.get("Retry-After"))
+            )
+        r.raise_for_status()
+        data = r.json()
+        if not data.get("results"):
+            # No results found - raise exception instead of returning fallback coordinates
+            raise InvalidLocationException(f"Location '{query}' could not be found")
+        top = data["results"][0]
+        geometry = top.get("geometry", {})
+        lat = geometry.get("lat")
+        lng = geometry.get("lng")
+
+        # Validate that we got actual coordinates
+        if lat is None or lng is None:
+            raise InvalidLocationException(f"Invalid coordinates returned for '{query}'")
+
+        return {"lat": lat, "lng": lng, "display_name": top.get("formatted"), "source": "opencage"}
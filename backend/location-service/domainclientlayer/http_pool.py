@@ -0,0 +1,171 @@
+"""
+Shared, lifecycle-managed HTTP connection pool for upstream calls.
+A single httpx.AsyncClient is opened when the app starts (see main.py lifespan) and closed on
+shutdown, so requests reuse keep-alive connections instead of paying a TCP+TLS handshake each time.
+Pool limits, HTTP/2 and per-phase timeouts are configurable through environment variables.
+"""
+import os
+import time
+import importlib.util
+import httpx
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class HttpPool:
+    """
+    Owns one pooled httpx.AsyncClient and tracks usage statistics for sizing the pool.
+    The client is created lazily on first use if start() was not called (e.g. scripts),
+    but in the app it is started and closed by the FastAPI lifespan.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 10.0,
+        write_timeout: float = 10.0,
+        pool_timeout: float = 5.0,
+    ):
+        self.name = name
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout
+        )
+        self._client = None
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests_total = 0
+        self._waits_total = 0
+        self._errors_total = 0
+        self._started_at = None
+
+    @classmethod
+    def from_env(cls, prefix: str, name: str) -> "HttpPool":
+        """
+        Build a pool from <PREFIX>_POOL_* / <PREFIX>_*_TIMEOUT / <PREFIX>_HTTP2 environment variables.
+        """
+        return cls(
+            name=name,
+            max_connections=_env_int(f"{prefix}_POOL_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=_env_int(f"{prefix}_POOL_MAX_KEEPALIVE", 20),
+            keepalive_expiry=_env_float(f"{prefix}_POOL_KEEPALIVE_EXPIRY", 30.0),
+            http2=_env_bool(f"{prefix}_HTTP2", False),
+            connect_timeout=_env_float(f"{prefix}_CONNECT_TIMEOUT", 5.0),
+            read_timeout=_env_float(f"{prefix}_READ_TIMEOUT", 10.0),
+            write_timeout=_env_float(f"{prefix}_WRITE_TIMEOUT", 10.0),
+            pool_timeout=_env_float(f"{prefix}_POOL_TIMEOUT", 5.0),
+        )
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            # HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+            print(f"[{self.name}] HTTP/2 requested but 'h2' is not installed; falling back to HTTP/1.1.")
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return httpx.AsyncClient(limits=limits, timeout=self.timeout, http2=http2)
+
+    async def start(self):
+        if self._client is None:
+            self._client = self._build_client()
+            self._started_at = time.time()
+
+    async def aclose(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._build_client()
+            self._started_at = time.time()
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        client = self.client
+        if self._in_flight >= self.max_connections:
+            # every connection is busy: this request will queue for a free one
+            self._waits_total += 1
+        self._in_flight += 1
+        self._requests_total += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return await client.request(method, url, **kwargs)
+        except Exception:
+            self._errors_total += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    def _connection_counts(self) -> dict:
+        # httpx does not expose pool internals publicly; read them defensively
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+        closed = sum(1 for c in connections if c.is_closed())
+        return {"open": len(connections) - closed, "idle": idle, "active": len(connections) - idle - closed}
+
+    def stats(self) -> dict:
+        """
+        Snapshot of pool usage: requests currently in use, idle keep-alive connections and
+        how many requests had to wait for a connection.
+        """
+        return {
+            "name": self.name,
+            "started": self._client is not None,
+            "uptime_s": round(time.time() - self._started_at, 1) if self._started_at and self._client else 0,
+            "limits": {
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "keepalive_expiry": self.keepalive_expiry,
+                "http2": self.http2,
+            },
+            "in_use": self._in_flight,
+            "peak_in_use": self._peak_in_flight,
+            "connections": self._connection_counts() if self._client is not None else {"open": 0, "idle": 0, "active": 0},
+            "requests_total": self._requests_total,
+            "waits_total": self._waits_total,
+            "errors_total": self._errors_total,
+        }
+
+
+# Pool shared by every GeocodeClient instance for the OpenCage API
+opencage_pool = HttpPool.from_env("GEOCODE", "opencage")
@@ -0,0 +1,204 @@
+"""
+Async token-bucket rate limiter for third-party API quotas (OpenWeather, OpenCage).
+  - Bucket: refills at <PREFIX>_RATE_PER_MINUTE tokens per minute up to <PREFIX>_RATE_BURST.
+  - Queue: callers that find the bucket empty wait in a bounded priority queue
+    (INTERACTIVE before BATCH before BACKGROUND, FIFO within a class). A full queue or a wait
+    longer than the caller's deadline raises RateLimitedException instead of piling up.
+  - Feedback: an upstream 429 calls penalize(retry_after), which empties the bucket and pauses
+    refills until the provider's Retry-After has passed.
+The same module is copied into each service that calls a third-party API.
+"""
+import os
+import time
+import heapq
+import asyncio
+from itertools import count
+from dotenv import load_dotenv
+from exceptions.custom_exceptions import RateLimitedException
+load_dotenv()
+
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        name: str,
+        rate_per_minute: float = 60.0,
+        burst: int = 10,
+        max_queue: int = 100,
+        max_wait: float = 5.0,
+        max_wait_background: float = 30.0,
+    ):
+        self.name = name
+        self.enabled = rate_per_minute > 0
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_wait_background = max_wait_background
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []  # heap of [priority, seq, future]
+        self._seq = count()
+        self._timer = None
+        self._granted = {p: 0 for p in PRIORITY_NAMES}
+        self._queued = {p: 0 for p in PRIORITY_NAMES}
+        self._rejected = {p: 0 for p in PRIORITY_NAMES}
+        self._penalties = 0
+        self._wait_total = 0.0
+
+    @classmethod
+    def from_env(cls, prefix: str, name: str) -> "RateLimiter":
+        """
+        Build from <PREFIX>_RATE_* environment variables. RATE_PER_MINUTE=0 disables limiting.
+        """
+        return cls(
+            name=name,
+            rate_per_minute=float(os.getenv(f"{prefix}_RATE_PER_MINUTE", 60)),
+            burst=int(os.getenv(f"{prefix}_RATE_BURST", 10)),
+            max_queue=int(os.getenv(f"{prefix}_RATE_MAX_QUEUE", 100)),
+            max_wait=float(os.getenv(f"{prefix}_RATE_MAX_WAIT", 5)),
+            max_wait_background=float(os.getenv(f"{prefix}_RATE_MAX_WAIT_BACKGROUND", 30)),
+        )
+
+    def _refill(self, now: float):
+        if now < self._paused_until:
+            self._updated = now
+            return
+        start = max(self._updated, self._paused_until)
+        self._tokens = min(float(self.burst), self._tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def _retry_after(self, now: float) -> float:
+        """Seconds until at least one token is available (ignoring the queue)."""
+        pause = max(0.0, self._paused_until - now)
+        missing = max(0.0, 1.0 - self._tokens)
+        return pause + missing / self.rate
+
+    async def acquire(self, priority: int = INTERACTIVE, timeout: float = None):
+        """
+        Take one token, waiting in the priority queue if needed. Raises RateLimitedException when
+        the queue is full or no token is granted within the deadline (timeout, capped by the
+        class' configured max wait).
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            self._granted[priority] += 1
+            return
+
+        limit = self.max_wait if priority == INTERACTIVE else self.max_wait_background
+        deadline = limit if timeout is None else min(timeout, limit)
+        retry_after = self._retry_after(now)
+        if len(self._waiters) >= self.max_queue or (not self._waiters and retry_after > deadline):
+            self._rejected[priority] += 1
+            raise RateLimitedException(f"{self.name} rate limit reached", retry_after=retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        self._queued[priority] += 1
+        self._schedule()
+        try:
+            await asyncio.wait_for(future, timeout=deadline)
+        except asyncio.TimeoutError:
+            self._rejected[priority] += 1
+            raise RateLimitedException(
+                f"{self.name} rate limit queue wait exceeded {deadline:.1f}s",
+                retry_after=self._retry_after(time.monotonic()),
+            )
+        finally:
+            if not future.done() or future.cancelled():
+                self._discard(entry)
+        self._granted[priority] += 1
+        self._wait_total += time.monotonic() - now
+
+    def _discard(self, entry: list):
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._waiters)
+
+    def _schedule(self):
+        if self._timer is not None or not self._waiters:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        delay = self._retry_after(now)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self):
+        """Hand available tokens to queued callers, highest priority first."""
+        self._timer = None
+        self._refill(time.monotonic())
+        while self._waiters and self._tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # caller gave up (deadline / cancellation)
+            self._tokens -= 1
+            future.set_result(None)
+        self._schedule()
+
+    def available(self) -> float:
+        """Tokens free for a new caller right now (infinite when limiting is disabled)."""
+        if not self.enabled:
+            return float("inf")
+        now = time.monotonic()
+        self._refill(now)
+        if self._waiters or now < self._paused_until:
+            return 0.0
+        return self._tokens
+
+    def penalize(self, retry_after: float = None):
+        """
+        Upstream answered 429: drain the bucket and pause refills for retry_after seconds
+        (one token interval when the provider sent no Retry-After).
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        self._penalties += 1
+        self._tokens = 0.0
+        self._updated = now
+        pause = retry_after if retry_after and retry_after > 0 else 1.0 / self.rate
+        self._paused_until = max(self._paused_until, now + pause)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._waiters:
+            self._schedule()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "rate_per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "paused_for_s": round(max(0.0, self._paused_until - now), 1),
+            "queue_depth": len(self._waiters),
+            "granted": {PRIORITY_NAMES[p]: n for p, n in self._granted.items()},
+            "queued": {PRIORITY_NAMES[p]: n for p, n in self._queued.items()},
+            "rejected": {PRIORITY_NAMES[p]: n for p, n in self._rejected.items()},
+            "penalties": self._penalties,
+            "avg_queue_wait_ms": round(self._wait_total / max(1, sum(self._queued.values())) * 1000, 1),
+        }
+
+
+def retry_after_seconds(value) -> float:
+    """Parse a Retry-After header given in seconds; HTTP-date values and junk yield None."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
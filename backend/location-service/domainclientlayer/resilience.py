@@ -0,0 +1,253 @@
+"""
+Resilience layer for upstream HTTP calls (OpenWeather, OpenCage).
+  - CircuitBreaker: one per host. Opens after N consecutive failures so callers fail fast with
+    UpstreamUnavailableException, then lets a single half-open probe through after a cool-down.
+  - Retries: idempotent GETs are retried on transport errors, 5xx and 429 with capped
+    exponential backoff and full jitter.
+  - Hedging (optional): once enough latencies are recorded, a second identical request is sent if
+    the first has not answered within the configured percentile; the first response wins.
+The same module is copied into each service that calls a third-party API.
+"""
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+import httpx
+from dotenv import load_dotenv
+from exceptions.custom_exceptions import UpstreamUnavailableException
+load_dotenv()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._opened_total = 0
+        self._rejected_total = 0
+
+    def before_call(self):
+        """
+        Raise UpstreamUnavailableException if the call must not go out right now.
+        In half-open state exactly one probe call is allowed through.
+        """
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            else:
+                self._rejected_total += 1
+                raise UpstreamUnavailableException(f"{self.host} is unavailable (circuit open)")
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self._rejected_total += 1
+                raise UpstreamUnavailableException(f"{self.host} is unavailable (circuit half-open)")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        self._failures = 0
+        self._probe_in_flight = False
+        self.state = CLOSED
+
+    def record_abort(self):
+        """The call never reached the host (e.g. rejected by the rate limiter): no verdict."""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self._failures += 1
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self._opened_total += 1
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened_total": self._opened_total,
+            "rejected_total": self._rejected_total,
+            "retry_in_s": round(retry_in, 1),
+        }
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies (seconds) for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class ResilientCaller:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self._breakers = {}
+        self._calls = 0
+        self._retries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+
+    @classmethod
+    def from_env(cls, prefix: str, name: str) -> "ResilientCaller":
+        """
+        Build from <PREFIX>_BREAKER_* / <PREFIX>_RETRY_* / <PREFIX>_HEDGE* environment variables.
+        """
+        return cls(
+            name=name,
+            failure_threshold=int(os.getenv(f"{prefix}_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv(f"{prefix}_BREAKER_RESET", 30)),
+            retries=int(os.getenv(f"{prefix}_RETRY_ATTEMPTS", 2)),
+            backoff_base=float(os.getenv(f"{prefix}_RETRY_BASE", 0.2)),
+            backoff_max=float(os.getenv(f"{prefix}_RETRY_MAX", 2)),
+            hedge=os.getenv(f"{prefix}_HEDGE", "false").lower() in ("1", "true", "yes", "on"),
+            hedge_percentile=float(os.getenv(f"{prefix}_HEDGE_PERCENTILE", 95)),
+        )
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).netloc or url
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+            self._breakers[host] = breaker
+        return breaker
+
+    @staticmethod
+    def _retryable_status(status: int) -> bool:
+        return status == 429 or status >= 500
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _timed(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        started = time.monotonic()
+        response = await send()
+        self.latency.record(time.monotonic() - started)
+        return response
+
+    async def _hedged(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return await self._timed(send)
+        delay = self.latency.percentile(self.hedge_percentile)
+        primary = asyncio.ensure_future(self._timed(send))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            self._hedges += 1
+            secondary = asyncio.ensure_future(self._timed(send))
+            tasks.append(secondary)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self._hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # the loser (or both, if the caller was cancelled) must not keep a connection busy;
+            # awaiting them also retrieves their errors so none is reported as never retrieved
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def call(self, url: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Send an idempotent request through the host's breaker with retries (and hedging if enabled).
+        Returns the last response — the caller still calls raise_for_status() — or raises the
+        last transport error. Raises UpstreamUnavailableException while the breaker is open.
+        """
+        breaker = self.breaker_for(url)
+        self._calls += 1
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                response = await self._hedged(send)
+            except (httpx.TransportError, httpx.TimeoutException):
+                breaker.record_failure()
+                if attempt >= self.retries:
+                    raise
+            except BaseException:
+                breaker.record_abort()
+                raise
+            else:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    # 2xx-4xx (incl. 429 quota responses) mean the host itself is healthy
+                    breaker.record_success()
+                if not self._retryable_status(response.status_code) or attempt >= self.retries:
+                    return response
+            attempt += 1
+            self._retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "breakers": {host: b.stats() for host, b in self._breakers.items()},
+            "calls": self._calls,
+            "retries": self._retries,
+            "hedge_enabled": self.hedge,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "latency_ms": {
+                "samples": len(self.latency),
+                "p50": round(self.latency.percentile(50) * 1000, 1),
+                "p95": round(self.latency.percentile(95) * 1000, 1),
+                "p99": round(self.latency.percentile(99) * 1000, 1),
+            },
+        }
@@ -0,0 +1,49 @@
+"""
+Single-flight request coalescing.
+Concurrent callers asking for the same key share one in-flight upstream call instead of each
+starting their own. The result (or exception) is delivered to every waiter, and the key is
+forgotten as soon as the call finishes so a failure never poisons later calls.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self._calls = 0
+        self._coalesced = 0
+        self._errors = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once per key at a time; concurrent callers with the same key await the same task.
+        The shared task is shielded so one caller being cancelled (e.g. client disconnect)
+        does not cancel the fetch for everyone else.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._calls += 1
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # mark the exception as retrieved even if every waiter was cancelled
+        if not task.cancelled() and task.exception() is not None:
+            self._errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": len(self._inflight),
+            "calls": self._calls,
+            "coalesced": self._coalesced,
+            "errors": self._errors,
+        }
@@ -14,3 +14,13 @@ class InvalidInputException(Exception):
 class InvalidLocationException(Exception):
     """Raised when a location query returns no valid results"""
     pass
+
+class UpstreamUnavailableException(Exception):
+    """Raised when the geocoding provider's circuit breaker is open"""
+    pass
+
+class RateLimitedException(Exception):
+    """Raised when the geocoding quota is exhausted (local token bucket or provider 429)"""
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
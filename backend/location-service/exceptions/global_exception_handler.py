@@ -7,10 +7,13 @@ from exceptions.custom_exceptions import (
     LocationNotFoundException, 
     ExternalAPIException, 
     InvalidInputException,
-    InvalidLocationException
+    InvalidLocationException,
+    UpstreamUnavailableException,
+    RateLimitedException
 )
 from exceptions.http_error_info import HttpErrorInfo
 import datetime
+import math
 
 def _make_payload(status_code: int, message: str, detail: str = None):
     return HttpErrorInfo(
@@ -41,6 +44,17 @@ def register_exception_handlers(app):
         payload = _make_payload(404, "Location not found", str(exc) or "The location you entered does not exist or could not be found")
         return JSONResponse(status_code=404, content=payload)
 
+    @app.exception_handler(UpstreamUnavailableException)
+    async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailableException):
+        payload = _make_payload(503, "Upstream unavailable", str(exc))
+        return JSONResponse(status_code=503, content=payload)
+
+    @app.exception_handler(RateLimitedException)
+    async def rate_limited_handler(request: Request, exc: RateLimitedException):
+        payload = _make_payload(429, "Too many requests", str(exc))
+        headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after else None
+        return JSONResponse(status_code=429, content=payload, headers=headers)
+
     # Generic fallback
     @app.exception_handler(Exception)
     async def generic_error_handler(request: Request, exc: Exception):
@@ -1,13 +1,41 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
 import os
 load_dotenv()
 
-from presentationlayer.controllers import router as location_router
+from presentationlayer.controllers import router as location_router, service as location_service
+from domainclientlayer.http_pool import opencage_pool
+from domainclientlayer.data_service_client import data_service
 from exceptions.global_exception_handler import register_exception_handlers
+from presentationlayer.responses import FastJSONResponse
 
-app = FastAPI(title="location-service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Lifespan event context manager — opens the OpenCage and data-service connection pools, loads
+    the offline gazetteer and its spatial index (in a worker thread) and starts the saved-location
+    index sync at startup; stops the sync and closes the pools and the geocode cache backend
+    connection at shutdown.
+    """
+    await opencage_pool.start()
+    await data_service.start()
+    if location_service.gazetteer_enabled:
+        await asyncio.to_thread(location_service.load_gazetteer)
+    if location_service.saved_sync_enabled:
+        location_service.saved_sync.start()
+
+    yield
+
+    print("Shutting down location-service...")
+    await location_service.saved_sync.stop()
+    await location_service.client.cache.aclose()
+    await opencage_pool.aclose()
+    await data_service.aclose()
+
+app = FastAPI(title="location-service", lifespan=lifespan, default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+import orjson
 from businesslogiclayer.location_service import LocationService
 from exceptions.custom_exceptions import InvalidInputException
+from domainclientlayer.data_service_client import data_service
 
 router = APIRouter()
 service = LocationService()
@@ -9,6 +13,13 @@ service = LocationService()
 class ResolveRequest(BaseModel):
     query: str
 
+class BatchResolveRequest(BaseModel):
+    queries: List[str]
+    save: bool = False
+
+class StreamResolveRequest(BaseModel):
+    queries: List[str]
+
 @router.post("/resolve")
 async def resolve_location(body: ResolveRequest):
     """
@@ -40,3 +51,81 @@ async def resolve_and_save_location(body: ResolveRequest):
     except Exception as e:
         # Let global exception handler translate it
         raise
+
+
+@router.post("/resolve/batch")
+async def resolve_batch(body: BatchResolveRequest):
+    """
+    Resolve many queries at once (e.g. an imported site list). Queries that normalize to the
+    same key are geocoded once; results come back in input order and a failing query carries
+    its own error. With save=true the successes are persisted in one bulk call.
+    """
+    return await service.resolve_batch(body.queries, body.save)
+
+
+@router.post("/resolve/batch/stream")
+async def resolve_batch_stream(body: StreamResolveRequest, request: Request):
+    """
+    Like /resolve/batch (without saving), but streams one NDJSON line per query as soon as it is
+    resolved. Each line carries its input "index"; the stream stops when the client disconnects.
+    """
+    results = service.stream_resolve(body.queries)
+
+    async def encode():
+        try:
+            async for item in results:
+                if await request.is_disconnected():
+                    break
+                yield orjson.dumps(item) + b"\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(encode(), media_type="application/x-ndjson")
+
+
+@router.get("/autocomplete")
+async def autocomplete(response: Response, q: str = Query(..., description="name prefix"), limit: int = Query(10, ge=1, le=50)):
+    """
+    Suggest places from the offline gazetteer whose name starts with q (case, accents and
+    punctuation ignored), most populous first. No external geocoder call is made.
+    """
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return {"query": q, "results": service.autocomplete(q, limit)}
+
+
+@router.get("/reverse")
+async def reverse(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    max_km: Optional[float] = Query(None, gt=0),
+):
+    """
+    Nearest gazetteer places and saved locations to a coordinate (e.g. from browser geolocation),
+    nearest first with great-circle distances in km. Answered from in-memory spatial indexes.
+    """
+    return service.reverse(lat, lng, k, max_km)
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Operational statistics: parsed query kinds, geocode result cache (hits, backend latency),
+    request coalescing, circuit breaker / retry counters, quota token bucket / queue, upstream
+    connection pool, data-service call latency per endpoint, the offline gazetteer and the
+    reverse-lookup spatial indexes.
+    """
+    return {
+        "queries": {**service.query_kinds, "country_hint_retries": service.hint_retries},
+        "gazetteer": {"enabled": service.gazetteer_enabled, **service.gazetteer.stats()},
+        "spatial": {
+            "places": service.places_index.stats(),
+            "saved": {**service.saved_index.stats(), "sync": service.saved_sync.stats()},
+        },
+        "cache": service.client.cache.stats(),
+        "single_flight": service.client.flights.stats(),
+        "resilience": service.client.resilience.stats(),
+        "rate_limit": service.client.limiter.stats(),
+        "http_pool": service.client.pool.stats(),
+        "data_service": data_service.stats(),
+    }
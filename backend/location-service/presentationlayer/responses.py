@@ -0,0 +1,106 @@
+"""
+Shared response layer: fast JSON serialization (orjson) and negotiated compression.
+  - FastJSONResponse: default response class of the app. Serializes with orjson (datetimes,
+    dates, UUIDs and NumPy values natively); anything else falls back to jsonable_encoder.
+    Returning it directly from an endpoint also skips FastAPI's jsonable_encoder pass.
+  - CompressedResponse: compresses the body with brotli (if installed) or gzip according to the
+    request's Accept-Encoding, when the body is at least RESPONSE_COMPRESS_MIN_BYTES. It always
+    sends Vary: Accept-Encoding, and an encoded body's ETag names its content-coding
+    ("abc" -> "abc-gzip"), so each encoding is a distinct representation for caches.
+Streaming responses are left untouched. The same module is copied into each service.
+"""
+import os
+import gzip
+import orjson
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+from dotenv import load_dotenv
+load_dotenv()
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 5))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4))
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _accepted(header: str) -> dict:
+    """Accept-Encoding -> {coding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header: str):
+    """Pick "br" or "gzip" for an Accept-Encoding header, or None to send identity."""
+    if not header:
+        return None
+    accepted = _accepted(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_for_encoding(etag: str, encoding: str) -> str:
+    """ETag of the encoded representation: the content-coding goes inside the quotes."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressedResponse(Response):
+    async def __call__(self, scope, receive, send):
+        if "content-encoding" not in self.headers:
+            # the choice depends on Accept-Encoding even when this body is too small to compress
+            self.headers.add_vary_header("Accept-Encoding")
+        if len(self.body) >= COMPRESS_MIN_BYTES and "content-encoding" not in self.headers:
+            header = ""
+            for name, value in scope.get("headers", []):
+                if name == b"accept-encoding":
+                    header = value.decode("latin-1")
+                    break
+            encoding = negotiate_encoding(header)
+            if encoding:
+                self.body = compress(self.body, encoding)
+                self.headers["content-encoding"] = encoding
+                self.headers["content-length"] = str(len(self.body))
+                if "etag" in self.headers:
+                    self.headers["etag"] = etag_for_encoding(self.headers["etag"], encoding)
+        await super().__call__(scope, receive, send)
+
+
+def _default(value):
+    return jsonable_encoder(value)
+
+
+class FastJSONResponse(CompressedResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
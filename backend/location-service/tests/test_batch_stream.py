@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from presentationlayer.controllers import router
+from businesslogiclayer.location_service import BATCH_MAX_ITEMS
+from exceptions.global_exception_handler import register_exception_handlers
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1/location")
+    register_exception_handlers(app)
+    return TestClient(app)
+
+
+def test_stream_rejects_oversized_batch_before_streaming():
+    client = make_client()
+    resp = client.post("/api/v1/location/resolve/batch/stream", json={"queries": ["paris"] * (BATCH_MAX_ITEMS + 1)})
+    assert resp.status_code == 400
+    assert str(BATCH_MAX_ITEMS) in resp.json()["detail"]
+    assert resp.headers["content-type"].startswith("application/json")
+
+
+def test_batch_rejects_oversized_batch():
+    client = make_client()
+    resp = client.post("/api/v1/location/resolve/batch", json={"queries": ["paris"] * (BATCH_MAX_ITEMS + 1)})
+    assert resp.status_code == 400
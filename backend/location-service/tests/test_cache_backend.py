@@ -0,0 +1,135 @@
+import asyncio
+
+import orjson
+import pytest
+
+from dataaccesslayer import cache_backend
+from dataaccesslayer.cache_backend import MemoryBackend, RedisBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+LARGE = {"list": [{"dt": i, "main": {"temp": 20.5, "humidity": 60}} for i in range(200)]}
+
+
+def memory_backend():
+    return MemoryBackend("test")
+
+
+def redis_backend(server=None):
+    return RedisBackend("test", prefix="contract", client=fakeredis.FakeAsyncRedis(server=server or fakeredis.FakeServer()))
+
+
+BACKENDS = pytest.mark.parametrize("make_backend", [memory_backend, redis_backend], ids=["memory", "redis"])
+
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+
+@BACKENDS
+def test_get_set_and_delete(make_backend):
+    async def scenario():
+        backend = make_backend()
+        assert await backend.get("k") is None
+        await backend.set("k", {"temp": 21, "tags": ["a", "b"], "none": None}, ttl=60)
+        first = await backend.get("k")
+        await backend.set("k", [1, 2, 3], ttl=60)
+        second = await backend.get("k")
+        await backend.delete("k")
+        third = await backend.get("k")
+        await backend.delete("missing")
+        await backend.aclose()
+        return first, second, third, backend.stats()
+
+    first, second, third, stats = run(scenario)
+    assert first == {"temp": 21, "tags": ["a", "b"], "none": None}
+    assert second == [1, 2, 3]
+    assert third is None
+    assert stats["latency"]["get"]["calls"] == 4 and stats["latency"]["get"]["errors"] == 0
+
+
+@BACKENDS
+def test_entries_expire_after_their_ttl(make_backend):
+    async def scenario():
+        backend = make_backend()
+        await backend.set("short", "gone soon", ttl=0.05)
+        await backend.set("long", "still here", ttl=60)
+        before = await backend.get("short")
+        await asyncio.sleep(0.1)
+        return before, await backend.get("short"), await backend.get("long")
+
+    assert run(scenario) == ("gone soon", None, "still here")
+
+
+@BACKENDS
+def test_large_values_round_trip(make_backend):
+    async def scenario():
+        backend = make_backend()
+        await backend.set("big", LARGE, ttl=60)
+        return await backend.get("big")
+
+    assert run(scenario) == LARGE
+
+
+@BACKENDS
+def test_clear_removes_every_entry(make_backend):
+    async def scenario():
+        backend = make_backend()
+        await backend.set("a", 1, ttl=60)
+        await backend.set("b", 2, ttl=60)
+        await backend.clear()
+        return await backend.get("a"), await backend.get("b")
+
+    assert run(scenario) == (None, None)
+
+
+def test_redis_stores_large_values_compressed():
+    assert len(cache_backend.encode_value({"small": 1})) < cache_backend.CACHE_COMPRESS_MIN_BYTES
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        backend = redis_backend(server)
+        await backend.set("big", LARGE, ttl=60)
+        await backend.set("small", {"temp": 1}, ttl=60)
+        raw = fakeredis.FakeAsyncRedis(server=server)
+        return await raw.get("contract:test:big"), await raw.get("contract:test:small"), await raw.pttl("contract:test:big")
+
+    big, small, ttl_ms = run(scenario)
+    assert big[:1] == b"z" and len(big) < len(orjson.dumps(LARGE)) / 4
+    assert cache_backend.decode_value(big) == LARGE
+    assert small[:1] == b"j"
+    assert 0 < ttl_ms <= 60000
+
+
+def test_redis_errors_degrade_to_misses():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        backend = redis_backend(server)
+        await backend.set("k", "v", ttl=60)
+        server.connected = False  # the Redis server goes away
+        during = await backend.get("k")
+        await backend.set("k2", "v2", ttl=60)
+        await backend.delete("k")
+        server.connected = True
+        after = await backend.get("k")
+        return during, after, backend.stats()
+
+    during, after, stats = run(scenario)
+    assert during is None
+    assert after == "v"
+    assert stats["latency"]["get"]["errors"] == 1
+    assert stats["latency"]["set"]["errors"] == 1
+    assert stats["latency"]["delete"]["errors"] == 1
+    assert stats["last_error"]
+
+
+def test_undecodable_redis_values_are_misses():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        backend = redis_backend(server)
+        await fakeredis.FakeAsyncRedis(server=server).set("contract:test:junk", b"z not zlib")
+        return await backend.get("junk"), backend.stats()
+
+    value, stats = run(scenario)
+    assert value is None
+    assert stats["latency"]["get"]["errors"] == 1
@@ -0,0 +1,72 @@
+import asyncio
+from businesslogiclayer.query_parser import parse_query, parse_coordinates, COORDINATES, CITY_COUNTRY, TEXT
+from businesslogiclayer.location_service import LocationService
+from domainclientlayer.geocode_client import GeocodeClient
+from exceptions.custom_exceptions import InvalidLocationException
+
+
+class FakeGeocoder:
+    """Records geocode calls; queries under a country hint in `misses` are not found."""
+
+    def __init__(self, misses=()):
+        self.calls = []
+        self.misses = set(misses)
+
+    async def geocode(self, query, priority=None, country_code=None):
+        self.calls.append((query, country_code))
+        if country_code is not None and (query, country_code) in self.misses:
+            raise InvalidLocationException(f"Location '{query}' could not be found")
+        return {"lat": 33.749, "lng": -84.388, "display_name": query, "source": "fake"}
+
+
+def country_code(name):
+    return {"georgia": "GE", "france": "FR"}.get(name)
+
+
+def test_single_hemisphere_is_not_a_coordinate_pair():
+    assert parse_coordinates("12 34 N") is None
+    assert parse_coordinates("12 N 34") is None
+    assert parse_query("12 34 N").kind == TEXT
+
+
+def test_coordinates_with_both_axes_or_decimal_form():
+    assert parse_coordinates("43.65N 79.38W") == (43.65, -79.38)
+    assert parse_coordinates("79.38W 43.65N") == (43.65, -79.38)
+    assert parse_coordinates("43.65, -79.38") == (43.65, -79.38)
+    assert parse_query("43°39'N 79°23'W").kind == COORDINATES
+
+
+def test_state_named_like_a_country_is_geocoded_without_hint():
+    assert parse_query("Atlanta, Georgia", country_code).kind == CITY_COUNTRY
+    service = LocationService()
+    service.load_gazetteer()
+    service.gazetteer.country_code = country_code
+    service.client = FakeGeocoder()
+    asyncio.run(service._resolve("Atlanta, Georgia"))
+    assert service.client.calls == [("Atlanta, Georgia", None)]
+
+
+def test_hinted_miss_is_retried_without_hint():
+    service = LocationService()
+    service.gazetteer_enabled = False
+    service.gazetteer.country_code = country_code
+    service.client = FakeGeocoder(misses={("Atlanta, Georgia", "GE")})
+    resolution = asyncio.run(service._resolve("Atlanta, Georgia"))
+    assert service.client.calls == [("Atlanta, Georgia", "GE"), ("Atlanta, Georgia", None)]
+    assert resolution["source"] == "fake"
+    assert service.hint_retries == 1
+
+
+def test_hinted_miss_is_not_negatively_cached():
+    client = GeocodeClient()
+    client.key = None  # mock mode: "atlantis" is not found
+    client.cache.store = None
+
+    async def run():
+        try:
+            await client.geocode("Atlantis", country_code="GE")
+        except InvalidLocationException:
+            pass
+        return await client.cache.get(client.cache_key("Atlantis", "GE"))
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark of the response layer on the largest payloads:
+  - a raw OpenWeather /forecast response (40 three-hour entries) as returned by GET /weather/forecast
+  - /records/export?format=json with 1000 weather snapshots
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with FastJSONResponse (orjson),
+and reports gzip / brotli sizes and timings for the negotiated compression.
+
+Run from backend/:
+  python perf/bench_responses.py [--rounds 200] [--out results.json]
+"""
+import os
+import sys
+import json
+import time
+import gzip
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "weather-service"))
+
+from fastapi.encoders import jsonable_encoder
+from presentationlayer.responses import FastJSONResponse, compress, brotli
+
+
+def forecast_payload(seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    start = 1_700_000_000
+    items = []
+    for i in range(40):
+        temp = round(rng.uniform(-5, 30), 2)
+        items.append({
+            "dt": start + i * 10800,
+            "main": {
+                "temp": temp, "feels_like": round(temp - 1.3, 2), "temp_min": round(temp - 1, 2),
+                "temp_max": round(temp + 1, 2), "pressure": 1013, "sea_level": 1013, "grnd_level": 1001,
+                "humidity": rng.randint(30, 95), "temp_kf": 0.0,
+            },
+            "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+            "clouds": {"all": rng.randint(0, 100)},
+            "wind": {"speed": round(rng.uniform(0, 12), 2), "deg": rng.randint(0, 359), "gust": round(rng.uniform(0, 18), 2)},
+            "visibility": 10000,
+            "pop": round(rng.random(), 2),
+            "sys": {"pod": "d"},
+            "dt_txt": datetime.fromtimestamp(start + i * 10800, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    raw = {"cod": "200", "message": 0, "cnt": 40, "list": items,
+           "city": {"id": 6167865, "name": "Toronto", "coord": {"lat": 43.6532, "lon": -79.3832},
+                    "country": "CA", "population": 2600000, "timezone": -18000}}
+    return {"raw": raw, "aggregated": [], "freshness": {"stale": False, "age": 0.0}}
+
+
+def export_payload(records: int = 1000) -> dict:
+    now = datetime.now(timezone.utc)
+    snapshot = forecast_payload()["raw"]["list"][0]
+    locations = [
+        {"id": i, "query": f"city {i}", "lat": 43.0 + i / 100, "lng": -79.0 - i / 100,
+         "display_name": f"City {i}, Country", "source": "opencage", "created_at": (now - timedelta(minutes=i)).isoformat()}
+        for i in range(100)
+    ]
+    weather = [
+        {"id": i, "location_id": i % 100, "lat": 43.0, "lng": -79.0, "snapshot": snapshot, "kind": "current",
+         "created_at": (now - timedelta(minutes=i)).isoformat()}
+        for i in range(records)
+    ]
+    return {"locations": locations, "weather": weather}
+
+
+def timed(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def default_render(payload) -> bytes:
+    # what FastAPI + starlette.JSONResponse do for a plain dict return value
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def bench(name: str, payload: dict, rounds: int) -> dict:
+    fast = FastJSONResponse(payload)
+    body = fast.body
+    result = {
+        "payload": name,
+        "bytes": len(body),
+        "default_ms": round(timed(lambda: default_render(payload), rounds), 3),
+        "orjson_ms": round(timed(lambda: FastJSONResponse(payload), rounds), 3),
+        "gzip_bytes": len(gzip.compress(body, 5)),
+        "gzip_ms": round(timed(lambda: compress(body, "gzip"), rounds), 3),
+    }
+    if brotli is not None:
+        result["br_bytes"] = len(compress(body, "br"))
+        result["br_ms"] = round(timed(lambda: compress(body, "br"), rounds), 3)
+    result["speedup"] = round(result["default_ms"] / result["orjson_ms"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = [
+        bench("forecast_raw", forecast_payload(), args.rounds),
+        bench("export_json", export_payload(), max(1, args.rounds // 10)),
+    ]
+    for r in results:
+        line = (f"{r['payload']:<14} {r['bytes']:>9} B  default {r['default_ms']:>8.3f} ms  "
+                f"orjson {r['orjson_ms']:>7.3f} ms (x{r['speedup']})  gzip {r['gzip_bytes']:>8} B {r['gzip_ms']:.3f} ms")
+        if "br_bytes" in r:
+            line += f"  br {r['br_bytes']:>8} B {r['br_ms']:.3f} ms"
+        print(line)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"benchmark": "responses", "python": sys.version.split()[0], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
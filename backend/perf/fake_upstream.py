@@ -0,0 +1,285 @@
+"""
+Local stand-in for the OpenWeather and OpenCage APIs, for offline development and load tests.
+Serves realistic payloads for any coordinate or query (deterministic per input, changing over time
+like the real services):
+  - GET /data/2.5/weather?lat=&lon=&appid=      OpenWeather current weather
+  - GET /data/2.5/forecast?lat=&lon=&appid=     OpenWeather 5 day / 3 hour forecast (40 entries)
+  - GET /geocode/v1/json?q=&key=                OpenCage forward geocoding ("nowhere" -> no results)
+Latency, error rate and 429 rate are configurable on the command line and at runtime through
+GET/POST /_fake/config; /_fake/stats reports request counters.
+
+Run from backend/:
+  python perf/fake_upstream.py --port 9000 --latency-ms 80 --jitter-ms 30 --error-rate 0.01 --rate-limit-rate 0.02
+and start the services with
+  OPENWEATHER_BASE_URL=http://127.0.0.1:9000/data/2.5 OPENWEATHER_API_KEY=fake
+  GEOCODING_BASE_URL=http://127.0.0.1:9000 OPENCAGE_API_KEY=fake
+"""
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+import uvicorn
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+app = FastAPI(title="fake-upstream")
+
+
+class FakeConfig(BaseModel):
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+
+
+config = FakeConfig()
+counters = Counter()
+
+CONDITIONS = [
+    (800, "Clear", "clear sky", "01"),
+    (801, "Clouds", "few clouds", "02"),
+    (802, "Clouds", "scattered clouds", "03"),
+    (804, "Clouds", "overcast clouds", "04"),
+    (500, "Rain", "light rain", "10"),
+    (501, "Rain", "moderate rain", "10"),
+    (600, "Snow", "light snow", "13"),
+    (701, "Mist", "mist", "50"),
+]
+
+KNOWN_PLACES = {
+    "toronto": (43.6532, -79.3832, "Toronto, Ontario, Canada", "CA"),
+    "paris": (48.8566, 2.3522, "Paris, Île-de-France, France", "FR"),
+    "new york": (40.7128, -74.0060, "New York, NY, United States of America", "US"),
+    "london": (51.5074, -0.1278, "London, England, United Kingdom", "GB"),
+    "tokyo": (35.6762, 139.6503, "Tokyo, Japan", "JP"),
+}
+
+
+def _rng(*parts) -> random.Random:
+    seed = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+    return random.Random(int(seed, 16))
+
+
+async def _simulate(kind: str) -> Optional[JSONResponse]:
+    """Apply configured latency, then maybe fail with a 5xx or a 429 like the real providers."""
+    counters[f"{kind}_requests"] += 1
+    delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+    if delay:
+        await asyncio.sleep(delay)
+    roll = random.random()
+    if roll < config.rate_limit_rate:
+        counters[f"{kind}_429"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation"},
+            headers={"Retry-After": str(config.retry_after)},
+        )
+    if roll < config.rate_limit_rate + config.error_rate:
+        counters[f"{kind}_errors"] += 1
+        status = random.choice([500, 502, 503])
+        return JSONResponse(status_code=status, content={"cod": status, "message": "Internal error"})
+    return None
+
+
+def _unauthorized() -> JSONResponse:
+    return JSONResponse(status_code=401, content={"cod": 401, "message": "Invalid API key."})
+
+
+def _timezone(lng: float) -> int:
+    return int(round(lng / 15.0)) * 3600
+
+
+def _temperature(lat: float, lng: float, dt: int) -> float:
+    base = 27.0 - abs(lat) * 0.45
+    local_hour = ((dt + _timezone(lng)) % 86400) / 3600
+    diurnal = 5.0 * math.sin((local_hour - 9) / 24 * 2 * math.pi)
+    return round(base + diurnal + _rng(lat, lng, dt // 21600).uniform(-2, 2), 2)
+
+
+def _condition(lat: float, lng: float, dt: int):
+    cid, main, description, icon = _rng("cond", round(lat, 2), round(lng, 2), dt // 10800).choice(CONDITIONS)
+    local_hour = ((dt + _timezone(lng)) % 86400) // 3600
+    return {"id": cid, "main": main, "description": description, "icon": icon + ("d" if 6 <= local_hour < 18 else "n")}
+
+
+def _main_block(lat: float, lng: float, dt: int, rng: random.Random) -> dict:
+    temp = _temperature(lat, lng, dt)
+    pressure = rng.randint(995, 1030)
+    return {
+        "temp": temp,
+        "feels_like": round(temp - rng.uniform(0, 3), 2),
+        "temp_min": round(temp - rng.uniform(0, 1.5), 2),
+        "temp_max": round(temp + rng.uniform(0, 1.5), 2),
+        "pressure": pressure,
+        "sea_level": pressure,
+        "grnd_level": pressure - rng.randint(0, 15),
+        "humidity": rng.randint(25, 98),
+    }
+
+
+def _precipitation(weather: dict, rng: random.Random, window: str) -> dict:
+    if weather["main"] == "Rain":
+        return {"rain": {window: round(rng.uniform(0.1, 4.0), 2)}}
+    if weather["main"] == "Snow":
+        return {"snow": {window: round(rng.uniform(0.1, 2.0), 2)}}
+    return {}
+
+
+def _city(lat: float, lng: float) -> dict:
+    rng = _rng("city", round(lat, 1), round(lng, 1))
+    return {"id": rng.randint(100000, 9999999), "name": f"Place {abs(round(lat, 1))}{'N' if lat >= 0 else 'S'} {abs(round(lng, 1))}{'E' if lng >= 0 else 'W'}"}
+
+
+@app.get("/data/2.5/weather")
+async def current_weather(lat: float = Query(...), lon: float = Query(...), appid: str = Query(None), units: str = "metric"):
+    if not appid:
+        return _unauthorized()
+    failure = await _simulate("weather")
+    if failure is not None:
+        return failure
+    now = int(time.time())
+    dt = now - now % 600  # stations report about every 10 minutes
+    rng = _rng("current", round(lat, 2), round(lon, 2), dt)
+    weather = _condition(lat, lon, dt)
+    city = _city(lat, lon)
+    day = dt - dt % 86400
+    return {
+        "coord": {"lon": round(lon, 4), "lat": round(lat, 4)},
+        "weather": [weather],
+        "base": "stations",
+        "main": _main_block(lat, lon, dt, rng),
+        "visibility": rng.choice([10000, 10000, 8000, 5000]),
+        "wind": {"speed": round(rng.uniform(0, 12), 2), "deg": rng.randint(0, 359), "gust": round(rng.uniform(0, 18), 2)},
+        **_precipitation(weather, rng, "1h"),
+        "clouds": {"all": rng.randint(0, 100)},
+        "dt": dt,
+        "sys": {"country": "XX", "sunrise": day + 21600 - _timezone(lon), "sunset": day + 64800 - _timezone(lon)},
+        "timezone": _timezone(lon),
+        "id": city["id"],
+        "name": city["name"],
+        "cod": 200,
+    }
+
+
+@app.get("/data/2.5/forecast")
+async def forecast(lat: float = Query(...), lon: float = Query(...), appid: str = Query(None), units: str = "metric", cnt: int = 40):
+    if not appid:
+        return _unauthorized()
+    failure = await _simulate("forecast")
+    if failure is not None:
+        return failure
+    now = int(time.time())
+    start = now - now % 10800 + 10800
+    items = []
+    for i in range(max(1, min(cnt, 40))):
+        dt = start + i * 10800
+        rng = _rng("forecast", round(lat, 2), round(lon, 2), dt)
+        weather = _condition(lat, lon, dt)
+        main = _main_block(lat, lon, dt, rng)
+        main["temp_kf"] = 0
+        local_hour = ((dt + _timezone(lon)) % 86400) // 3600
+        items.append({
+            "dt": dt,
+            "main": main,
+            "weather": [weather],
+            "clouds": {"all": rng.randint(0, 100)},
+            "wind": {"speed": round(rng.uniform(0, 12), 2), "deg": rng.randint(0, 359), "gust": round(rng.uniform(0, 18), 2)},
+            "visibility": 10000,
+            "pop": round(rng.random(), 2),
+            **_precipitation(weather, rng, "3h"),
+            "sys": {"pod": "d" if 6 <= local_hour < 18 else "n"},
+            "dt_txt": datetime.fromtimestamp(dt, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    city = _city(lat, lon)
+    day = now - now % 86400
+    return {
+        "cod": "200",
+        "message": 0,
+        "cnt": len(items),
+        "list": items,
+        "city": {
+            **city,
+            "coord": {"lat": round(lat, 4), "lon": round(lon, 4)},
+            "country": "XX",
+            "population": _rng("pop", city["id"]).randint(1000, 5000000),
+            "timezone": _timezone(lon),
+            "sunrise": day + 21600 - _timezone(lon),
+            "sunset": day + 64800 - _timezone(lon),
+        },
+    }
+
+
+@app.get("/geocode/v1/json")
+async def geocode(q: str = Query(...), key: str = Query(None), limit: int = 1, no_annotations: int = 0):
+    if not key:
+        return JSONResponse(status_code=401, content={"status": {"code": 401, "message": "invalid API key"}, "results": []})
+    failure = await _simulate("geocode")
+    if failure is not None:
+        return failure
+    normalized = " ".join(q.lower().split())
+    if not normalized or "nowhere" in normalized:
+        return {"results": [], "status": {"code": 200, "message": "OK"}, "total_results": 0}
+    known = next((v for k, v in KNOWN_PLACES.items() if k in normalized), None)
+    if known:
+        lat, lng, formatted, country = known
+    else:
+        rng = _rng("geocode", normalized)
+        lat, lng = round(rng.uniform(-55, 70), 7), round(rng.uniform(-180, 180), 7)
+        formatted, country = f"{q.strip().title()}, Testland", "XX"
+    result = {
+        "geometry": {"lat": lat, "lng": lng},
+        "formatted": formatted,
+        "confidence": 7,
+        "components": {"_type": "city", "city": formatted.split(",")[0], "country_code": country.lower()},
+    }
+    return {"results": [result][:max(1, limit)], "status": {"code": 200, "message": "OK"}, "total_results": 1}
+
+
+@app.get("/_fake/config")
+async def get_config():
+    return config.model_dump()
+
+
+@app.post("/_fake/config")
+async def update_config(update: dict):
+    """Change latency / error behaviour at runtime, e.g. {"error_rate": 0.5}."""
+    global config
+    config = config.model_copy(update={k: v for k, v in update.items() if k in FakeConfig.model_fields})
+    return config.model_dump()
+
+
+@app.get("/_fake/stats")
+async def get_stats():
+    return dict(counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenWeather / OpenCage upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    global config
+    config = FakeConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
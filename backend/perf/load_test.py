@@ -0,0 +1,200 @@
+"""
+Closed-loop load test for the weather path: N concurrent workers send a weighted mix of requests
+to weather-service and location-service for a fixed duration and record every latency.
+Reports throughput, error counts and p50/p95/p99 per scenario, saves the run as JSON under
+perf/results/ and can print the change against an earlier run.
+
+Scenarios (weights set with --mix):
+  current   GET  /api/v1/weather/current?lat=&lng=
+  forecast  GET  /api/v1/weather/forecast?lat=&lng=
+  batch     POST /api/v1/weather/current/batch (--batch-size coordinates)
+  resolve   POST /api/v1/location/resolve
+
+Typical run from backend/ (fake upstream on :9000, services pointed at it, see fake_upstream.py):
+  python perf/load_test.py --duration 30 --concurrency 50 --locations 200 --label baseline
+  python perf/load_test.py --duration 30 --concurrency 50 --locations 200 --label pooled --compare perf/results/<baseline>.json
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import httpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+CITY_WORDS = ["toronto", "paris", "london", "tokyo", "new york", "springfield", "riverside", "fairview", "madison", "georgetown"]
+
+
+def percentile(ordered: list, p: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        rng = random.Random(args.seed)
+        # a fixed set of distinct locations: fewer locations -> higher cache hit ratio
+        self.coordinates = [(round(rng.uniform(-55, 70), 4), round(rng.uniform(-180, 180), 4)) for _ in range(args.locations)]
+        self.queries = [f"{rng.choice(CITY_WORDS)} {i}" if i >= len(CITY_WORDS) else CITY_WORDS[i] for i in range(args.locations)]
+        self.mix = parse_mix(args.mix)
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def _request(self, rng: random.Random, scenario: str):
+        lat, lng = rng.choice(self.coordinates)
+        weather, location = self.args.weather_url.rstrip("/"), self.args.location_url.rstrip("/")
+        if scenario == "current":
+            return "GET", f"{weather}/api/v1/weather/current", {"params": {"lat": lat, "lng": lng}}
+        if scenario == "forecast":
+            return "GET", f"{weather}/api/v1/weather/forecast", {"params": {"lat": lat, "lng": lng}}
+        if scenario == "batch":
+            coords = [{"lat": c[0], "lng": c[1]} for c in rng.sample(self.coordinates, min(self.args.batch_size, len(self.coordinates)))]
+            return "POST", f"{weather}/api/v1/weather/current/batch", {"json": {"coordinates": coords}}
+        if scenario == "resolve":
+            return "POST", f"{location}/api/v1/location/resolve", {"json": {"query": rng.choice(self.queries)}}
+        raise ValueError(f"Unknown scenario {scenario}")
+
+    async def _worker(self, worker_id: int, client: httpx.AsyncClient, deadline: float):
+        rng = random.Random(self.args.seed * 1000 + worker_id)
+        names, weights = list(self.mix), list(self.mix.values())
+        while time.monotonic() < deadline:
+            scenario = rng.choices(names, weights)[0]
+            method, url, kwargs = self._request(rng, scenario)
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, url, **kwargs)
+                await resp.aread()
+                status = str(resp.status_code)
+            except httpx.HTTPError as e:
+                status = e.__class__.__name__
+            self.latencies[scenario].append((time.perf_counter() - started) * 1000)
+            self.statuses[scenario][status] += 1
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(timeout=self.args.timeout, limits=limits) as client:
+            if self.args.warmup:
+                warm = time.monotonic() + self.args.warmup
+                await asyncio.gather(*(self._worker(i, client, warm) for i in range(self.args.concurrency)))
+                self.latencies.clear()
+                self.statuses.clear()
+            started = time.monotonic()
+            deadline = started + self.args.duration
+            await asyncio.gather(*(self._worker(i, client, deadline) for i in range(self.args.concurrency)))
+            elapsed = time.monotonic() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        scenarios = {}
+        all_latencies = []
+        total_errors = 0
+        for name, samples in self.latencies.items():
+            ordered = sorted(samples)
+            all_latencies.extend(samples)
+            errors = sum(n for status, n in self.statuses[name].items() if not status.startswith(("2", "3")))
+            total_errors += errors
+            scenarios[name] = {
+                "requests": len(samples),
+                "errors": errors,
+                "status_counts": dict(self.statuses[name]),
+                "throughput_rps": round(len(samples) / elapsed, 1),
+                "mean_ms": round(sum(samples) / len(samples), 2),
+                "p50_ms": round(percentile(ordered, 50), 2),
+                "p95_ms": round(percentile(ordered, 95), 2),
+                "p99_ms": round(percentile(ordered, 99), 2),
+            }
+        ordered = sorted(all_latencies)
+        return {
+            "label": self.args.label,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                "duration_s": self.args.duration,
+                "concurrency": self.args.concurrency,
+                "locations": self.args.locations,
+                "mix": self.mix,
+                "batch_size": self.args.batch_size,
+                "weather_url": self.args.weather_url,
+                "location_url": self.args.location_url,
+            },
+            "total": {
+                "requests": len(ordered),
+                "errors": total_errors,
+                "throughput_rps": round(len(ordered) / elapsed, 1),
+                "p50_ms": round(percentile(ordered, 50), 2),
+                "p95_ms": round(percentile(ordered, 95), 2),
+                "p99_ms": round(percentile(ordered, 99), 2),
+            },
+            "scenarios": scenarios,
+        }
+
+
+def print_report(result: dict, baseline: dict = None):
+    def delta(now: float, before: float) -> str:
+        if before in (None, 0):
+            return ""
+        return f" ({(now - before) / before * 100:+.0f}%)"
+
+    rows = [("total", result["total"])] + sorted(result["scenarios"].items())
+    old = {"total": baseline["total"], **baseline["scenarios"]} if baseline else {}
+    print(f"{'scenario':<10} {'requests':>9} {'errors':>7} {'rps':>14} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    for name, r in rows:
+        before = old.get(name, {})
+        print(
+            f"{name:<10} {r['requests']:>9} {r['errors']:>7} "
+            f"{str(r['throughput_rps']) + delta(r['throughput_rps'], before.get('throughput_rps')):>14} "
+            f"{str(r['p50_ms']) + delta(r['p50_ms'], before.get('p50_ms')):>16} "
+            f"{str(r['p95_ms']) + delta(r['p95_ms'], before.get('p95_ms')):>16} "
+            f"{str(r['p99_ms']) + delta(r['p99_ms'], before.get('p99_ms')):>16}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weather-url", default="http://127.0.0.1:8002")
+    parser.add_argument("--location-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=0.0, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--locations", type=int, default=100, help="distinct coordinates / queries used")
+    parser.add_argument("--mix", default="current=5,forecast=3,resolve=2", help="weighted scenarios, e.g. current=5,forecast=3,batch=1,resolve=2")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", help="result file (default perf/results/<timestamp>-<label>.json)")
+    parser.add_argument("--compare", help="earlier result file to show deltas against")
+    args = parser.parse_args()
+
+    result = asyncio.run(LoadTest(args).run())
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{stamp}-{args.label}.json")
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {out}")
+
+
+if __name__ == "__main__":
+    main()
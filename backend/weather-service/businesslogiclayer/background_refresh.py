@@ -0,0 +1,109 @@
+"""
+Background refresh for the weather cache (stale-while-revalidate).
+When a stale entry is served, WeatherService schedules a refresh here instead of making the user wait.
+A periodic scan also refreshes hot keys (by access count) shortly before they expire, so popular
+locations rarely go stale at all. Refreshes run with bounded concurrency and share the service's
+SingleFlight registry, so a key is never fetched twice at the same time.
+"""
+import os
+import asyncio
+from typing import Awaitable, Callable
+from dotenv import load_dotenv
+load_dotenv()
+
+SWR_ENABLED = os.getenv("WEATHER_SWR_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+SWR_REFRESH_CONCURRENCY = int(os.getenv("WEATHER_SWR_REFRESH_CONCURRENCY", 4))
+SWR_MAX_PENDING = int(os.getenv("WEATHER_SWR_MAX_PENDING", 256))
+SWR_SCAN_INTERVAL = float(os.getenv("WEATHER_SWR_SCAN_INTERVAL", 30))
+SWR_HOT_MIN_ACCESSES = int(os.getenv("WEATHER_SWR_HOT_MIN_ACCESSES", 5))
+SWR_REFRESH_AHEAD = float(os.getenv("WEATHER_SWR_REFRESH_AHEAD", 60))
+
+
+class BackgroundRefresher:
+    def __init__(
+        self,
+        cache,
+        flights,
+        loader: Callable[[str, float, float], Awaitable[dict]],
+        concurrency: int = SWR_REFRESH_CONCURRENCY,
+        max_pending: int = SWR_MAX_PENDING,
+        scan_interval: float = SWR_SCAN_INTERVAL,
+        hot_min_accesses: int = SWR_HOT_MIN_ACCESSES,
+        refresh_ahead: float = SWR_REFRESH_AHEAD,
+    ):
+        self.cache = cache
+        self.flights = flights
+        self.loader = loader
+        self.max_pending = max_pending
+        self.scan_interval = scan_interval
+        self.hot_min_accesses = hot_min_accesses
+        self.refresh_ahead = refresh_ahead
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._concurrency = concurrency
+        self._pending = {}
+        self._scan_task = None
+        self._scheduled = 0
+        self._dropped = 0
+        self._refreshed = 0
+        self._failed = 0
+
+    def schedule(self, kind: str, lat: float, lng: float) -> bool:
+        """
+        Queue a refresh for (kind, lat, lng) unless one is already pending or the queue is full.
+        Returns True if a refresh was queued.
+        """
+        key = self.cache.make_key(kind, lat, lng)
+        if key in self._pending:
+            return False
+        if len(self._pending) >= self.max_pending:
+            self._dropped += 1
+            return False
+        task = asyncio.ensure_future(self._refresh(key, kind, lat, lng))
+        self._pending[key] = task
+        task.add_done_callback(lambda t, k=key: self._pending.pop(k, None))
+        self._scheduled += 1
+        return True
+
+    async def _refresh(self, key: str, kind: str, lat: float, lng: float):
+        async with self._semaphore:
+            try:
+                await self.flights.do(key, lambda: self.loader(kind, lat, lng))
+                self._refreshed += 1
+            except Exception as e:
+                # the stale copy stays in place until max staleness; the next reader retries
+                self._failed += 1
+                print(f"[refresh] failed to refresh {key}: {e}")
+
+    async def _scan_loop(self):
+        while True:
+            await asyncio.sleep(self.scan_interval)
+            try:
+                for entry in self.cache.hot_entries(self.hot_min_accesses, self.refresh_ahead):
+                    self.schedule(entry.kind, entry.lat, entry.lng)
+                self.cache.decay_accesses()
+            except Exception as e:
+                print(f"[refresh] hot-key scan failed: {e}")
+
+    def start(self):
+        if self._scan_task is None:
+            self._scan_task = asyncio.ensure_future(self._scan_loop())
+
+    async def stop(self):
+        tasks = list(self._pending.values())
+        if self._scan_task is not None:
+            tasks.append(self._scan_task)
+            self._scan_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._scan_task is not None,
+            "concurrency": self._concurrency,
+            "pending": len(self._pending),
+            "scheduled": self._scheduled,
+            "dropped": self._dropped,
+            "refreshed": self._refreshed,
+            "failed": self._failed,
+        }
@@ -0,0 +1,64 @@
+"""
+Date-indexed daily series per location, computed once per forecast revision.
+A revision is the cached raw forecast itself: while the cache keeps returning the same payload
+(the same object from the in-process backend, an equal one from a shared backend), the aggregated
+days are reused and a date range is a bisect + slice over sorted ISO dates.
+When the forecast is refetched (new payload), the series is rebuilt on next use.
+"""
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable
+
+SERIES_DAYS = 7
+
+
+class DailySeries:
+    __slots__ = ("revision", "dates", "days")
+
+    def __init__(self, revision: dict, days: list):
+        self.revision = revision
+        self.days = sorted(days, key=lambda d: d["date"])
+        self.dates = [d["date"] for d in self.days]
+
+    def range(self, start: str, end: str) -> list:
+        """Days with start <= date <= end (ISO YYYY-MM-DD strings, inclusive)."""
+        return self.days[bisect_left(self.dates, start):bisect_right(self.dates, end)]
+
+
+def _iso_day(value) -> str:
+    # mock 'daily' payloads carry epoch seconds instead of ISO dates
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc).date().isoformat()
+    return str(value or "")
+
+
+class DailySeriesIndex:
+    def __init__(self, aggregate: Callable[[dict, int], list], max_locations: int = 1000):
+        self.aggregate = aggregate
+        self.max_locations = max_locations
+        self._series = OrderedDict()
+        self._builds = 0
+        self._reuses = 0
+
+    def get(self, key: str, raw_forecast: dict) -> DailySeries:
+        """
+        Series for location `key` at the revision `raw_forecast`, aggregating only if the
+        revision changed since the last call.
+        """
+        series = self._series.get(key)
+        if series is not None and (series.revision is raw_forecast or series.revision == raw_forecast):
+            self._series.move_to_end(key)
+            self._reuses += 1
+            return series
+        days = [{**d, "date": _iso_day(d.get("date"))} for d in self.aggregate(raw_forecast, SERIES_DAYS)]
+        series = DailySeries(raw_forecast, days)
+        self._series[key] = series
+        self._series.move_to_end(key)
+        while len(self._series) > self.max_locations:
+            self._series.popitem(last=False)
+        self._builds += 1
+        return series
+
+    def stats(self) -> dict:
+        return {"locations": len(self._series), "builds": self._builds, "reuses": self._reuses}
@@ -0,0 +1,209 @@
+"""
+Columnar aggregation of OpenWeather 3-hour forecasts into daily summaries.
+Entries from one or many forecasts are pulled into NumPy arrays in a single pass, grouped by
+(forecast, day) with one sort, and reduced with vectorized ufunc.reduceat calls. Days are UTC by
+default, or the location's local day using the forecast's city.timezone offset.
+
+Each day keeps the original fields (date, min_temp, max_temp, summary, icon — summary/icon being
+the first non-empty description, as before) and adds mean_temp, humidity_min/humidity_max,
+precipitation_mm (rain + snow) and the dominant condition by mode of the weather id.
+"""
+from datetime import date, timedelta
+import numpy as np
+
+_SECONDS_PER_DAY = 86400
+_EPOCH = date(1970, 1, 1)
+_NO_POSITION = np.iinfo(np.int64).max
+# OpenWeather condition ids are three digits (2xx..8xx)
+_WEATHER_ID_SPAN = 1000
+# positions of the temperature fields in the extracted row tuples
+_TEMP, _TEMP_MIN, _TEMP_MAX = 2, 3, 4
+
+
+def _num(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def _column(values: list, dtype=np.float64) -> np.ndarray:
+    """List -> array; only falls back to per-value coercion when the payload has nulls or junk."""
+    try:
+        return np.asarray(values, dtype=dtype)
+    except (TypeError, ValueError):
+        if dtype is np.int64:
+            return np.asarray([int(v) if isinstance(v, (int, float)) else -1 for v in values], dtype=np.int64)
+        return np.asarray([_num(v) for v in values], dtype=np.float64)
+
+
+def _volume(block) -> float:
+    if isinstance(block, dict):
+        value = block.get("3h", block.get("1h", 0.0))
+        return float(value) if isinstance(value, (int, float)) else 0.0
+    return 0.0
+
+
+def _py(value: float):
+    """NaN -> None so the day serializes as JSON null."""
+    return None if value != value else value
+
+
+def _temperature(value: float, rows: list, row_of: list, at: int, field: int):
+    """The reduced temperature, as the upstream int when the entry holding it sent one."""
+    if at != _NO_POSITION:
+        original = rows[row_of[at]][field]
+        if isinstance(original, int) and not isinstance(original, bool):
+            return original
+    return _py(value)
+
+
+def _first_at(values: np.ndarray, reduced: np.ndarray, starts, group, positions) -> np.ndarray:
+    """Per group, the first position whose value equals the group's reduced value."""
+    return np.minimum.reduceat(np.where(values == reduced[group], positions, _NO_POSITION), starts)
+
+
+def _extreme(ufunc, column: np.ndarray, field: int, temps: np.ndarray, starts, group, positions):
+    """
+    Reduce column per group with ufunc (fmin/fmax), falling back to temps where the column is all
+    NaN. Returns (values, positions, fields): the reduced values, where the first entry holding
+    each one sits in sort order (_NO_POSITION when the day has no temperature) and which row
+    field it came from.
+    """
+    value = ufunc.reduceat(column, starts)
+    fallback = ufunc.reduceat(temps, starts)
+    missing = np.isnan(value)
+    at = np.where(missing, _first_at(temps, fallback, starts, group, positions),
+                  _first_at(column, value, starts, group, positions))
+    return np.where(missing, fallback, value).tolist(), at.tolist(), np.where(missing, _TEMP, field).tolist()
+
+
+def aggregate_daily(raw_forecast: dict, days: int = 5, local_time: bool = False) -> list:
+    return aggregate_daily_many([raw_forecast], days, local_time)[0]
+
+
+def aggregate_daily_many(forecasts: list, days: int = 5, local_time: bool = False) -> list:
+    """
+    Aggregate several OpenWeather 'forecast' payloads (items at raw["list"]) at once.
+    Returns one list of daily summaries per input forecast, in input order.
+    """
+    rows = []
+    nan = np.nan
+    no_main = (nan, nan, nan, nan)
+
+    # single extraction pass: JSON dicts -> one tuple per entry, transposed into columns below
+    for i, raw in enumerate(forecasts):
+        offset = 0
+        if local_time:
+            offset = int((raw.get("city") or {}).get("timezone") or 0)
+        for it in raw.get("list") or []:
+            dt = it.get("dt")
+            if dt is None:
+                continue
+            main = it.get("main")
+            weather = (it.get("weather") or [{}])[0]
+            rain = it.get("rain")
+            snow = it.get("snow")
+            rows.append((
+                i,
+                dt + offset,
+                *((main.get("temp", nan), main.get("temp_min", nan), main.get("temp_max", nan),
+                   main.get("humidity", nan)) if main else no_main),
+                _volume(rain) + _volume(snow) if (rain or snow) else 0.0,
+                weather.get("id", -1),
+                weather.get("main"),
+                weather.get("description"),
+                weather.get("icon"),
+            ))
+
+    out = [[] for _ in forecasts]
+    if not rows:
+        return out
+
+    f_idx, dts, temps, tmins, tmaxs, hums, precs, wids, mains, descs, icons = zip(*rows)
+    f_idx = np.asarray(f_idx, dtype=np.int64)
+    day = _column(dts, np.int64) // _SECONDS_PER_DAY
+    order = np.lexsort((np.arange(len(day)), day, f_idx))
+
+    f_idx = f_idx[order]
+    day = day[order]
+    temps = _column(temps)[order]
+    tmins = _column(tmins)[order]
+    tmaxs = _column(tmaxs)[order]
+    hums = _column(hums)[order]
+    precs = np.asarray(precs, dtype=np.float64)[order]
+    wids = _column(wids, np.int64)[order]
+    wids[(wids < 0) | (wids >= _WEATHER_ID_SPAN)] = -1
+    mains = np.asarray(mains, dtype=object)[order]
+    descs = np.asarray(descs, dtype=object)[order]
+    icons = np.asarray(icons, dtype=object)[order]
+
+    boundary = np.empty(len(day), dtype=bool)
+    boundary[0] = True
+    boundary[1:] = (f_idx[1:] != f_idx[:-1]) | (day[1:] != day[:-1])
+    starts = np.flatnonzero(boundary)
+    group = np.cumsum(boundary) - 1
+    positions = np.arange(len(day), dtype=np.int64)
+
+    # temperatures: fmin/fmax ignore NaN; fall back to 'temp' where temp_min/temp_max are absent.
+    # The position of the first entry holding each extreme is kept so the original value (int or
+    # float, as upstream sent it) is returned rather than its float64 copy.
+    min_temp, min_at, min_field = _extreme(np.fmin, tmins, _TEMP_MIN, temps, starts, group, positions)
+    max_temp, max_at, max_field = _extreme(np.fmax, tmaxs, _TEMP_MAX, temps, starts, group, positions)
+
+    temp_present = ~np.isnan(temps)
+    temp_count = np.add.reduceat(temp_present.astype(np.int64), starts)
+    temp_sum = np.add.reduceat(np.where(temp_present, temps, 0.0), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_temp = np.where(temp_count > 0, temp_sum / np.maximum(temp_count, 1), np.nan)
+
+    hum_lo = np.fmin.reduceat(hums, starts)
+    hum_hi = np.fmax.reduceat(hums, starts)
+    precip = np.add.reduceat(precs, starts)
+
+    # representative description: first entry (in time order) with a non-empty description
+    has_desc = np.fromiter((bool(d) for d in descs), dtype=bool, count=len(descs))
+    first_desc = np.minimum.reduceat(np.where(has_desc, positions, _NO_POSITION), starts)
+
+    # dominant condition: mode of weather id per group (ties -> lowest id)
+    valid = wids >= 0
+    dominant = np.full(len(starts), -1, dtype=np.int64)
+    if valid.any():
+        combo, counts = np.unique(group[valid] * _WEATHER_ID_SPAN + wids[valid], return_counts=True)
+        combo_group = combo // _WEATHER_ID_SPAN
+        combo_wid = combo % _WEATHER_ID_SPAN
+        best = np.lexsort((combo_wid, -counts, combo_group))
+        first_of_group = np.ones(len(best), dtype=bool)
+        first_of_group[1:] = combo_group[best][1:] != combo_group[best][:-1]
+        winners = best[first_of_group]
+        dominant[combo_group[winners]] = combo_wid[winners]
+    is_dominant = valid & (wids == dominant[group])
+    first_dominant = np.minimum.reduceat(np.where(is_dominant, positions, _NO_POSITION), starts)
+
+    # per-day output; convert columns to Python lists once instead of indexing NumPy scalars
+    group_forecast = f_idx[starts].tolist()
+    group_day = day[starts].tolist()
+    row_of = order.tolist()
+    mean_temp, hum_lo, hum_hi = np.round(mean_temp, 2).tolist(), hum_lo.tolist(), hum_hi.tolist()
+    precip = np.round(precip, 2).tolist()
+    first_desc, first_dominant = first_desc.tolist(), first_dominant.tolist()
+    for g in range(len(group_day)):
+        daily = out[group_forecast[g]]
+        if len(daily) >= days:
+            continue
+        d = first_desc[g]
+        summary, icon = (descs[d], icons[d]) if d != _NO_POSITION else (None, None)
+        c = first_dominant[g]
+        condition = None
+        if c != _NO_POSITION:
+            condition = {"id": int(wids[c]), "main": mains[c], "description": descs[c], "icon": icons[c]}
+        daily.append({
+            "date": (_EPOCH + timedelta(days=group_day[g])).isoformat(),
+            "min_temp": _temperature(min_temp[g], rows, row_of, min_at[g], min_field[g]),
+            "max_temp": _temperature(max_temp[g], rows, row_of, max_at[g], max_field[g]),
+            "summary": summary,
+            "icon": icon,
+            "mean_temp": _py(mean_temp[g]),
+            "humidity_min": _py(hum_lo[g]),
+            "humidity_max": _py(hum_hi[g]),
+            "precipitation_mm": precip[g],
+            "condition": condition,
+        })
+    return out
@@ -0,0 +1,147 @@
+"""
+Background worker that drains the weather outbox into data-service.
+Snapshots are sent in batches to POST /api/v1/records/weather/bulk. Created and duplicate items
+are removed from the outbox; failed items are retried with capped exponential backoff plus
+jitter, and parked as dead after WEATHER_OUTBOX_MAX_ATTEMPTS.
+"""
+import os
+import time
+import random
+import asyncio
+from dotenv import load_dotenv
+from domainclientlayer.data_service_client import DataServiceClient, data_service
+load_dotenv()
+
+OUTBOX_BATCH_SIZE = int(os.getenv("WEATHER_OUTBOX_BATCH_SIZE", 100))
+OUTBOX_FLUSH_INTERVAL = float(os.getenv("WEATHER_OUTBOX_FLUSH_INTERVAL", 2))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("WEATHER_OUTBOX_MAX_ATTEMPTS", 10))
+OUTBOX_BASE_BACKOFF = float(os.getenv("WEATHER_OUTBOX_BASE_BACKOFF", 1))
+OUTBOX_MAX_BACKOFF = float(os.getenv("WEATHER_OUTBOX_MAX_BACKOFF", 300))
+
+
+class OutboxFlusher:
+    def __init__(
+        self,
+        outbox,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        interval: float = OUTBOX_FLUSH_INTERVAL,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        base_backoff: float = OUTBOX_BASE_BACKOFF,
+        max_backoff: float = OUTBOX_MAX_BACKOFF,
+        client: DataServiceClient = None,
+    ):
+        self.outbox = outbox
+        self.client = client or data_service
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._flushed = 0
+        self._duplicates = 0
+        self._failed = 0
+        self._dead = 0
+        self._batches = 0
+        self._last_flush_ms = None
+        self._flush_ms_total = 0.0
+        self._last_error = None
+
+    def notify(self):
+        """Wake the worker early, e.g. right after a snapshot was appended."""
+        self._wakeup.set()
+
+    def _backoff(self, attempts: int) -> float:
+        # full jitter: uniform in [0, min(cap, base * 2^attempts)]
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempts)))
+
+    async def flush_once(self) -> int:
+        """
+        Send one batch of ready entries. Returns how many entries were taken from the outbox.
+        """
+        batch = await self.outbox.ready_batch(self.batch_size)
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        now = time.time()
+        try:
+            resp = await self.client.post(
+                "/api/v1/records/weather/bulk",
+                json={"records": [payload for _, _, payload in batch]},
+            )
+            resp.raise_for_status()
+            results = resp.json().get("results", [])
+        except Exception as e:
+            # whole batch failed (data-service down, timeout, 5xx): retry everything later
+            self._last_error = str(e) or e.__class__.__name__
+            results = [{"status": "error", "detail": self._last_error}] * len(batch)
+
+        done, retries = [], []
+        for (entry_id, attempts, _), result in zip(batch, results):
+            status = result.get("status")
+            if status in ("created", "duplicate"):
+                done.append(entry_id)
+                if status == "duplicate":
+                    self._duplicates += 1
+                else:
+                    self._flushed += 1
+                continue
+            self._failed += 1
+            dead = attempts + 1 >= self.max_attempts
+            if dead:
+                self._dead += 1
+            retries.append((entry_id, now + self._backoff(attempts), result.get("detail"), dead))
+
+        await self.outbox.delete(done)
+        await self.outbox.reschedule(retries)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._batches += 1
+        self._last_flush_ms = round(elapsed_ms, 1)
+        self._flush_ms_total += elapsed_ms
+        return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                taken = await self.flush_once()
+            except Exception as e:
+                taken = 0
+                self._last_error = str(e)
+                print(f"[outbox] flush failed: {e}")
+            if taken >= self.batch_size:
+                continue  # more may be ready; keep draining
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            # best effort: push whatever is ready before shutting down; the rest stays durable on disk
+            try:
+                await asyncio.wait_for(self.flush_once(), timeout=5)
+            except Exception:
+                pass
+
+    async def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            **(await self.outbox.stats()),
+            "flushed": self._flushed,
+            "duplicates": self._duplicates,
+            "failed_attempts": self._failed,
+            "dead_lettered": self._dead,
+            "batches": self._batches,
+            "last_flush_ms": self._last_flush_ms,
+            "avg_flush_ms": round(self._flush_ms_total / self._batches, 1) if self._batches else None,
+            "last_error": self._last_error,
+        }
@@ -0,0 +1,209 @@
+"""
+Cache-warming prefetcher for saved locations.
+Every WEATHER_PREFETCH_INTERVAL seconds the saved locations are read from data-service page by page,
+and current weather / forecast are fetched into the weather cache for those whose entries would
+expire before the next cycle. Work is spread evenly (with jitter) across the interval instead of
+firing all at once, runs at the rate limiter's BACKGROUND priority and pauses while fewer than
+WEATHER_PREFETCH_QUOTA_RESERVE tokens are free, so interactive traffic keeps its quota.
+
+Locations nobody has viewed for WEATHER_PREFETCH_IDLE_DAYS are skipped. Views are recorded per
+cache cell by WeatherService in this process only; a location saved within the window counts as
+viewed, so freshly saved locations are warmed even before their first view after a restart.
+"""
+import os
+import time
+import random
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable
+from dotenv import load_dotenv
+from domainclientlayer.data_service_client import DataServiceClient, data_service
+from exceptions.custom_exceptions import RateLimitedException
+load_dotenv()
+
+PREFETCH_ENABLED = os.getenv("WEATHER_PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+PREFETCH_INTERVAL = float(os.getenv("WEATHER_PREFETCH_INTERVAL", 600))
+PREFETCH_PAGE_SIZE = int(os.getenv("WEATHER_PREFETCH_PAGE_SIZE", 100))
+PREFETCH_MAX_LOCATIONS = int(os.getenv("WEATHER_PREFETCH_MAX_LOCATIONS", 1000))
+PREFETCH_CONCURRENCY = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", 2))
+PREFETCH_IDLE_DAYS = float(os.getenv("WEATHER_PREFETCH_IDLE_DAYS", 7))
+PREFETCH_QUOTA_RESERVE = float(os.getenv("WEATHER_PREFETCH_QUOTA_RESERVE", 3))
+PREFETCH_KINDS = tuple(k.strip() for k in os.getenv("WEATHER_PREFETCH_KINDS", "current,forecast").split(",") if k.strip())
+MAX_TRACKED_VIEWS = 100_000
+
+
+def _epoch(iso: str) -> float:
+    try:
+        return datetime.fromisoformat(iso).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CachePrefetcher:
+    def __init__(
+        self,
+        cache,
+        flights,
+        loader: Callable[[str, float, float], Awaitable[dict]],
+        limiter,
+        interval: float = PREFETCH_INTERVAL,
+        page_size: int = PREFETCH_PAGE_SIZE,
+        max_locations: int = PREFETCH_MAX_LOCATIONS,
+        concurrency: int = PREFETCH_CONCURRENCY,
+        idle_days: float = PREFETCH_IDLE_DAYS,
+        quota_reserve: float = PREFETCH_QUOTA_RESERVE,
+        kinds: tuple = PREFETCH_KINDS,
+        client: DataServiceClient = None,
+    ):
+        self.cache = cache
+        self.flights = flights
+        self.loader = loader
+        self.limiter = limiter
+        self.interval = interval
+        self.page_size = page_size
+        self.max_locations = max_locations
+        self.idle_days = idle_days
+        self.quota_reserve = quota_reserve
+        self.kinds = kinds
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._views = OrderedDict()
+        self._task = None
+        self.client = client or data_service
+        self._cycles = 0
+        self._last_cycle = {}
+        self._prefetched = 0
+        self._skipped_fresh = 0
+        self._skipped_idle = 0
+        self._throttled = 0
+        self._failed = 0
+        self._last_error = None
+
+    def record_view(self, lat: float, lng: float):
+        """Remember that someone looked at this cache cell (any kind) just now."""
+        key = self.cache.make_key("view", lat, lng)
+        self._views[key] = time.time()
+        self._views.move_to_end(key)
+        while len(self._views) > MAX_TRACKED_VIEWS:
+            self._views.popitem(last=False)
+
+    def _recently_used(self, location: dict, cutoff: float) -> bool:
+        key = self.cache.make_key("view", location["lat"], location["lng"])
+        return self._views.get(key, 0.0) >= cutoff or _epoch(location.get("created_at")) >= cutoff
+
+    async def _saved_locations(self) -> list:
+        """Saved locations read page by page (limit/offset), deduplicated per cache cell."""
+        locations, seen, offset = [], set(), 0
+        while len(locations) < self.max_locations:
+            resp = await self.client.get(
+                "/api/v1/records/location",
+                params={"limit": self.page_size, "offset": offset},
+            )
+            resp.raise_for_status()
+            page = resp.json()
+            for loc in page:
+                if loc.get("lat") is None or loc.get("lng") is None:
+                    continue
+                cell = self.cache.make_key("view", loc["lat"], loc["lng"])
+                if cell not in seen:
+                    seen.add(cell)
+                    locations.append(loc)
+            if len(page) < self.page_size:
+                break
+            offset += self.page_size
+        return locations[:self.max_locations]
+
+    async def _due(self, kind: str, lat: float, lng: float) -> bool:
+        # warm entries that are missing or would expire before this location's next slot
+        entry = await self.cache.fallback(kind, lat, lng)
+        return entry is None or entry.expires_at <= time.time() + self.interval
+
+    async def _wait_for_quota(self, deadline: float):
+        while self.limiter.available() < self.quota_reserve and time.monotonic() < deadline:
+            self._throttled += 1
+            await asyncio.sleep(1.0)
+
+    async def _prefetch(self, kind: str, lat: float, lng: float):
+        async with self._semaphore:
+            key = self.cache.make_key(kind, lat, lng)
+            try:
+                await self.flights.do(key, lambda: self.loader(kind, lat, lng))
+                self._prefetched += 1
+            except RateLimitedException as e:
+                self._throttled += 1
+                await asyncio.sleep(e.retry_after or 1.0)
+            except Exception as e:
+                self._failed += 1
+                self._last_error = str(e) or e.__class__.__name__
+
+    async def run_cycle(self):
+        """One pass over the saved locations, spread across the prefetch interval."""
+        started = time.monotonic()
+        deadline = started + self.interval
+        cutoff = time.time() - self.idle_days * 86400
+        saved = await self._saved_locations()
+        locations = [loc for loc in saved if self._recently_used(loc, cutoff)]
+        self._skipped_idle += len(saved) - len(locations)
+
+        spacing = self.interval / max(1, len(locations))
+        tasks = []
+        try:
+            for i, loc in enumerate(locations):
+                slot = started + i * spacing + random.uniform(0, spacing * 0.5)
+                delay = slot - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._wait_for_quota(deadline)
+                for kind in self.kinds:
+                    if await self._due(kind, loc["lat"], loc["lng"]):
+                        tasks.append(asyncio.ensure_future(self._prefetch(kind, loc["lat"], loc["lng"])))
+                    else:
+                        self._skipped_fresh += 1
+                tasks = [t for t in tasks if not t.done()]
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._cycles += 1
+        self._last_cycle = {
+            "saved": len(saved),
+            "warmed": len(locations),
+            "duration_s": round(time.monotonic() - started, 1),
+        }
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                self._last_error = str(e) or e.__class__.__name__
+                print(f"[prefetch] cycle failed: {e}")
+            await asyncio.sleep(max(1.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval_s": self.interval,
+            "kinds": list(self.kinds),
+            "tracked_views": len(self._views),
+            "cycles": self._cycles,
+            "last_cycle": self._last_cycle,
+            "prefetched": self._prefetched,
+            "skipped_fresh": self._skipped_fresh,
+            "skipped_idle": self._skipped_idle,
+            "throttled": self._throttled,
+            "failed": self._failed,
+            "last_error": self._last_error,
+        }
@@ -1,79 +1,337 @@
 """
 WeatherService: orchestrates calls to the WeatherClient (domainclientlayer) and
 the data-service for persistence. Contains helper to aggregate 3-hour steps to daily summary.
+Upstream payloads are served from the WeatherCache (dataaccesslayer; in-process or shared) when fresh;
+concurrent misses for the same cache key share one upstream call through SingleFlight.
+With WEATHER_SWR_ENABLED, slightly stale payloads are served immediately and refreshed in the
+background (see background_refresh.py); every response carries a "freshness" indicator.
+With WEATHER_WRITE_BEHIND, "-and-store" snapshots go to a durable local outbox and are flushed to
+data-service in batches by OutboxFlusher instead of blocking the response.
+With WEATHER_PREFETCH_ENABLED, CachePrefetcher keeps recently viewed saved locations warm.
 """
 from domainclientlayer.weather_client import WeatherClient
+from domainclientlayer.single_flight import SingleFlight
+from dataaccesslayer.weather_cache import WeatherCache
+from dataaccesslayer.outbox import WeatherOutbox
+from businesslogiclayer.background_refresh import BackgroundRefresher, SWR_ENABLED
+from businesslogiclayer.forecast_aggregation import aggregate_daily, aggregate_daily_many
+from businesslogiclayer.outbox_flusher import OutboxFlusher
+from businesslogiclayer.daily_series_index import DailySeriesIndex
+from businesslogiclayer.prefetcher import CachePrefetcher, PREFETCH_ENABLED
+from domainclientlayer.rate_limiter import INTERACTIVE, BATCH, BACKGROUND
+from domainclientlayer.data_service_client import data_service
+from exceptions.custom_exceptions import UpstreamUnavailableException, RateLimitedException
+from functools import partial
 import os
+import time
+import asyncio
+from itertools import islice
 import httpx
 from dotenv import load_dotenv
-from datetime import datetime, timezone
-from collections import defaultdict
 
 load_dotenv()
-DATA_SERVICE_URL = os.getenv("DATA_SERVICE_URL", "http://127.0.0.1:8003")
+WRITE_BEHIND = os.getenv("WEATHER_WRITE_BEHIND", "false").lower() in ("1", "true", "yes", "on")
+BATCH_MAX_ITEMS = int(os.getenv("WEATHER_BATCH_MAX_ITEMS", 500))
+BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", 10))
+STREAM_CONCURRENCY = int(os.getenv("WEATHER_STREAM_CONCURRENCY", 10))
+LOCATION_LOOKUP_CHUNK = int(os.getenv("WEATHER_LOCATION_LOOKUP_CHUNK", 100))
+
+
+def _batch_error(exc: Exception) -> dict:
+    """
+    Per-item error info for batch responses, shaped like HttpErrorInfo (status_code/message/detail).
+    """
+    from exceptions.custom_exceptions import InvalidRequestException, NotFoundException
+    if isinstance(exc, RateLimitedException):
+        return {"status_code": 429, "message": "Too many requests", "detail": str(exc)}
+    if isinstance(exc, UpstreamUnavailableException):
+        return {"status_code": 503, "message": "Upstream unavailable", "detail": str(exc)}
+    if isinstance(exc, InvalidRequestException):
+        return {"status_code": 400, "message": "Invalid request", "detail": str(exc)}
+    if isinstance(exc, NotFoundException):
+        return {"status_code": 404, "message": "Not found", "detail": str(exc)}
+    if isinstance(exc, httpx.HTTPStatusError):
+        return {"status_code": 502, "message": "Upstream error", "detail": f"OpenWeather returned {exc.response.status_code}"}
+    if isinstance(exc, httpx.HTTPError):
+        return {"status_code": 502, "message": "Upstream error", "detail": str(exc) or exc.__class__.__name__}
+    return {"status_code": 500, "message": "Server error", "detail": str(exc)}
 
 class WeatherService:
     def __init__(self):
         self.client = WeatherClient()
+        self.cache = WeatherCache()
+        self.flights = SingleFlight("openweather")
+        self.swr_enabled = SWR_ENABLED
+        self.refresher = BackgroundRefresher(self.cache, self.flights, partial(self._load, priority=BACKGROUND))
+        self.write_behind = WRITE_BEHIND
+        self.outbox = WeatherOutbox()
+        self.flusher = OutboxFlusher(self.outbox)
+        self.daily_index = DailySeriesIndex(self._aggregate_to_daily)
+        self.prefetch_enabled = PREFETCH_ENABLED
+        self.prefetcher = CachePrefetcher(
+            self.cache, self.flights, partial(self._load, priority=BACKGROUND), self.client.limiter
+        )
+
+    async def _fetch(self, kind: str, lat: float, lng: float, priority: int = INTERACTIVE):
+        """
+        Return (payload, freshness) for kind "current" or "forecast".
+        Fresh cache hits are returned directly. With stale-while-revalidate enabled, an expired
+        entry within the cache's max staleness is returned immediately and refreshed in the
+        background. Otherwise the payload is loaded upstream (coalesced per cache key); if the
+        upstream circuit is open or the quota is exhausted, a retained stale copy is returned
+        with "fallback": True. priority is the rate limiter class for the upstream call.
+        freshness is {"stale": bool, "age": seconds since the payload was fetched}.
+        """
+        if priority == INTERACTIVE:
+            self.prefetcher.record_view(lat, lng)
+        entry = await self.cache.lookup(kind, lat, lng, allow_stale=self.swr_enabled)
+        if entry is not None:
+            now = time.time()
+            stale = entry.expires_at <= now
+            if stale:
+                self.refresher.schedule(kind, lat, lng)
+            return entry.value, {"stale": stale, "age": round(now - entry.stored_at, 1)}
+        key = self.cache.make_key(kind, lat, lng)
+        try:
+            value = await self.flights.do(key, lambda: self._load(kind, lat, lng, priority))
+        except (UpstreamUnavailableException, RateLimitedException):
+            # circuit open / quota exhausted: a retained stale copy is better than failing the request
+            entry = await self.cache.fallback(kind, lat, lng)
+            if entry is None:
+                raise
+            return entry.value, {"stale": True, "age": round(time.time() - entry.stored_at, 1), "fallback": True}
+        return value, {"stale": False, "age": 0.0}
+
+    def revision(self, kind: str, value: dict):
+        """
+        Upstream data revision of a payload, used for HTTP validators: the snapshot's dt, or
+        the first/last dt and length of a forecast's list. None when the payload carries no dt.
+        """
+        if kind == "forecast":
+            items = value.get("list") or value.get("daily") or []
+            if not items:
+                return None
+            return f"{items[0].get('dt')}-{items[-1].get('dt')}-{len(items)}"
+        return value.get("dt")
+
+    def max_age(self, kind: str, freshness: dict) -> int:
+        """Seconds a response may be cached downstream: the cache entry's remaining TTL."""
+        if freshness.get("stale"):
+            return 0
+        return max(0, int(self.cache.ttls.get(kind, 0) - freshness.get("age", 0)))
+
+    async def _load(self, kind: str, lat: float, lng: float, priority: int = INTERACTIVE) -> dict:
+        if kind == "forecast":
+            value = await self.client.forecast_5day(lat, lng, priority)
+        else:
+            value = await self.client.current(lat, lng, priority)
+        await self.cache.set(kind, lat, lng, value)
+        return value
+
+    async def _persist(self, payload: dict) -> dict:
+        """
+        Persist a weather record in data-service and return the stored record.
+        In write-behind mode the payload is durably appended to the local outbox instead and
+        flushed in the background; the result is then {"status": "queued", "outbox_id": ...}.
+        """
+        if self.write_behind:
+            outbox_id = await self.outbox.append(payload)
+            self.flusher.notify()
+            return {"status": "queued", "outbox_id": outbox_id}
+        resp = await data_service.post("/api/v1/records/weather", json=payload)
+        resp.raise_for_status()
+        return resp.json()
 
     async def get_current_only(self, lat: float, lng: float):
         """
         Fetch current weather WITHOUT persisting to database.
         Returns only the weather snapshot.
         """
-        current = await self.client.current(lat, lng)
-        return {"snapshot": current}
+        current, freshness = await self._fetch("current", lat, lng)
+        return {"snapshot": current, "freshness": freshness}
 
     async def get_current_and_store(self, lat: float, lng: float, location_id: int = None):
         """
         Fetch current weather and persist snapshot to data-service.
         Returns the raw snapshot and the stored DB record.
         """
-        current = await self.client.current(lat, lng)
+        current, freshness = await self._fetch("current", lat, lng)
         payload = {"location_id": location_id, "lat": lat, "lng": lng, "snapshot": current, "kind": "current"}
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(f"{DATA_SERVICE_URL}/api/v1/records/weather", json=payload)
-            resp.raise_for_status()
-            stored = resp.json()
-        return {"snapshot": current, "stored": stored}
+        stored = await self._persist(payload)
+        return {"snapshot": current, "stored": stored, "freshness": freshness}
 
-    async def get_forecast_only(self, lat: float, lng: float, days: int = 5):
+    async def get_forecast_only(self, lat: float, lng: float, days: int = 5, local_time: bool = False):
         """
         Fetch forecast WITHOUT persisting to database.
         Returns only the aggregated daily forecast.
         """
-        raw = await self.client.forecast_5day(lat, lng)
-        aggregated = self._aggregate_to_daily(raw, days)
-        return {"raw": raw, "aggregated": aggregated}
+        raw, freshness = await self._fetch("forecast", lat, lng)
+        aggregated = self._aggregate_to_daily(raw, days, local_time)
+        return {"raw": raw, "aggregated": aggregated, "freshness": freshness}
 
-    async def get_forecast_and_store(self, lat: float, lng: float, days: int = 5, location_id: int = None):
+    async def get_forecast_and_store(self, lat: float, lng: float, days: int = 5, location_id: int = None, local_time: bool = False):
         """
         Fetch forecast (raw) and persist to data-service as a 'forecast' record.
         Also return an aggregated daily forecast for the requested number of days.
         """
-        raw = await self.client.forecast_5day(lat, lng)
+        raw, freshness = await self._fetch("forecast", lat, lng)
         # persist raw forecast snapshot
         payload = {"location_id": location_id, "lat": lat, "lng": lng, "snapshot": raw, "kind": "forecast"}
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(f"{DATA_SERVICE_URL}/api/v1/records/weather", json=payload)
-            resp.raise_for_status()
-            stored = resp.json()
+        stored = await self._persist(payload)
 
         # If raw is already daily (mock), try to shape; else aggregate list items (OpenWeather 3-hour blocks)
-        aggregated = self._aggregate_to_daily(raw, days)
-        return {"raw": raw, "aggregated": aggregated, "stored": stored}
+        aggregated = self._aggregate_to_daily(raw, days, local_time)
+        return {"raw": raw, "aggregated": aggregated, "stored": stored, "freshness": freshness}
+
+    async def get_current_batch(self, coordinates: list):
+        """
+        Current weather for many (lat, lng) pairs WITHOUT persisting.
+        Returns { results: [ {index, lat, lng, ok, snapshot, freshness} | {index, lat, lng, ok, error} ] }
+        in input order.
+        """
+        results = await self._batch("current", coordinates, lambda value: {"snapshot": value})
+        return {"results": results}
+
+    async def get_forecast_batch(self, coordinates: list, days: int = 5, local_time: bool = False):
+        """
+        Forecast for many (lat, lng) pairs WITHOUT persisting; each forecast is aggregated to daily.
+        Returns { results: [ {index, lat, lng, ok, raw, aggregated, freshness} | {index, lat, lng, ok, error} ] }
+        in input order.
+        """
+        results = await self._batch("forecast", coordinates, lambda raw: {"raw": raw})
+        # aggregate every distinct forecast of the batch in one vectorized pass
+        distinct = {}
+        for item in results:
+            if item["ok"]:
+                distinct.setdefault(id(item["raw"]), item["raw"])
+        aggregated = dict(zip(distinct, self._aggregate_many(list(distinct.values()), days, local_time)))
+        for item in results:
+            if item["ok"]:
+                item["aggregated"] = aggregated[id(item["raw"])]
+        return {"results": results}
+
+    async def _batch(self, kind: str, coordinates: list, shape):
+        """
+        Dedupe coordinates by cache key, fetch each unique location once with bounded concurrency,
+        then fan the outcomes back out in input order. A failing location yields a per-item error
+        instead of failing the whole batch.
+        """
+        from exceptions.custom_exceptions import InvalidRequestException
+
+        if len(coordinates) > BATCH_MAX_ITEMS:
+            raise InvalidRequestException(f"Too many coordinates. Maximum {BATCH_MAX_ITEMS} per batch")
+
+        unique = {}
+        for lat, lng in coordinates:
+            unique.setdefault(self.cache.make_key(kind, lat, lng), (lat, lng))
+
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def run(lat: float, lng: float):
+            async with semaphore:
+                try:
+                    value, freshness = await self._fetch(kind, lat, lng, BATCH)
+                    return {"ok": True, **shape(value), "freshness": freshness}
+                except Exception as e:
+                    return {"ok": False, "error": _batch_error(e)}
+
+        keys = list(unique)
+        outcomes = await asyncio.gather(*(run(*unique[k]) for k in keys))
+        by_key = dict(zip(keys, outcomes))
+
+        return [
+            {"index": i, "lat": lat, "lng": lng, **by_key[self.cache.make_key(kind, lat, lng)]}
+            for i, (lat, lng) in enumerate(coordinates)
+        ]
+
+    async def resolve_locations(self, location_ids: list) -> dict:
+        """
+        Map saved location ids to (lat, lng), asking data-service for just those ids
+        (LOCATION_LOOKUP_CHUNK per call, so URLs stay short). Ids that are not saved are
+        simply absent from the result.
+        """
+        wanted = sorted(set(location_ids))
+        if not wanted:
+            return {}
+        chunks = [wanted[i:i + LOCATION_LOOKUP_CHUNK] for i in range(0, len(wanted), LOCATION_LOOKUP_CHUNK)]
+
+        async def lookup(chunk: list) -> list:
+            resp = await data_service.get("/api/v1/records/location", params=[("ids", i) for i in chunk],
+                                          endpoint="GET /api/v1/records/location?ids")
+            resp.raise_for_status()
+            return resp.json()
+
+        pages = await asyncio.gather(*(lookup(chunk) for chunk in chunks))
+        return {
+            r["id"]: (r["lat"], r["lng"])
+            for page in pages
+            for r in page
+            if r.get("lat") is not None and r.get("lng") is not None
+        }
+
+    async def stream_weather(self, kind: str, coordinates: list, location_ids: list = (), locations: dict = None,
+                             days: int = 5, local_time: bool = False):
+        """
+        Async generator yielding one result per requested location as soon as its fetch finishes
+        (completion order, not input order). Items are shaped like the batch endpoints' results;
+        location ids (resolved through `locations`, see resolve_locations) carry "location_id".
+        At most STREAM_CONCURRENCY fetches are in flight and finished results are not kept, so
+        memory does not grow with the number of locations. Closing the generator cancels the
+        fetches still in flight.
+        """
+        locations = locations or {}
+
+        def targets():
+            for i, (lat, lng) in enumerate(coordinates):
+                yield {"index": i, "lat": lat, "lng": lng}
+            offset = len(coordinates)
+            for i, location_id in enumerate(location_ids):
+                target = {"index": offset + i, "location_id": location_id}
+                if location_id in locations:
+                    target["lat"], target["lng"] = locations[location_id]
+                yield target
+
+        async def run(target: dict) -> dict:
+            if "lat" not in target:
+                detail = f"Location {target['location_id']} not found"
+                return {**target, "ok": False, "error": {"status_code": 404, "message": "Not found", "detail": detail}}
+            try:
+                value, freshness = await self._fetch(kind, target["lat"], target["lng"], BATCH)
+            except Exception as e:
+                return {**target, "ok": False, "error": _batch_error(e)}
+            if kind == "forecast":
+                body = {"raw": value, "aggregated": self._aggregate_to_daily(value, days, local_time)}
+            else:
+                body = {"snapshot": value}
+            return {**target, "ok": True, **body, "freshness": freshness}
+
+        queue = targets()
+        pending = {asyncio.ensure_future(run(t)) for t in islice(queue, STREAM_CONCURRENCY)}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # refill the window before handing results out so fetches keep running while the client reads
+                for _ in done:
+                    target = next(queue, None)
+                    if target is not None:
+                        pending.add(asyncio.ensure_future(run(target)))
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
 
     async def get_historical_range_only(self, lat: float, lng: float, start_iso: str, end_iso: str):
         """
         Simulated historical range using the available 5-day forecast window.
-        Validates date range, aggregates forecast to daily, then filters inclusive of [start, end].
+        Validates date range (before any I/O), then slices the cached daily series inclusive of [start, end].
         Constraints:
           - start <= end
           - range length <= 7 days
           - dates must be within the available forecast daily dates
-        Returns: { range: {start, end}, series: [ {date, min_temp, max_temp, summary, icon} ] }
+        Returns: { range: {start, end}, series: [ {date, min_temp, max_temp, summary, icon} ], freshness }
         """
-        from datetime import datetime as dt, timedelta
+        from datetime import datetime as dt
         from exceptions.custom_exceptions import InvalidRequestException, NotFoundException
 
         try:
@@ -88,25 +346,22 @@ class WeatherService:
         if (end_date - start_date).days + 1 > 7:
             raise InvalidRequestException("Date range too large. Maximum 7 days supported")
 
-        # Use forecast as a proxy for near-term range
-        raw = await self.client.forecast_5day(lat, lng)
-        aggregated = self._aggregate_to_daily(raw, days=7)
-
-        # aggregated dates are strings "YYYY-MM-DD"; normalize inputs to same format
-        def _to_str(d):
-            return d.isoformat()
+        start_s = start_date.isoformat()
+        end_s = end_date.isoformat()
 
-        start_s = _to_str(start_date)
-        end_s = _to_str(end_date)
+        # Use forecast as a proxy for near-term range; the daily series is aggregated once per
+        # cached forecast revision and sliced by date here
+        raw, freshness = await self._fetch("forecast", lat, lng)
+        daily = self.daily_index.get(self.cache.make_key("forecast", lat, lng), raw)
 
-        series = [d for d in aggregated if start_s <= d.get("date", "") <= end_s]
+        series = daily.range(start_s, end_s)
         if not series:
             # If outside available forecast dates
             raise NotFoundException("Requested range is outside supported forecast window")
 
-        return {"range": {"start": start_s, "end": end_s}, "series": series}
+        return {"range": {"start": start_s, "end": end_s}, "series": series, "freshness": freshness}
 
-    def _aggregate_to_daily(self, raw_forecast: dict, days: int = 5):
+    def _aggregate_to_daily(self, raw_forecast: dict, days: int = 5, local_time: bool = False):
         """
         Convert OpenWeather 3-hourly forecast (list at raw_forecast["list"]) into daily summary:
         {
@@ -114,8 +369,10 @@ class WeatherService:
           min_temp: float,
           max_temp: float,
           summary: "Mostly clear",
-          icon: "04d"
+          icon: "04d",
+          mean_temp, humidity_min, humidity_max, precipitation_mm, condition
         }
+        Days are UTC, or the location's local days (city.timezone) when local_time is set.
         If the raw forecast matches the 'daily' mock structure we adapt that too.
         """
         # If mock daily provided
@@ -135,47 +392,23 @@ class WeatherService:
                 })
             return out
 
-        # Typical 5-day OpenWeather 'forecast' endpoint structure: raw_forecast["list"] -> items with dt (epoch)
-        items = raw_forecast.get("list") or []
-        if not items:
-            return []
-
-        # bucket by date (UTC)
-        buckets = defaultdict(list)
-        for it in items:
-            dt = it.get("dt")
-            if dt is None:
-                continue
-            d = datetime.fromtimestamp(dt, tz=timezone.utc).date().isoformat()
-            buckets[d].append(it)
-
-        # sort dates ascending and produce summary
-        daily = []
-        for i, (date_str, arr) in enumerate(sorted(buckets.items())):
-            if i >= days:
-                break
-            temps = [entry.get("main", {}).get("temp") for entry in arr if entry.get("main")]
-            mins = [entry.get("main", {}).get("temp_min") for entry in arr if entry.get("main")]
-            maxs = [entry.get("main", {}).get("temp_max") for entry in arr if entry.get("main")]
-            # choose summary by most common weather main
-            weather_terms = [entry.get("weather", [{}])[0].get("main") for entry in arr]
-            # fallback handling
-            min_temp = min(mins) if mins else (min(temps) if temps else None)
-            max_temp = max(maxs) if maxs else (max(temps) if temps else None)
-            # pick a representative description (first non-empty)
-            desc = None
-            icon = None
-            for entry in arr:
-                w = entry.get("weather", [{}])[0]
-                if w.get("description"):
-                    desc = w.get("description")
-                    icon = w.get("icon")
-                    break
-            daily.append({
-                "date": date_str,
-                "min_temp": min_temp,
-                "max_temp": max_temp,
-                "summary": desc,
-                "icon": icon
-            })
-        return daily
+        # Typical 5-day OpenWeather 'forecast' endpoint structure: raw_forecast["list"] -> items with dt (epoch),
+        # aggregated column-wise (see forecast_aggregation.py)
+        return aggregate_daily(raw_forecast, days, local_time)
+
+    def _aggregate_many(self, raw_forecasts: list, days: int = 5, local_time: bool = False) -> list:
+        """
+        Aggregate several raw forecasts in one vectorized pass; mock 'daily' payloads are
+        shaped individually. Returns one daily list per input forecast, in input order.
+        """
+        out = [None] * len(raw_forecasts)
+        pending = []
+        for i, raw in enumerate(raw_forecasts):
+            if "daily" in raw and isinstance(raw["daily"], list):
+                out[i] = self._aggregate_to_daily(raw, days)
+            else:
+                pending.append(i)
+        if pending:
+            for i, daily in zip(pending, aggregate_daily_many([raw_forecasts[i] for i in pending], days, local_time)):
+                out[i] = daily
+        return out
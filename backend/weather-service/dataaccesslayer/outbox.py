@@ -0,0 +1,126 @@
+"""
+Durable, append-only outbox for weather snapshots waiting to be persisted in data-service.
+Backed by a local SQLite file (WAL, synchronous=FULL), so an appended snapshot survives a crash or
+restart of weather-service. The OutboxFlusher (businesslogiclayer) drains it in batches.
+All SQLite work runs in a worker thread so the event loop never blocks on disk I/O.
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+OUTBOX_PATH = os.getenv("WEATHER_OUTBOX_PATH", "./data/outbox.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_outbox_ready ON outbox (dead, next_attempt_at, id);
+"""
+
+
+class WeatherOutbox:
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _run(self, fn):
+        # one connection shared by worker threads; SQLite calls are serialized here
+        with self._lock:
+            return fn(self._connection())
+
+    async def append(self, payload: dict) -> int:
+        """
+        Durably store one snapshot payload; returns its outbox id once committed to disk.
+        """
+        body = json.dumps(payload, separators=(",", ":"))
+
+        def insert(conn):
+            cur = conn.execute(
+                "INSERT INTO outbox (payload, created_at) VALUES (?, ?)", (body, time.time())
+            )
+            return cur.lastrowid
+
+        return await asyncio.to_thread(self._run, insert)
+
+    async def ready_batch(self, limit: int) -> list:
+        """
+        Oldest entries whose retry time has come: [(id, attempts, payload_dict), ...].
+        """
+        def select(conn):
+            return conn.execute(
+                "SELECT id, attempts, payload FROM outbox WHERE dead = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+
+        rows = await asyncio.to_thread(self._run, select)
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+    async def delete(self, ids: list):
+        if not ids:
+            return
+
+        def remove(conn):
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+        await asyncio.to_thread(self._run, remove)
+
+    async def reschedule(self, retries: list):
+        """
+        retries: [(id, next_attempt_at, error, dead), ...] — bump attempts and set the next try
+        (or park the entry as dead once it has exhausted its attempts).
+        """
+        if not retries:
+            return
+
+        def update(conn):
+            conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?, dead = ? WHERE id = ?",
+                [(when, error, 1 if dead else 0, i) for i, when, error, dead in retries],
+            )
+
+        await asyncio.to_thread(self._run, update)
+
+    async def stats(self) -> dict:
+        def counts(conn):
+            depth, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM outbox WHERE dead = 0"
+            ).fetchone()
+            dead = conn.execute("SELECT COUNT(*) FROM outbox WHERE dead = 1").fetchone()[0]
+            return depth, oldest, dead
+
+        depth, oldest, dead = await asyncio.to_thread(self._run, counts)
+        return {
+            "path": self.path,
+            "depth": depth,
+            "dead": dead,
+            "oldest_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
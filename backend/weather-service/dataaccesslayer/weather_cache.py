@@ -0,0 +1,230 @@
+"""
+Cache for upstream weather payloads, stored in a pluggable backend (cache_backend.py): the
+bounded in-process LRU by default, or a shared Redis-protocol server with CACHE_BACKEND=redis so
+every uvicorn worker sees the same entries.
+Keys are lat/lng snapped to a grid (degrees) or encoded as a geohash, so nearby requests for the
+same city share one entry. Each kind (current / forecast) has its own TTL; the in-process backend
+evicts least-recently-used once either the entry count or the estimated byte size exceeds its bound.
+Expired entries are retained for up to WEATHER_CACHE_MAX_STALE seconds past their TTL and can be
+served stale (stale-while-revalidate, or as a fallback while the upstream circuit is open).
+Accesses are counted per process so hot keys can be refreshed early.
+"""
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from dataaccesslayer.cache_backend import CacheBackend, create_backend
+load_dotenv()
+
+CACHE_ENABLED = os.getenv("WEATHER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_BYTES = int(os.getenv("WEATHER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_TTL_CURRENT = float(os.getenv("WEATHER_CACHE_TTL_CURRENT", 600))
+CACHE_TTL_FORECAST = float(os.getenv("WEATHER_CACHE_TTL_FORECAST", 1800))
+CACHE_MAX_STALE = float(os.getenv("WEATHER_CACHE_MAX_STALE", 300))
+CACHE_KEY_MODE = os.getenv("WEATHER_CACHE_KEY_MODE", "grid")  # grid | geohash
+CACHE_GRID_DEG = float(os.getenv("WEATHER_CACHE_GRID_DEG", 0.01))
+CACHE_GEOHASH_PRECISION = int(os.getenv("WEATHER_CACHE_GEOHASH_PRECISION", 6))
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 6) -> str:
+    """Standard base32 geohash of (lat, lng) with `precision` characters."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+class CacheEntry:
+    __slots__ = ("kind", "lat", "lng", "value", "stored_at", "expires_at", "accesses")
+
+    def __init__(self, kind: str, lat: float, lng: float, value, stored_at: float, expires_at: float):
+        self.kind = kind
+        self.lat = lat
+        self.lng = lng
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.accesses = 0
+
+
+class WeatherCache:
+    """
+    TTL cache keyed by (kind, quantized coordinates) on top of a CacheBackend.
+    Backend records are [stored_at, expires_at, payload] and live for TTL + max_stale.
+    Hit/miss counters and hot-key access counts are per process; not thread-safe, it is only
+    touched from the event loop.
+    """
+
+    def __init__(
+        self,
+        ttls: dict = None,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_stale: float = CACHE_MAX_STALE,
+        key_mode: str = CACHE_KEY_MODE,
+        grid_deg: float = CACHE_GRID_DEG,
+        geohash_precision: int = CACHE_GEOHASH_PRECISION,
+        enabled: bool = CACHE_ENABLED,
+        backend: CacheBackend = None,
+    ):
+        self.ttls = ttls or {"current": CACHE_TTL_CURRENT, "forecast": CACHE_TTL_FORECAST}
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.key_mode = key_mode
+        self.grid_deg = grid_deg
+        # decimals needed to print snapped coordinates without float noise (0.01 -> 2)
+        self._grid_decimals = len(f"{grid_deg:.10f}".rstrip("0").split(".")[1])
+        self.geohash_precision = geohash_precision
+        self.enabled = enabled
+        self.backend = backend or create_backend("weather", max_entries=max_entries, max_bytes=max_bytes)
+        # key -> CacheEntry without value: what this process has seen, for refresh-ahead
+        self._hot = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+
+    def make_key(self, kind: str, lat: float, lng: float) -> str:
+        if self.key_mode == "geohash":
+            return f"{kind}:{geohash_encode(lat, lng, self.geohash_precision)}"
+        step = self.grid_deg
+        decimals = self._grid_decimals
+        # "+ 0.0" folds -0.0 into 0.0 so both sides of the equator/meridian share a key
+        qlat = round(lat / step) * step + 0.0
+        qlng = round(lng / step) * step + 0.0
+        return f"{kind}:{qlat:.{decimals}f}:{qlng:.{decimals}f}"
+
+    async def _read(self, kind: str, lat: float, lng: float):
+        key = self.make_key(kind, lat, lng)
+        record = await self.backend.get(key)
+        if record is None:
+            return key, None
+        stored_at, expires_at, value = record
+        return key, CacheEntry(kind, lat, lng, value, stored_at, expires_at)
+
+    def _track(self, key: str, entry: CacheEntry, accessed: bool):
+        tracked = self._hot.get(key)
+        if tracked is None:
+            tracked = CacheEntry(entry.kind, entry.lat, entry.lng, None, entry.stored_at, entry.expires_at)
+            self._hot[key] = tracked
+            while len(self._hot) > self.max_entries:
+                self._hot.popitem(last=False)
+        else:
+            tracked.stored_at, tracked.expires_at = entry.stored_at, entry.expires_at
+            self._hot.move_to_end(key)
+        if accessed:
+            tracked.accesses += 1
+        entry.accesses = tracked.accesses
+
+    async def lookup(self, kind: str, lat: float, lng: float, allow_stale: bool = False):
+        """
+        Return the CacheEntry for (kind, lat, lng) or None on miss.
+        Expired entries (the backend drops them max_stale seconds past expiry) are returned only
+        when allow_stale is set; the caller checks entry.expires_at to tell them apart.
+        """
+        if not self.enabled:
+            return None
+        key, entry = await self._read(kind, lat, lng)
+        if entry is None:
+            self._hot.pop(key, None)
+            self._misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            if not allow_stale:
+                # kept until max_stale so it can still serve as a fallback (see fallback())
+                self._misses += 1
+                return None
+            self._stale_hits += 1
+        else:
+            self._hits += 1
+        self._track(key, entry, accessed=True)
+        return entry
+
+    async def fallback(self, kind: str, lat: float, lng: float):
+        """
+        Any retained entry for (kind, lat, lng), fresh or stale, without touching counters.
+        Used when the upstream is failing fast and stale data beats an error.
+        """
+        if not self.enabled:
+            return None
+        return (await self._read(kind, lat, lng))[1]
+
+    async def get(self, kind: str, lat: float, lng: float):
+        """
+        Return the fresh cached value or None on miss / expiry.
+        """
+        entry = await self.lookup(kind, lat, lng)
+        return entry.value if entry is not None else None
+
+    async def set(self, kind: str, lat: float, lng: float, value):
+        if not self.enabled:
+            return
+        key = self.make_key(kind, lat, lng)
+        ttl = self.ttls.get(kind, CACHE_TTL_CURRENT)
+        now = time.time()
+        await self.backend.set(key, [now, now + ttl, value], ttl + self.max_stale)
+        # a refresh keeps the key's popularity
+        self._track(key, CacheEntry(kind, lat, lng, None, now, now + ttl), accessed=False)
+
+    def hot_entries(self, min_accesses: int, expiring_within: float) -> list:
+        """
+        Entries accessed at least min_accesses times (since the last decay) in this process that
+        expire within the next expiring_within seconds — candidates for refresh-ahead.
+        """
+        deadline = time.time() + expiring_within
+        return [e for e in self._hot.values() if e.accesses >= min_accesses and e.expires_at <= deadline]
+
+    def decay_accesses(self):
+        """Halve every access counter so popularity reflects recent traffic."""
+        for entry in self._hot.values():
+            entry.accesses //= 2
+
+    async def clear(self):
+        await self.backend.clear()
+        self._hot.clear()
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._stale_hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "key_mode": self.key_mode,
+            "ttls": self.ttls,
+            "max_stale": self.max_stale,
+            "tracked_keys": len(self._hot),
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses,
+            "hit_ratio": round((self._hits + self._stale_hits) / lookups, 4) if lookups else 0.0,
+            "backend": self.backend.stats(),
+        }
@@ -2,20 +2,52 @@
 OpenWeather client that fetches current weather and 5-day forecast.
 We use 'onecall' style API if available; otherwise we call current + daily forecast endpoints.
 OpenWeather's One Call requires lat/lon and an API key.
+All upstream requests go through the shared connection pool in http_pool.py, the
+resilience layer (circuit breaker, jittered retries, optional hedging) in resilience.py and the
+OpenWeather quota's token bucket in rate_limiter.py. Every attempt (retries and hedges included)
+spends a token; callers pass a priority class so interactive traffic is served first.
 """
 import os
-import httpx
 from dotenv import load_dotenv
+from domainclientlayer.http_pool import HttpPool, openweather_pool
+from domainclientlayer.resilience import ResilientCaller
+from domainclientlayer.rate_limiter import RateLimiter, INTERACTIVE, retry_after_seconds
+from exceptions.custom_exceptions import RateLimitedException
 load_dotenv()
 
 OPENWEATHER_KEY = os.getenv("OPENWEATHER_API_KEY")
-BASE_URL = "https://api.openweathermap.org/data/2.5"
+# Point at a stand-in server (see backend/perf/fake_upstream.py) for offline and load testing
+BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5").rstrip("/")
+
+# Shared by every WeatherClient so breaker state and latency samples are per process, not per instance
+openweather_resilience = ResilientCaller.from_env("OPENWEATHER", "openweather")
+openweather_limiter = RateLimiter.from_env("OPENWEATHER", "openweather")
 
 class WeatherClient:
-    def __init__(self):
+    def __init__(self, pool: HttpPool = None):
         self.key = OPENWEATHER_KEY
+        self.pool = pool or openweather_pool
+        self.resilience = openweather_resilience
+        self.limiter = openweather_limiter
+
+    async def _send(self, url: str, params: dict, priority: int):
+        await self.limiter.acquire(priority)
+        r = await self.pool.get(url, params=params)
+        if r.status_code == 429:
+            # provider-side quota hit: stop spending tokens until its Retry-After has passed
+            self.limiter.penalize(retry_after_seconds(r.headers.get("Retry-After")))
+        return r
+
+    async def _get(self, url: str, params: dict, priority: int = INTERACTIVE) -> dict:
+        r = await self.resilience.call(url, lambda: self._send(url, params, priority))
+        if r.status_code == 429:
+            raise RateLimitedException(
+                "OpenWeather quota exceeded", retry_after=retry_after_seconds(r.headers.get("Retry-After"))
+            )
+        r.raise_for_status()
+        return r.json()
 
-    async def current(self, lat: float, lng: float) -> dict:
+    async def current(self, lat: float, lng: float, priority: int = INTERACTIVE) -> dict:
         """
         Fetch current weather for lat/lng.
         If no key, return a development mock (so frontend can continue).
@@ -31,12 +63,9 @@ class WeatherClient:
             }
         url = f"{BASE_URL}/weather"
         params = {"lat": lat, "lon": lng, "appid": self.key, "units": "metric"}
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            return r.json()
+        return await self._get(url, params, priority)
 
-    async def forecast_5day(self, lat: float, lng: float) -> dict:
+    async def forecast_5day(self, lat: float, lng: float, priority: int = INTERACTIVE) -> dict:
         """
         Fetch 5-day forecast (OpenWeather 'forecast' endpoint gives 3-hour steps for 5 days).
         We'll aggregate daily maxima/minima server-side.
@@ -50,7 +79,4 @@ class WeatherClient:
 
         url = f"{BASE_URL}/forecast"
         params = {"lat": lat, "lon": lng, "appid": self.key, "units": "metric"}
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            return r.json()
+        return await self._get(url, params, priority)
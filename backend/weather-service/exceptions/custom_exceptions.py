@@ -3,3 +3,13 @@ class NotFoundException(Exception):
 
 class InvalidRequestException(Exception):
     pass
+
+class UpstreamUnavailableException(Exception):
+    """Raised when an upstream provider is failing fast (circuit breaker open)."""
+    pass
+
+class RateLimitedException(Exception):
+    """Raised when the upstream quota is exhausted (local token bucket or provider 429)."""
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -1,6 +1,7 @@
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from .custom_exceptions import NotFoundException, InvalidRequestException
+import math
+from .custom_exceptions import NotFoundException, InvalidRequestException, UpstreamUnavailableException, RateLimitedException
 from .http_error_info import HttpErrorInfo
 import datetime
 
@@ -16,6 +17,15 @@ def register_exception_handlers(app):
     async def invalid_handler(request: Request, exc: InvalidRequestException):
         return JSONResponse(status_code=400, content=_payload(400, "Invalid request", str(exc)))
 
+    @app.exception_handler(UpstreamUnavailableException)
+    async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailableException):
+        return JSONResponse(status_code=503, content=_payload(503, "Upstream unavailable", str(exc)))
+
+    @app.exception_handler(RateLimitedException)
+    async def rate_limited_handler(request: Request, exc: RateLimitedException):
+        headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after else None
+        return JSONResponse(status_code=429, content=_payload(429, "Too many requests", str(exc)), headers=headers)
+
     @app.exception_handler(Exception)
     async def generic_handler(request: Request, exc: Exception):
         return JSONResponse(status_code=500, content=_payload(500, "Server error", str(exc)))
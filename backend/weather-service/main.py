@@ -1,12 +1,43 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 load_dotenv()
 
-from presentationlayer.controllers import router as weather_router
+from presentationlayer.controllers import router as weather_router, service as weather_service
 from exceptions.global_exception_handler import register_exception_handlers
+from domainclientlayer.http_pool import openweather_pool
+from domainclientlayer.data_service_client import data_service
+from presentationlayer.responses import FastJSONResponse
 
-app = FastAPI(title="weather-service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Lifespan event context manager — opens the shared upstream and data-service connection pools and starts
+    the background workers (cache refresher, outbox flusher, prefetcher) at startup, and stops them
+    cleanly at shutdown.
+    """
+    await openweather_pool.start()
+    await data_service.start()
+    if weather_service.swr_enabled:
+        weather_service.refresher.start()
+    if weather_service.write_behind:
+        weather_service.flusher.start()
+    if weather_service.prefetch_enabled:
+        weather_service.prefetcher.start()
+
+    yield
+
+    print("Shutting down weather-service...")
+    await weather_service.prefetcher.stop()
+    await weather_service.refresher.stop()
+    await weather_service.flusher.stop()
+    weather_service.outbox.close()
+    await weather_service.cache.aclose()
+    await openweather_pool.aclose()
+    await data_service.aclose()
+
+app = FastAPI(title="weather-service", lifespan=lifespan, default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
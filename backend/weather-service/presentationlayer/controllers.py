@@ -4,57 +4,207 @@ Weather presentation layer: exposes endpoints used by the frontend:
   - GET /api/v1/weather/current-and-save?lat=&lng=&location_id= (with auto-save)
   - GET /api/v1/weather/forecast?lat=&lng=&days= (no auto-save)
   - GET /api/v1/weather/forecast-and-save?lat=&lng=&days=&location_id= (with auto-save)
+  - POST /api/v1/weather/current/batch (many coordinates, no auto-save)
+  - POST /api/v1/weather/forecast/batch (many coordinates, no auto-save)
+  - POST /api/v1/weather/stream (many coordinates / location ids, NDJSON or SSE as results arrive)
+  - GET /api/v1/weather/metrics (upstream pool, data-service calls, cache, coalescing, refresh, outbox and prefetch statistics)
+Weather endpoints accept fields= (and forecast ones include_raw= / compact=) to trim the response,
+see projection.py.
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+import orjson
 from businesslogiclayer.weather_service import WeatherService
+from exceptions.custom_exceptions import InvalidRequestException
+from presentationlayer.http_cache import make_etag, conditional
+from presentationlayer.responses import FastJSONResponse
+from presentationlayer.projection import Projection, project, project_batch, variant
+from domainclientlayer.data_service_client import data_service
 
 router = APIRouter()
 service = WeatherService()
 
+class Coordinate(BaseModel):
+    lat: float
+    lng: float
+
+class CurrentBatchRequest(BaseModel):
+    coordinates: List[Coordinate]
+
+class ForecastBatchRequest(BaseModel):
+    coordinates: List[Coordinate]
+    days: int = 5
+    tz: str = "utc"
+
+class StreamRequest(BaseModel):
+    coordinates: List[Coordinate] = []
+    location_ids: List[int] = []
+    kind: str = "current"
+    days: int = 5
+    tz: str = "utc"
+
+def _conditional(request: Request, response: Response, kind: str, lat: float, lng: float, revision, freshness: dict, *variant):
+    """
+    ETag from the upstream data revision (WeatherService.revision: the snapshot's dt, or the
+    forecast's first/last dt and length) plus the cache key and response variant; weak, because
+    the body's freshness.age changes between requests for the same data. Cache-Control max-age
+    from the remaining cache TTL. Returns a 304 response or None.
+    """
+    etag = None
+    if revision is not None:
+        etag = make_etag(kind, service.cache.make_key(kind, lat, lng), revision, *variant, weak=True)
+    return conditional(request, response, etag, f"public, max-age={service.max_age(kind, freshness)}")
+
+def current_projection(
+    fields: Optional[str] = Query(None, description="comma-separated dotted paths, e.g. snapshot.main.temp"),
+) -> Optional[Projection]:
+    return Projection.from_query(fields)
+
+def forecast_projection(
+    fields: Optional[str] = Query(None, description="comma-separated dotted paths, e.g. aggregated.max_temp,raw.city"),
+    include_raw: bool = Query(True, description="false drops the upstream raw forecast"),
+    compact: bool = Query(False, description="aggregated-only daily summary"),
+) -> Optional[Projection]:
+    return Projection.from_query(fields, include_raw, compact)
+
 @router.get("/current")
-async def get_current(lat: float = Query(...), lng: float = Query(...)):
+async def get_current(request: Request, response: Response, lat: float = Query(...), lng: float = Query(...),
+                      projection: Optional[Projection] = Depends(current_projection)):
     """
     Fetch current weather WITHOUT persisting. Returns snapshot only.
+    Supports If-None-Match (304) with a weak ETag from the snapshot's dt, cache key and projection.
     """
     try:
-        return await service.get_current_only(lat, lng)
+        result = await service.get_current_only(lat, lng)
+        return _conditional(
+            request, response, "current", lat, lng, service.revision("current", result["snapshot"]), result["freshness"],
+            *variant(projection)
+        ) or FastJSONResponse(project(result, projection), headers=response.headers)
     except Exception as e:
         # Let global exception handler convert to HTTP error
         raise
 
 @router.get("/current-and-save")
-async def get_current_and_save(lat: float = Query(...), lng: float = Query(...), location_id: int | None = None):
+async def get_current_and_save(lat: float = Query(...), lng: float = Query(...), location_id: int | None = None,
+                               projection: Optional[Projection] = Depends(current_projection)):
     """
     Fetch current weather AND persist snapshot. Returns snapshot + DB record info.
+    The full snapshot is persisted whatever the projection.
     """
     try:
-        return await service.get_current_and_store(lat, lng, location_id)
+        return FastJSONResponse(project(await service.get_current_and_store(lat, lng, location_id), projection))
     except Exception as e:
         # Let global exception handler convert to HTTP error
         raise
 
 @router.get("/forecast")
-async def get_forecast(lat: float = Query(...), lng: float = Query(...), days: int = Query(5)):
+async def get_forecast(request: Request, response: Response, lat: float = Query(...), lng: float = Query(...), days: int = Query(5), tz: str = Query("utc", description="utc | local"),
+                       projection: Optional[Projection] = Depends(forecast_projection)):
     """
     Fetch 5-day forecast WITHOUT persisting. Returns aggregated daily forecast.
+    tz=local groups days by the location's local time instead of UTC.
+    include_raw=false / compact=true / fields= leave out what the caller does not use.
+    Supports If-None-Match (304) with a weak ETag from the forecast's dt range, cache key and variant.
     """
     try:
-        return await service.get_forecast_only(lat, lng, days)
+        result = await service.get_forecast_only(lat, lng, days, local_time=(tz == "local"))
+        return _conditional(
+            request, response, "forecast", lat, lng, service.revision("forecast", result["raw"]), result["freshness"], days, tz,
+            *variant(projection)
+        ) or FastJSONResponse(project(result, projection), headers=response.headers)
     except Exception as e:
         raise
 
 @router.get("/forecast-and-save")
-async def get_forecast_and_save(lat: float = Query(...), lng: float = Query(...), days: int = Query(5), location_id: int | None = None):
+async def get_forecast_and_save(lat: float = Query(...), lng: float = Query(...), days: int = Query(5), location_id: int | None = None, tz: str = Query("utc", description="utc | local"),
+                                projection: Optional[Projection] = Depends(forecast_projection)):
     """
     Fetch 5-day forecast AND persist raw forecast. Returns aggregated daily forecast + DB record.
+    The raw forecast is persisted even when include_raw=false / compact=true leave it out of the response.
+    """
+    try:
+        result = await service.get_forecast_and_store(lat, lng, days, location_id, local_time=(tz == "local"))
+        return FastJSONResponse(project(result, projection))
+    except Exception as e:
+        raise
+
+@router.post("/current/batch")
+async def get_current_batch(body: CurrentBatchRequest, projection: Optional[Projection] = Depends(current_projection)):
+    """
+    Fetch current weather for many coordinates WITHOUT persisting.
+    Results come back in input order; a failing location carries its own error.
     """
     try:
-        return await service.get_forecast_and_store(lat, lng, days, location_id)
+        result = await service.get_current_batch([(c.lat, c.lng) for c in body.coordinates])
+        return FastJSONResponse(project_batch(result, projection))
     except Exception as e:
         raise
 
+@router.post("/forecast/batch")
+async def get_forecast_batch(body: ForecastBatchRequest, projection: Optional[Projection] = Depends(forecast_projection)):
+    """
+    Fetch aggregated forecasts for many coordinates WITHOUT persisting.
+    Results come back in input order; a failing location carries its own error.
+    """
+    try:
+        result = await service.get_forecast_batch(
+            [(c.lat, c.lng) for c in body.coordinates], body.days, local_time=(body.tz == "local")
+        )
+        return FastJSONResponse(project_batch(result, projection))
+    except Exception as e:
+        raise
+
+@router.post("/stream")
+async def stream_weather(
+    body: StreamRequest,
+    request: Request,
+    format: str = Query("ndjson", description="ndjson | sse"),
+    fields: Optional[str] = Query(None),
+    include_raw: bool = Query(True),
+    compact: bool = Query(False, description="forecasts only"),
+):
+    """
+    Fetch current weather or aggregated forecasts (kind) for many coordinates and/or saved
+    location ids WITHOUT persisting, streaming one result per location as soon as it is ready:
+    NDJSON lines by default, Server-Sent Events with format=sse (or Accept: text/event-stream).
+    Each result carries its input "index"; the stream stops when the client disconnects.
+    fields= / include_raw= / compact= are applied to every item before it is encoded.
+    """
+    if body.kind not in ("current", "forecast"):
+        raise InvalidRequestException("kind must be 'current' or 'forecast'")
+    projection = Projection.from_query(fields, include_raw, compact and body.kind == "forecast")
+    sse = format == "sse" or "text/event-stream" in request.headers.get("accept", "")
+    locations = await service.resolve_locations(body.location_ids)
+    results = service.stream_weather(
+        body.kind,
+        [(c.lat, c.lng) for c in body.coordinates],
+        body.location_ids,
+        locations,
+        body.days,
+        local_time=(body.tz == "local"),
+    )
+
+    async def encode():
+        try:
+            async for item in results:
+                if await request.is_disconnected():
+                    break
+                data = orjson.dumps(project(item, projection), option=orjson.OPT_NON_STR_KEYS)
+                yield b"id: %d\nevent: result\ndata: %s\n\n" % (item["index"], data) if sse else data + b"\n"
+            else:
+                if sse:
+                    yield b"event: end\ndata: {}\n\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(encode(), media_type="text/event-stream" if sse else "application/x-ndjson")
+
 @router.get("/historical")
 async def get_historical(
+    request: Request,
+    response: Response,
     lat: float = Query(...),
     lng: float = Query(...),
     start: str = Query(..., description="YYYY-MM-DD"),
@@ -65,6 +215,33 @@ async def get_historical(
     for dates within [start, end], up to 7 days.
     """
     try:
-        return await service.get_historical_range_only(lat, lng, start, end)
+        result = await service.get_historical_range_only(lat, lng, start, end)
+        # the sliced series is at most 7 small days, so its values serve as the revision
+        revision = [(d["date"], d["min_temp"], d["max_temp"], d["summary"]) for d in result["series"]]
+        return _conditional(request, response, "forecast", lat, lng, revision, result["freshness"], start, end) or FastJSONResponse(result, headers=response.headers)
     except Exception as e:
         raise
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Operational statistics for sizing and monitoring: upstream connection pool usage, data-service
+    call latency per endpoint, circuit breaker / retry / hedging counters, quota token bucket and queue, weather cache hit/miss/eviction counters and backend latency, single-flight coalescing counters and
+    background refresh (stale-while-revalidate) activity, write-behind outbox depth/latency
+    and saved-location prefetch progress.
+    """
+    outbox = {"write_behind": service.write_behind}
+    if service.write_behind:
+        outbox.update(await service.flusher.stats())
+    return {
+        "http_pool": service.client.pool.stats(),
+        "data_service": data_service.stats(),
+        "resilience": service.client.resilience.stats(),
+        "rate_limit": service.client.limiter.stats(),
+        "cache": service.cache.stats(),
+        "single_flight": service.flights.stats(),
+        "refresh": {"swr_enabled": service.swr_enabled, **service.refresher.stats()},
+        "outbox": outbox,
+        "daily_series": service.daily_index.stats(),
+        "prefetch": {"enabled": service.prefetch_enabled, **service.prefetcher.stats()},
+    }
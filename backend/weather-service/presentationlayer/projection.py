@@ -0,0 +1,97 @@
+"""
+Response field projection for the weather endpoints (fields= / include_raw= / compact=).
+Projection runs on the result dicts before they are serialized, so dropped parts of the upstream
+payload (typically the ~15-20 KB forecast "raw") are never encoded or sent.
+  - fields: comma-separated dotted paths, e.g. "aggregated.date,aggregated.max_temp,raw.city.name".
+    A path into a list applies to every element. Unknown paths are simply absent from the result.
+  - include_raw=false: drop "raw" (also when it is named in fields).
+  - compact=true: aggregated-only forecast with the core daily fields (COMPACT_FIELDS);
+    explicit fields take precedence.
+Bookkeeping keys (freshness, stored, and the index/ok/error keys of batch and stream items) are
+always kept. Without any of the parameters the result is returned unchanged.
+"""
+from typing import Optional
+from exceptions.custom_exceptions import InvalidRequestException
+
+COMPACT_FIELDS = "aggregated.date,aggregated.min_temp,aggregated.max_temp,aggregated.summary,aggregated.icon"
+ALWAYS_KEPT = ("index", "location_id", "lat", "lng", "ok", "error", "freshness", "stored")
+MAX_FIELDS = 50
+
+
+def _parse(fields: str) -> dict:
+    """"a.b,a.c,d" -> {"a": {"b": True, "c": True}, "d": True} (True selects the whole value)."""
+    tree = {}
+    paths = [p.strip() for p in fields.split(",") if p.strip()]
+    if len(paths) > MAX_FIELDS:
+        raise InvalidRequestException(f"Too many fields. Maximum {MAX_FIELDS}")
+    for path in paths:
+        parts = path.split(".")
+        if any(not p for p in parts):
+            raise InvalidRequestException(f"Invalid field path '{path}'")
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break  # a parent is already selected whole
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def _select(value, tree):
+    if tree is True:
+        return value
+    if isinstance(value, dict):
+        return {k: _select(value[k], sub) for k, sub in tree.items() if k in value}
+    if isinstance(value, list):
+        return [_select(v, tree) for v in value]
+    return value
+
+
+class Projection:
+    def __init__(self, tree: Optional[dict], include_raw: bool = True):
+        self.tree = tree
+        self.include_raw = include_raw
+
+    @classmethod
+    def from_query(cls, fields: Optional[str] = None, include_raw: bool = True, compact: bool = False) -> Optional["Projection"]:
+        """Projection for the request's query parameters, or None when the full result is wanted."""
+        if fields is None and compact:
+            fields = COMPACT_FIELDS
+        if fields is None and include_raw:
+            return None
+        tree = _parse(fields) if fields is not None else None
+        return cls(tree, include_raw=include_raw and not compact)
+
+    def apply(self, result: dict) -> dict:
+        """Shallow-copying projection of one result (or one batch / stream item)."""
+        if self.tree is None:
+            out = dict(result)
+        else:
+            out = {k: result[k] for k in ALWAYS_KEPT if k in result}
+            for key, sub in self.tree.items():
+                if key in result and key not in out:
+                    out[key] = _select(result[key], sub)
+        if not self.include_raw:
+            out.pop("raw", None)
+        return out
+
+    def apply_batch(self, batch: dict) -> dict:
+        return {**batch, "results": [self.apply(item) for item in batch["results"]]}
+
+    def variant(self) -> tuple:
+        """Part of the ETag: different projections of the same data are different representations."""
+        return (repr(self.tree), self.include_raw)
+
+
+def project(result: dict, projection: Optional[Projection]) -> dict:
+    return result if projection is None else projection.apply(result)
+
+
+def project_batch(batch: dict, projection: Optional[Projection]) -> dict:
+    return batch if projection is None else projection.apply_batch(batch)
+
+
+def variant(projection: Optional[Projection]) -> tuple:
+    return () if projection is None else projection.variant()
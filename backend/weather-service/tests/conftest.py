@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modules import each other from the service root (e.g. "from dataaccesslayer import ...")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from businesslogiclayer.background_refresh import BackgroundRefresher
+from businesslogiclayer.weather_service import WeatherService
+from domainclientlayer.single_flight import SingleFlight
+from dataaccesslayer.weather_cache import WeatherCache
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+        self.limiter = None
+
+    async def current(self, lat, lng, priority=None):
+        self.calls += 1
+        return {"dt": self.calls, "coord": {"lat": lat, "lon": lng}}
+
+
+def make_service(monkeypatch, clock):
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    service = WeatherService()
+    service.client = FakeClient()
+    service.swr_enabled = True
+    service.cache.ttls = {"current": 60, "forecast": 60}
+    service.cache.max_stale = 300
+    return service
+
+
+def test_stale_entry_is_served_immediately_and_refreshed_in_the_background(monkeypatch):
+    clock = [1000.0]
+    service = make_service(monkeypatch, clock)
+
+    async def scenario():
+        await service._fetch("current", 45.5, -73.6)
+        clock[0] += 90  # 30 s past the TTL, well inside max staleness
+        value, freshness = await service._fetch("current", 45.5, -73.6)
+        pending = service.refresher.stats()["pending"]
+        await asyncio.gather(*service.refresher._pending.values())
+        refreshed, after = await service._fetch("current", 45.5, -73.6)
+        return value, freshness, pending, refreshed, after
+
+    value, freshness, pending, refreshed, after = asyncio.run(scenario())
+    assert value["dt"] == 1
+    assert freshness == {"stale": True, "age": 90.0}
+    assert pending == 1
+    assert refreshed["dt"] == 2
+    assert after == {"stale": False, "age": 0.0}
+    assert service.client.calls == 2
+
+
+def test_entry_past_max_staleness_is_refetched_in_the_foreground(monkeypatch):
+    clock = [1000.0]
+    service = make_service(monkeypatch, clock)
+
+    async def scenario():
+        await service._fetch("current", 45.5, -73.6)
+        clock[0] += 60 + 300 + 1
+        return await service._fetch("current", 45.5, -73.6)
+
+    value, freshness = asyncio.run(scenario())
+    assert value["dt"] == 2
+    assert freshness == {"stale": False, "age": 0.0}
+    assert service.refresher.stats()["scheduled"] == 0
+
+
+def test_refreshes_never_exceed_the_concurrency_limit():
+    active = [0]
+    peak = [0]
+
+    async def loader(kind, lat, lng):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        return {}
+
+    async def scenario():
+        refresher = BackgroundRefresher(WeatherCache(), SingleFlight("test"), loader, concurrency=2)
+        for i in range(6):
+            assert refresher.schedule("current", float(i), 0.0)
+        assert not refresher.schedule("current", 0.0, 0.0)  # already pending
+        await asyncio.gather(*refresher._pending.values())
+        return refresher.stats()
+
+    stats = asyncio.run(scenario())
+    assert peak[0] == 2
+    assert stats["refreshed"] == 6
+    assert stats["pending"] == 0
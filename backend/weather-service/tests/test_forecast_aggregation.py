@@ -0,0 +1,201 @@
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from businesslogiclayer.forecast_aggregation import aggregate_daily, aggregate_daily_many
+from businesslogiclayer.weather_service import WeatherService
+
+# backend/perf/fake_upstream.py: the offline stand-in for OpenWeather used by the load tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "perf"))
+import fake_upstream  # noqa: E402
+
+DAY = 86400
+START = 1767225600  # 2026-01-01T00:00:00Z
+BASELINE_FIELDS = ("date", "min_temp", "max_temp", "summary", "icon")
+
+
+def baseline_daily(raw_forecast: dict, days: int = 5) -> list:
+    """The per-entry loop aggregate_daily_many replaced (UTC days, original fields only)."""
+    items = raw_forecast.get("list") or []
+    buckets = defaultdict(list)
+    for it in items:
+        dt = it.get("dt")
+        if dt is None:
+            continue
+        buckets[datetime.fromtimestamp(dt, tz=timezone.utc).date().isoformat()].append(it)
+    daily = []
+    for i, (date_str, arr) in enumerate(sorted(buckets.items())):
+        if i >= days:
+            break
+        temps = [entry.get("main", {}).get("temp") for entry in arr if entry.get("main")]
+        mins = [entry.get("main", {}).get("temp_min") for entry in arr if entry.get("main")]
+        maxs = [entry.get("main", {}).get("temp_max") for entry in arr if entry.get("main")]
+        desc = icon = None
+        for entry in arr:
+            w = entry.get("weather", [{}])[0]
+            if w.get("description"):
+                desc, icon = w.get("description"), w.get("icon")
+                break
+        daily.append({
+            "date": date_str,
+            "min_temp": min(mins) if mins else (min(temps) if temps else None),
+            "max_temp": max(maxs) if maxs else (max(temps) if temps else None),
+            "summary": desc,
+            "icon": icon,
+        })
+    return daily
+
+
+def original_fields(daily: list) -> list:
+    return [{k: day[k] for k in BASELINE_FIELDS} for day in daily]
+
+
+def entry(dt: int, temp=10.0, tmin=None, tmax=None, description="clear sky", icon="01d", wid=800):
+    return {
+        "dt": dt,
+        "main": {"temp": temp, "temp_min": temp if tmin is None else tmin,
+                 "temp_max": temp if tmax is None else tmax, "humidity": 50},
+        "weather": [{"id": wid, "main": "Clear", "description": description, "icon": icon}],
+    }
+
+
+def forecast(n: int = 40, start: int = START, step: int = 10800, base: float = 10.0, timezone_offset: int = 0) -> dict:
+    return {
+        "list": [entry(start + i * step, temp=base + (i % 8) - 3.5, description=f"sky {i}", icon=f"{i:02d}d")
+                 for i in range(n)],
+        "city": {"name": "Test", "timezone": timezone_offset},
+    }
+
+
+LOCATIONS = [(43.6532, -79.3832), (48.8566, 2.3522), (35.6762, 139.6503), (-33.8688, 151.2093), (64.1466, -21.9426)]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """fake_upstream.forecast() without its simulated latency and failures."""
+    monkeypatch.setattr(fake_upstream, "config", fake_upstream.FakeConfig(latency_ms=0, jitter_ms=0))
+
+    def forecast_payload(lat, lng):
+        return asyncio.run(fake_upstream.forecast(lat=lat, lon=lng, appid="fake", units="metric", cnt=40))
+    return forecast_payload
+
+
+@pytest.mark.parametrize("days", [1, 5, 7])
+def test_fake_upstream_forecasts_match_the_baseline(upstream, days):
+    service = WeatherService()
+    for lat, lng in LOCATIONS:
+        raw = upstream(lat, lng)
+        daily = service._aggregate_to_daily(raw, days)
+        assert original_fields(daily) == baseline_daily(raw, days)
+        assert daily == aggregate_daily(raw, days)
+        local = service._aggregate_to_daily(raw, days, local_time=True)
+        assert 1 <= len(local) <= days
+        if days == 7:  # every entry is in some day either way
+            assert sum(d["precipitation_mm"] for d in local) == pytest.approx(sum(d["precipitation_mm"] for d in daily))
+
+
+def test_forecast_endpoint_serves_the_aggregated_fake_upstream_payload(upstream, monkeypatch):
+    from presentationlayer import controllers
+    from exceptions.global_exception_handler import register_exception_handlers
+
+    lat, lng = LOCATIONS[1]
+    raw = upstream(lat, lng)
+
+    async def forecast_5day(lat, lng, priority=None):
+        return raw
+
+    monkeypatch.setattr(controllers.service.client, "forecast_5day", forecast_5day)
+    monkeypatch.setattr(controllers.service.cache, "enabled", False)
+    app = FastAPI()
+    app.include_router(controllers.router, prefix="/api/v1/weather")
+    register_exception_handlers(app)
+
+    response = TestClient(app).get("/api/v1/weather/forecast", params={"lat": lat, "lng": lng, "days": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["raw"]["cnt"] == 40
+    assert body["aggregated"] == controllers.service._aggregate_to_daily(raw, 5)
+    assert original_fields(body["aggregated"]) == baseline_daily(raw, 5)
+    assert body["freshness"] == {"stale": False, "age": 0.0}
+    assert response.headers["ETag"].startswith('W/"')
+
+
+@pytest.mark.parametrize("days", [1, 5, 7])
+def test_matches_the_baseline(days):
+    raw = forecast()
+    assert original_fields(aggregate_daily(raw, days)) == baseline_daily(raw, days)
+
+
+def test_integer_temperatures_stay_integers():
+    raw = {"list": [entry(START, temp=18, tmin=18, tmax=21), entry(START + 10800, temp=19.5, tmin=18.0, tmax=20.5)]}
+    day = aggregate_daily(raw)[0]
+    assert original_fields([day]) == baseline_daily(raw)
+    assert type(day["min_temp"]) is int and day["min_temp"] == 18  # first holder of the minimum wins
+    assert type(day["max_temp"]) is int and day["max_temp"] == 21
+
+
+def test_entries_without_main_are_skipped():
+    raw = {"list": [entry(START, temp=5.0), {"dt": START + 10800, "weather": [{"description": "fog", "icon": "50d"}]},
+                    entry(START + DAY, temp=7.0), {"dt": START + 2 * DAY}]}
+    daily = aggregate_daily(raw)
+    assert original_fields(daily) == baseline_daily(raw)
+    assert daily[2] == {**daily[2], "min_temp": None, "max_temp": None, "summary": None, "mean_temp": None}
+
+
+def test_missing_temp_min_and_temp_max_fall_back_to_temp():
+    raw = {"list": [{"dt": START, "main": {"temp": 4.0}}, {"dt": START + 10800, "main": {"temp": 9.0}},
+                    {"dt": START + DAY, "main": {"temp": 3, "temp_min": 1}}, {"dt": START + DAY + 10800, "main": {"temp": 6}}]}
+    first, second = aggregate_daily(raw)
+    assert (first["min_temp"], first["max_temp"]) == (4.0, 9.0)
+    # the baseline raised TypeError on a day mixing entries with and without temp_min
+    assert (second["min_temp"], second["max_temp"]) == (1, 6)
+
+
+def test_empty_weather_list_or_no_description_gives_no_summary():
+    raw = {"list": [{"dt": START, "main": {"temp": 1.0}, "weather": []},
+                    {"dt": START + 10800, "main": {"temp": 2.0}, "weather": [{"id": 800, "icon": "01d"}]},
+                    {"dt": START + DAY, "main": {"temp": 3.0}, "weather": [{"description": "", "icon": "02d"}]},
+                    {"dt": START + DAY + 10800, "main": {"temp": 4.0}, "weather": [{"description": "mist", "icon": "50d"}]}]}
+    first, second = aggregate_daily(raw)
+    assert (first["summary"], first["icon"]) == (None, None)
+    assert first["condition"]["id"] == 800
+    assert (second["summary"], second["icon"]) == ("mist", "50d")
+
+
+def test_days_cuts_off_later_days():
+    raw = forecast(n=48)  # six UTC days
+    assert [d["date"] for d in aggregate_daily(raw, 3)] == ["2026-01-01", "2026-01-02", "2026-01-03"]
+    assert len(aggregate_daily(raw, 10)) == 6
+    assert aggregate_daily(raw, 0) == []
+
+
+def test_local_time_groups_by_city_timezone():
+    # 22:00Z and 23:00Z on Jan 1 are already Jan 2 at UTC+3
+    raw = {"list": [entry(START + 10 * 3600, temp=1.0), entry(START + 22 * 3600, temp=2.0), entry(START + 23 * 3600, temp=3.0)],
+           "city": {"timezone": 3 * 3600}}
+    utc = aggregate_daily(raw)
+    local = aggregate_daily(raw, local_time=True)
+    assert [(d["date"], d["max_temp"]) for d in utc] == [("2026-01-01", 3.0)]
+    assert [(d["date"], d["min_temp"], d["max_temp"]) for d in local] == [("2026-01-01", 1.0, 1.0), ("2026-01-02", 2.0, 3.0)]
+
+
+def test_many_forecasts_in_one_call_keep_input_order():
+    forecasts = [forecast(base=20.0), {"list": []}, forecast(n=8, start=START + 3 * DAY, base=-5.0), forecast(base=0.0)]
+    results = aggregate_daily_many(forecasts, 5)
+    assert len(results) == 4
+    assert results[1] == []
+    for raw, daily in zip(forecasts, results):
+        assert original_fields(daily) == baseline_daily(raw, 5)
+    assert results[2][0]["date"] == "2026-01-04"
+
+
+def test_entries_out_of_time_order_are_grouped_by_day():
+    raw = forecast(n=16)
+    shuffled = {"list": raw["list"][8:] + raw["list"][:8]}
+    assert aggregate_daily(shuffled) == aggregate_daily(raw)
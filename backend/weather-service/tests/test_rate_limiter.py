@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from domainclientlayer.rate_limiter import RateLimiter, INTERACTIVE, BATCH, BACKGROUND
+from domainclientlayer.resilience import ResilientCaller
+from exceptions.custom_exceptions import RateLimitedException
+from exceptions.global_exception_handler import register_exception_handlers
+
+
+def drained(**kwargs) -> RateLimiter:
+    """A limiter whose single token is already spent, so the next caller has to queue."""
+    limiter = RateLimiter("test", **{"rate_per_minute": 1200, "burst": 1, **kwargs})  # a token every 50 ms
+    limiter._tokens = 0.0
+    return limiter
+
+
+def test_queued_callers_are_served_interactive_then_batch_then_background():
+    async def scenario():
+        limiter = drained()
+        served = []
+
+        async def caller(priority):
+            await limiter.acquire(priority)
+            served.append(priority)
+
+        # queued lowest priority first; all three wait for the same refill
+        tasks = [asyncio.ensure_future(caller(p)) for p in (BACKGROUND, BATCH, INTERACTIVE, BATCH)]
+        await asyncio.gather(*tasks)
+        return served, limiter.stats()
+
+    served, stats = asyncio.run(scenario())
+    assert served == [INTERACTIVE, BATCH, BATCH, BACKGROUND]
+    assert stats["queued"] == {"interactive": 1, "batch": 2, "background": 1}
+
+
+def test_a_full_queue_raises_rate_limited():
+    async def scenario():
+        limiter = drained(max_queue=1)
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitedException) as rejected:
+            await limiter.acquire()
+        await waiter
+        return rejected.value, limiter.stats()
+
+    rejected, stats = asyncio.run(scenario())
+    assert rejected.retry_after is not None
+    assert stats["rejected"]["interactive"] == 1
+
+
+def test_a_wait_longer_than_the_deadline_raises_rate_limited():
+    async def scenario():
+        limiter = drained(rate_per_minute=60)  # next token in a second
+        started = time.monotonic()
+        with pytest.raises(RateLimitedException):
+            await limiter.acquire(timeout=0.05)  # rejected up front: the bucket cannot refill in time
+        assert time.monotonic() - started < 0.05
+        first = asyncio.ensure_future(limiter.acquire(BACKGROUND))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitedException):
+            await limiter.acquire(BATCH, timeout=0.05)  # queued behind first, gives up at the deadline
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == {"interactive": 1, "batch": 1, "background": 0}
+    assert stats["queue_depth"] == 0
+
+
+def test_penalize_drains_the_bucket_and_pauses_refills():
+    async def scenario():
+        limiter = RateLimiter("test", rate_per_minute=6000, burst=5)  # a token every 10 ms
+        limiter.penalize(0.2)
+        assert limiter.available() == 0.0
+        await asyncio.sleep(0.1)
+        assert limiter.available() == 0.0  # ten refill intervals later, still paused
+        started = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.08
+
+
+def test_upstream_429_penalizes_the_limiter():
+    from domainclientlayer.weather_client import WeatherClient
+
+    class FakePool:
+        requests = 0
+
+        async def get(self, url, params=None):
+            self.requests += 1
+            return httpx.Response(429, headers={"Retry-After": "30"})
+
+    client = WeatherClient(pool=FakePool())
+    client.limiter = RateLimiter("test", rate_per_minute=600, burst=5)
+    client.resilience = ResilientCaller("test", retries=0)
+
+    with pytest.raises(RateLimitedException) as rejected:
+        asyncio.run(client._get("https://upstream.test/weather", {}))
+    assert rejected.value.retry_after == 30.0
+    assert client.limiter.available() == 0.0
+    assert 29 <= client.limiter.stats()["paused_for_s"] <= 30
+    assert client.limiter.stats()["penalties"] == 1
+
+
+def test_rate_limited_handler_sends_retry_after():
+    app = FastAPI()
+    register_exception_handlers(app)
+
+    @app.get("/limited")
+    async def limited():
+        raise RateLimitedException("quota", retry_after=1.2)
+
+    response = TestClient(app).get("/limited")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["message"] == "Too many requests"
@@ -0,0 +1,199 @@
+import asyncio
+import gc
+
+import httpx
+import pytest
+
+from domainclientlayer import resilience
+from domainclientlayer.resilience import ResilientCaller, CLOSED, OPEN, HALF_OPEN
+from exceptions.custom_exceptions import UpstreamUnavailableException
+
+URL = "https://upstream.test/data"
+
+
+class FakeClock:
+    """Stands in for the time module inside resilience so breaker cool-downs need no real waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeTransport:
+    """Answers with the next scripted outcome: a status code, an exception, or an awaitable gate."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = 0
+
+    async def handle(self, request):
+        self.requests += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if callable(outcome):
+            outcome = await outcome()
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+
+def run(transport, scenario):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(transport.handle)) as client:
+            return await scenario(lambda: client.get(URL))
+    return asyncio.run(main())
+
+
+def test_breaker_opens_after_the_threshold(clock):
+    caller = ResilientCaller("test", failure_threshold=3, retries=0)
+    transport = FakeTransport(503)
+
+    async def scenario(send):
+        statuses = [(await caller.call(URL, send)).status_code for _ in range(3)]
+        with pytest.raises(UpstreamUnavailableException):
+            await caller.call(URL, send)
+        return statuses
+
+    assert run(transport, scenario) == [503, 503, 503]
+    assert transport.requests == 3
+    assert caller.breaker_for(URL).state == OPEN
+
+
+def test_half_open_allows_one_probe_and_closes_on_success(clock):
+    caller = ResilientCaller("test", failure_threshold=1, reset_timeout=30, retries=0)
+    gate = []
+
+    async def held():
+        await gate[0].wait()
+        return 200
+
+    transport = FakeTransport(500, held, 200)
+
+    async def scenario(send):
+        gate.append(asyncio.Event())
+        await caller.call(URL, send)
+        breaker = caller.breaker_for(URL)
+        assert breaker.state == OPEN
+        clock.now += 30
+        probe = asyncio.ensure_future(caller.call(URL, send))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(UpstreamUnavailableException):
+            await caller.call(URL, send)  # a second caller during the probe fails fast
+        gate[0].set()
+        assert (await probe).status_code == 200
+        assert breaker.state == CLOSED
+        assert (await caller.call(URL, send)).status_code == 200
+
+    run(transport, scenario)
+    assert transport.requests == 3
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    caller = ResilientCaller("test", failure_threshold=2, reset_timeout=30, retries=0)
+    transport = FakeTransport(httpx.ConnectError("refused"))
+
+    async def scenario(send):
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await caller.call(URL, send)
+        clock.now += 30
+        with pytest.raises(httpx.ConnectError):
+            await caller.call(URL, send)  # the probe: one failure is enough to reopen
+        with pytest.raises(UpstreamUnavailableException):
+            await caller.call(URL, send)
+        clock.now += 29
+        with pytest.raises(UpstreamUnavailableException):
+            await caller.call(URL, send)  # the cool-down restarted when the probe failed
+
+    run(transport, scenario)
+    assert transport.requests == 3
+    assert caller.breaker_for(URL).stats()["opened_total"] == 2
+
+
+def test_retries_are_capped(clock):
+    caller = ResilientCaller("test", failure_threshold=100, retries=2, backoff_base=0)
+    transport = FakeTransport(503)
+    assert run(transport, lambda send: caller.call(URL, send)).status_code == 503
+    assert transport.requests == 3
+
+    transport = FakeTransport(httpx.ConnectError("refused"))
+    with pytest.raises(httpx.ConnectError):
+        run(transport, lambda send: caller.call(URL, send))
+    assert transport.requests == 3
+    assert caller.stats()["retries"] == 4
+
+
+def test_non_retryable_statuses_are_returned_at_once(clock):
+    caller = ResilientCaller("test", retries=2, backoff_base=0)
+    transport = FakeTransport(404)
+    assert run(transport, lambda send: caller.call(URL, send)).status_code == 404
+    assert transport.requests == 1
+
+
+def hedging_caller() -> ResilientCaller:
+    caller = ResilientCaller("test", retries=0, hedge=True, hedge_min_samples=1)
+    caller.latency.record(0.01)  # hedge after 10 ms
+    return caller
+
+
+def run_collecting_loop_errors(transport, scenario) -> list:
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(transport.handle)) as client:
+            result = await scenario(lambda: client.get(URL))
+        gc.collect()  # "exception was never retrieved" is reported when the task is collected
+        await asyncio.sleep(0)
+        return result
+
+    return asyncio.run(main()), errors
+
+
+def test_losing_hedge_attempt_is_cancelled():
+    caller = hedging_caller()
+    cancelled = []
+
+    async def slow_then_failing():
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return httpx.ConnectError("too late")
+
+    async def scenario(send):
+        response = await caller.call(URL, send)
+        assert cancelled == [True]  # already cancelled when the winner is returned
+        await asyncio.sleep(0.1)  # long enough for an uncancelled loser to fail
+        return response
+
+    transport = FakeTransport(slow_then_failing, 200)
+    response, errors = run_collecting_loop_errors(transport, scenario)
+    assert response.status_code == 200
+    assert errors == []
+    assert transport.requests == 2
+    assert caller.stats()["hedges"] == 1 and caller.stats()["hedge_wins"] == 1
+
+
+def test_failed_hedge_attempt_leaves_no_unretrieved_exception():
+    caller = hedging_caller()
+
+    async def slow_success():
+        await asyncio.sleep(0.05)
+        return 200
+
+    transport = FakeTransport(slow_success, httpx.ConnectError("refused"))
+    response, errors = run_collecting_loop_errors(transport, lambda send: caller.call(URL, send))
+    assert response.status_code == 200
+    assert errors == []
+    assert caller.stats()["hedge_wins"] == 0
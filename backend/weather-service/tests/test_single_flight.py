@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from domainclientlayer.single_flight import SingleFlight
+
+
+def test_concurrent_callers_with_one_key_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"temp": 21}
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("paris", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"temp": 21}] * 5
+    assert flight.stats()["calls"] == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_other_keys_get_their_own_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0)
+
+    async def scenario():
+        flight = SingleFlight("test")
+        await asyncio.gather(flight.do("paris", fetch), flight.do("rome", fetch))
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_an_exception_reaches_every_waiter_and_the_next_call_runs_fresh():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def working():
+        calls.append(1)
+        return "ok"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("paris", failing) for _ in range(3)), return_exceptions=True)
+        retry = await flight.do("paris", working)
+        return flight, results, retry
+
+    flight, results, retry = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retry == "ok"
+    assert len(calls) == 2
+    assert flight.stats()["errors"] == 1
+
+
+def test_cancelling_one_waiter_does_not_cancel_the_shared_fetch():
+    finished = []
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        finished.append(1)
+        return "ok"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        first = asyncio.ensure_future(flight.do("paris", fetch))
+        second = asyncio.ensure_future(flight.do("paris", fetch))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
+    assert finished == [1]
@@ -29,7 +29,7 @@ export async function getCurrentWeatherAndSave(lat, lng, locationId) {
 export async function getForecast(lat, lng, days = 5) {
   try {
     const res = await axios.get(`${WEATHER_SERVICE}/forecast`, {
-      params: { lat, lng, days },
+      params: { lat, lng, days, include_raw: false },
     });
     return res.data.aggregated || [];
   } catch (err) {
@@ -41,7 +41,7 @@ export async function getForecast(lat, lng, days = 5) {
 export async function getForecastAndSave(lat, lng, days = 5, locationId) {
   try {
     const res = await axios.get(`${WEATHER_SERVICE}/forecast-and-save`, {
-      params: { lat, lng, days, location_id: locationId },
+      params: { lat, lng, days, location_id: locationId, include_raw: false },
     });
     return res.data.aggregated || [];
   } catch (err) {